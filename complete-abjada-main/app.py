@@ -3,7 +3,9 @@ from flask import Flask, send_from_directory, request, jsonify
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm.exc import StaleDataError
 from extensions import db, bcrypt
+from utils.pagination import InvalidCursor
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config.from_object('config.Config')
@@ -44,8 +46,11 @@ from models import (
     Customer,
     Measurement,
     Order,
+    OrderRevenueDaily,
+    CustomerBalance,
     Payment,
     Transaction,
+    ArAgingSnapshot,
     TransactionCategory,
     Liability,
     Expense,
@@ -55,6 +60,14 @@ from models import (
     FabricUsage,
     ProductColor,
     ProductCategory,
+    StockAlert,
+    ChangeVersion,
+    MeasurementFabricPart,
+    StockMovement,
+    StockSnapshot,
+    ProductFabricTotals,
+    FinanceBalance,
+    ReportJob,
     Task,
     Notification,
     LowStockAlertRead,
@@ -83,6 +96,7 @@ from routes.dashboard import dashboard_bp
 from routes.notifications import notifications_bp
 from routes.pages import pages_bp
 from routes.finance import finance_bp
+from routes.jobs import jobs_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(customers_bp, url_prefix='/api/customers')
@@ -102,6 +116,7 @@ app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
 app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
 app.register_blueprint(pages_bp)
 app.register_blueprint(finance_bp, url_prefix='/api/finance')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
 
 
 @app.before_request
@@ -132,6 +147,18 @@ def enforce_api_role_access():
     return jsonify({'error': 'Access denied for your role'}), 403
 
 
+@app.errorhandler(StaleDataError)
+def stock_row_changed(e):
+    """Optimistic lock lost (products / product_colors version column): ask the client to retry."""
+    db.session.rollback()
+    return jsonify({'error': 'Stock was changed by another user at the same time; please retry'}), 409
+
+
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({'error': str(e)}), 400
+
+
 @app.route('/static/uploads/<path:filename>')
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
@@ -176,6 +203,94 @@ with app.app_context():
             print("✓ Product color / measurement link schema patches applied")
         except Exception as e:
             print(f"✗ Product color schema patch error: {e}")
+        try:
+            from schema_notifications import apply_notification_schema_patches
+            apply_notification_schema_patches(db)
+            print("✓ Notification read-state schema patches applied")
+        except Exception as e:
+            print(f"✗ Notification schema patch error: {e}")
+        try:
+            from schema_customers import apply_customer_schema_patches
+            apply_customer_schema_patches(db)
+            print("✓ Customer phone lookup columns applied")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Customer schema patch error: {e}")
+        try:
+            from schema_indexes import apply_index_schema_patches
+            apply_index_schema_patches(db)
+            print("✓ Report date-range indexes applied")
+        except Exception as e:
+            print(f"✗ Index schema patch error: {e}")
+        try:
+            from schema_search import apply_search_schema_patches
+            apply_search_schema_patches(db)
+            print("✓ Full-text search tables applied")
+        except Exception as e:
+            print(f"✗ Search schema patch error (search falls back to LIKE): {e}")
+        try:
+            from services.revenue_rollup import backfill_order_revenue_daily_if_empty
+            if backfill_order_revenue_daily_if_empty():
+                print("✓ order_revenue_daily rollup backfilled from orders")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Revenue rollup backfill error: {e}")
+        try:
+            from services.stock_alerts import backfill_stock_alerts_if_empty
+            if backfill_stock_alerts_if_empty():
+                print("✓ stock_alerts backfilled from products")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Stock alert backfill error: {e}")
+        try:
+            from services.measurement_fabric_parts import backfill_measurement_fabric_parts_if_empty
+            if backfill_measurement_fabric_parts_if_empty():
+                print("✓ measurement_fabric_parts backfilled from measurements")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Measurement fabric parts backfill error: {e}")
+        try:
+            from services.stock_ledger import backfill_stock_ledger_if_empty
+            if backfill_stock_ledger_if_empty():
+                print("✓ stock_movements opened from current stock")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Stock ledger backfill error: {e}")
+        try:
+            from services.fabric_totals import backfill_fabric_totals_if_empty
+            if backfill_fabric_totals_if_empty():
+                print("✓ product_fabric_totals built from product colors")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Product fabric totals backfill error: {e}")
+        try:
+            from services.finance_balances import backfill_finance_balances_if_empty
+            if backfill_finance_balances_if_empty():
+                print("✓ finance_balances built from transactions / expenses / liabilities")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Finance balances backfill error: {e}")
+        try:
+            from services.customer_balances import backfill_customer_balances_if_empty
+            if backfill_customer_balances_if_empty():
+                print("✓ customer_balances built from orders")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Customer balances backfill error: {e}")
+        try:
+            from services.payment_rollup import backfill_payments_daily_if_empty
+            if backfill_payments_daily_if_empty():
+                print("✓ payments_daily rollup built from payments")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Payments daily backfill error: {e}")
+        try:
+            from services.search_index import backfill_search_index_if_empty
+            if backfill_search_index_if_empty():
+                print("✓ search index built from customers / orders / transactions / swaps / products")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Search index backfill error: {e}")
 
         # Create default admin user
         admin_user = User.query.filter_by(role='admin').first()
@@ -54,6 +54,18 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "static", "uploads")
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
 
+    # Seconds GET /api/dashboard serves cached aggregates (dropped on stock/order commits)
+    DASHBOARD_CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", 30))
+    # Upper bound for GET /api/notifications/low-stock?wait=N long-polls (seconds)
+    LOW_STOCK_MAX_WAIT = int(os.environ.get("LOW_STOCK_MAX_WAIT", 10))
+    # Background report jobs (POST /api/jobs): worker threads and how long results are kept (seconds)
+    REPORT_JOB_WORKERS = int(os.environ.get("REPORT_JOB_WORKERS", 2))
+    REPORT_JOB_TTL = int(os.environ.get("REPORT_JOB_TTL", 3600))
+    # instance/pdf_cache size cap (bytes); least recently served invoices / receipts go first
+    PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+    # Country code for customer phones typed without one ("0712..." -> "254712..."); see utils.phone
+    PHONE_DEFAULT_COUNTRY_CODE = os.environ.get("PHONE_DEFAULT_COUNTRY_CODE", "254")
+
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
     MAIL_USE_TLS = True
@@ -1,6 +1,7 @@
-"""Order payment_status sync and financial validation (customer orders)."""
+"""Order payment_status / status sync and financial validation (customer orders)."""
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Optional, Tuple
 
 EPS = 1e-6
@@ -8,6 +9,25 @@ EPS = 1e-6
 # Must match routes.orders.PRODUCT_ORDER_CUSTOMER_PHONE — walk-in product sales placeholder.
 PRODUCT_ORDER_PLACEHOLDER_PHONE = '__product_order__'
 
+# Order statuses that count as a finished sale (revenue rollup, sales analytics).
+ORDER_DONE_STATUSES = ('completed', 'delivered')
+
+# Transaction.account_type label -> Transaction.account_type_code (indexed; finance routing filters on it)
+ACCOUNT_TYPE_CODES = {
+    'Account received': 'received',
+    'Receivable': 'receivable',
+    'Liability': 'liability',
+}
+
+
+def account_type_code(label) -> Optional[str]:
+    """Code for a canonical account_type label (case / surrounding spaces ignored), else None."""
+    low = (label or '').strip().lower()
+    for canonical, code in ACCOUNT_TYPE_CODES.items():
+        if canonical.lower() == low:
+            return code
+    return None
+
 
 def order_is_product_placeholder_sale(order) -> bool:
     """
@@ -45,6 +65,23 @@ def sync_order_payment_status(order) -> None:
     order.payment_status = compute_payment_status(order.total_price, order.advance_paid)
 
 
+def order_status_is_done(status) -> bool:
+    return (status or '').strip().lower() in ORDER_DONE_STATUSES
+
+
+def set_order_status(order, status: str) -> None:
+    """
+    Change order.status, stamping completed_at when the order enters a done status and
+    clearing it when it leaves one (sales analytics count an order on its completed_at day).
+    """
+    was_done = order_status_is_done(order.status) and order.completed_at is not None
+    order.status = status
+    if not order_status_is_done(status):
+        order.completed_at = None
+    elif not was_done:
+        order.completed_at = datetime.utcnow()
+
+
 def validate_order_amounts(total_price: float, advance_paid: float) -> Tuple[bool, Optional[str]]:
     """Ensure order total = paid + balance (paid <= total, non-negative)."""
     tp = float(total_price or 0)
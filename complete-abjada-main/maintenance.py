@@ -0,0 +1,170 @@
+"""
+Maintenance commands (rollup rebuilds, consistency checks).
+Run from this directory, e.g.:
+
+    python maintenance.py rebuild-revenue-rollup
+"""
+import argparse
+import sys
+
+from app import app
+
+
+def rebuild_revenue_rollup(args):
+    """Recompute order_revenue_daily from the orders table."""
+    from services.revenue_rollup import rebuild_order_revenue_daily
+    n = rebuild_order_revenue_daily()
+    print(f"✓ order_revenue_daily rebuilt ({n} rows)")
+    return 0
+
+
+def rebuild_stock_alerts(args):
+    """Recompute stock_alerts from products and product colors."""
+    from services.stock_alerts import rebuild_stock_alerts as rebuild
+    n = rebuild()
+    print(f"✓ stock_alerts rebuilt ({n} alerts)")
+    return 0
+
+
+def rebuild_fabric_parts(args):
+    """Recompute measurement_fabric_parts from measurement yard breakdowns."""
+    from services.measurement_fabric_parts import rebuild_measurement_fabric_parts
+    n = rebuild_measurement_fabric_parts()
+    print(f"✓ measurement_fabric_parts rebuilt ({n} rows)")
+    return 0
+
+
+def snapshot_stock(args):
+    """Fold recent stock_movements into a new stock_snapshots batch (run periodically)."""
+    from services.stock_ledger import take_stock_snapshot
+    n = take_stock_snapshot()
+    print(f"✓ stock snapshot taken ({n} rows)")
+    return 0
+
+
+def snapshot_ar_aging(args):
+    """Store today's accounts-receivable aging in ar_aging_snapshots (run nightly)."""
+    from services.ar_aging import take_ar_aging_snapshot
+    n = take_ar_aging_snapshot()
+    print(f"✓ AR aging snapshot taken ({n} customers)")
+    return 0
+
+
+def reconcile_stock(args):
+    """Compare ledger balances with products / colors; --fix appends correcting movements."""
+    from services.stock_ledger import reconcile_stock as reconcile
+    drift = reconcile(fix=args.fix)
+    for d in drift:
+        print(
+            f"  product {d['product_id']} color {d['product_color_id']}: "
+            f"ledger {d['ledger_yards']} yd / {d['ledger_pieces']} pcs, "
+            f"live {d['live_yards']} yd / {d['live_pieces']} pcs"
+        )
+    if not drift:
+        print("✓ stock ledger matches products / colors")
+        return 0
+    print(f"{'✓ fixed' if args.fix else '✗ found'} {len(drift)} drifting balance(s)")
+    return 0 if args.fix else 1
+
+
+def verify_fabric_totals(args):
+    """Recompute product_fabric_totals from product_colors; --fix rewrites drifting rows."""
+    from services.fabric_totals import verify_fabric_totals as verify
+    drift = verify(fix=args.fix)
+    for d in drift:
+        cols = ', '.join(f"{c} {d['cached'][c]} != {d['expected'][c]}" for c in d['columns'])
+        print(f"  product {d['product_id']}: {cols}")
+    if not drift:
+        print("✓ product_fabric_totals match product colors")
+        return 0
+    print(f"{'✓ fixed' if args.fix else '✗ found'} {len(drift)} drifting product(s)")
+    return 0 if args.fix else 1
+
+
+def verify_finance_balances(args):
+    """Recompute finance_balances from transactions / expenses / liabilities; --fix rewrites drift."""
+    from services.finance_balances import verify_finance_balances as verify
+    drift = verify(fix=args.fix)
+    for d in drift:
+        cols = ', '.join(f"{c} {d['cached'][c]} != {d['expected'][c]}" for c in d['columns'])
+        print(f"  {d['key']}: {cols}")
+    if not drift:
+        print("✓ finance_balances match transactions / expenses / liabilities")
+        return 0
+    print(f"{'✓ fixed' if args.fix else '✗ found'} {len(drift)} drifting bucket(s)")
+    return 0 if args.fix else 1
+
+
+def verify_customer_balances(args):
+    """Recompute customer_balances from orders; --fix rewrites drifting customers."""
+    from services.customer_balances import verify_customer_balances as verify
+    drift = verify(fix=args.fix)
+    for d in drift:
+        cols = ', '.join(f"{c} {d['cached'][c]} != {d['expected'][c]}" for c in d['columns'])
+        print(f"  customer {d['customer_id']}: {cols}")
+    if not drift:
+        print("✓ customer_balances match orders")
+        return 0
+    print(f"{'✓ fixed' if args.fix else '✗ found'} {len(drift)} drifting customer(s)")
+    return 0 if args.fix else 1
+
+
+def verify_payments_daily(args):
+    """Recompute payments_daily from payments; --fix rewrites drifting days."""
+    from services.payment_rollup import verify_payments_daily as verify
+    drift = verify(fix=args.fix)
+    for d in drift:
+        print(f"  {d['key']}: {d['cached']} != {d['expected']}")
+    if not drift:
+        print("✓ payments_daily matches payments")
+        return 0
+    print(f"{'✓ fixed' if args.fix else '✗ found'} {len(drift)} drifting day(s)")
+    return 0 if args.fix else 1
+
+
+def rebuild_search_index(args):
+    """Re-index customers, orders, transactions, swaps and products for full-text search."""
+    from services.search_index import rebuild_search_index as rebuild, search_ready
+    if not search_ready():
+        print("✗ no full-text search tables on this database (search uses LIKE)")
+        return 1
+    n = rebuild()
+    print(f"✓ search index rebuilt ({n} documents)")
+    return 0
+
+
+def purge_report_jobs(args):
+    """Delete expired background report jobs and their files."""
+    from services.report_jobs import purge_expired_report_jobs
+    n = purge_expired_report_jobs()
+    print(f"✓ purged {n} expired report job(s)")
+    return 0
+
+
+COMMANDS = {
+    'rebuild-revenue-rollup': rebuild_revenue_rollup,
+    'rebuild-stock-alerts': rebuild_stock_alerts,
+    'rebuild-fabric-parts': rebuild_fabric_parts,
+    'snapshot-stock': snapshot_stock,
+    'snapshot-ar-aging': snapshot_ar_aging,
+    'reconcile-stock': reconcile_stock,
+    'verify-fabric-totals': verify_fabric_totals,
+    'verify-finance-balances': verify_finance_balances,
+    'verify-customer-balances': verify_customer_balances,
+    'verify-payments-daily': verify_payments_daily,
+    'rebuild-search-index': rebuild_search_index,
+    'purge-report-jobs': purge_report_jobs,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--fix', action='store_true', help='reconcile-stock / verify-*: repair drift')
+    args = parser.parse_args(argv)
+    with app.app_context():
+        return COMMANDS[args.command](args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,9 @@ import json
 import re
 import secrets
 from datetime import datetime, timedelta
+from sqlalchemy import event
 from extensions import db, bcrypt
+from utils.phone import normalize_phone, reversed_phone
 
 # Low stock threshold for alert notifications (piece count)
 LOW_STOCK_ALERT_THRESHOLD = 5
@@ -156,9 +158,16 @@ class User(db.Model):
 
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        db.Index('ix_customers_phone_normalized', 'phone_normalized'),
+        db.Index('ix_customers_phone_reversed', 'phone_reversed'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(30), nullable=False)
+    # E.164 digits of phone (utils.phone) and the same reversed, for exact / ends-with lookups
+    phone_normalized = db.Column(db.String(20))
+    phone_reversed = db.Column(db.String(20))
     email = db.Column(db.String(120))
     address = db.Column(db.String(255))
     special_notes = db.Column(db.Text)
@@ -178,6 +187,13 @@ class Customer(db.Model):
         }
 
 
+@event.listens_for(Customer.phone, 'set')
+def _normalize_customer_phone(target, value, oldvalue, initiator):
+    """Keep phone_normalized / phone_reversed in step with every write to phone."""
+    target.phone_normalized = normalize_phone(value)
+    target.phone_reversed = reversed_phone(target.phone_normalized)
+
+
 class Measurement(db.Model):
     __tablename__ = 'measurements'
     id = db.Column(db.Integer, primary_key=True)
@@ -235,8 +251,38 @@ class Measurement(db.Model):
         }
 
 
+class MeasurementFabricPart(db.Model):
+    """
+    One row per part of Measurement.fabric_yard_breakdown (body, sleeve, collar, ...), kept in
+    sync by services.measurement_fabric_parts so yard reports can GROUP BY part in SQL.
+    """
+    __tablename__ = 'measurement_fabric_parts'
+    __table_args__ = (
+        db.UniqueConstraint('measurement_id', 'part', name='uq_measurement_fabric_part'),
+        db.Index('ix_measurement_fabric_parts_product_part', 'product_id', 'part'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    measurement_id = db.Column(
+        db.Integer, db.ForeignKey('measurements.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    # Copied from the measurement (derived data: no FKs, like stock_alerts)
+    product_id = db.Column(db.Integer, nullable=True)
+    product_color_id = db.Column(db.Integer, nullable=True, index=True)
+    part = db.Column(db.String(80), nullable=False, index=True)
+    yards = db.Column(db.Float, nullable=False, default=0)
+
+
 class Order(db.Model):
     __tablename__ = 'orders'
+    # Date-range reports filter on created_at (see utils.date_range); schema_indexes adds these to old DBs
+    __table_args__ = (
+        db.Index('ix_orders_created_at', 'created_at'),
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+        db.Index('ix_orders_customer_id', 'customer_id'),
+        db.Index('ix_orders_updated_at', 'updated_at'),
+        db.Index('ix_orders_completed_at', 'completed_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
     clothing_type = db.Column(db.String(120), nullable=False)
@@ -251,6 +297,9 @@ class Order(db.Model):
     payment_status = db.Column(db.String(20), default='unpaid')
     assigned_to = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # When status last moved to completed / delivered (finance_logic.set_order_status); NULL otherwise
+    completed_at = db.Column(db.DateTime)
     payments = db.relationship('Payment', backref='order', lazy='dynamic', cascade='all, delete-orphan')
 
     def balance_due(self):
@@ -274,11 +323,52 @@ class Order(db.Model):
             'balance_due': self.balance_due(),
             'assigned_to': self.assigned_to,
             'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
         }
 
 
+class OrderRevenueDaily(db.Model):
+    """
+    Rollup of orders per created day / clothing_type / status bucket.
+    Maintained from Order flushes (services.revenue_rollup); rebuild with
+    `python maintenance.py rebuild-revenue-rollup`.
+    """
+    __tablename__ = 'order_revenue_daily'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'clothing_type', 'status_bucket', name='uq_order_revenue_daily_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    clothing_type = db.Column(db.String(120), nullable=False, default='')
+    # done (completed/delivered) | open | cancelled
+    status_bucket = db.Column(db.String(20), nullable=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+
+class CustomerBalance(db.Model):
+    """
+    Per-customer order totals (count, value, advance paid), adjusted by delta on every
+    order flush (services.customer_balances); payments reach it through the order's
+    advance_paid. Verify with maintenance.py.
+    """
+    __tablename__ = 'customer_balances'
+
+    customer_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    order_total = db.Column(db.Float, nullable=False, default=0)
+    paid_total = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_created_at', 'created_at'),
+        db.Index('ix_payments_order_id_created_at', 'order_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -298,13 +388,37 @@ class Payment(db.Model):
         }
 
 
+class PaymentDaily(db.Model):
+    """
+    Payments per created day / payment_type (count, total), adjusted by delta on every
+    payment flush (services.payment_rollup). Verify with maintenance.py.
+    """
+    __tablename__ = 'payments_daily'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'payment_type', name='uq_payments_daily_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    payment_type = db.Column(db.String(30), nullable=False, default='')
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_transaction_date_currency', 'transaction_date', 'currency'),
+        db.Index('ix_transactions_created_at', 'created_at'),
+        db.Index('ix_transactions_account_type_code_date', 'account_type_code', 'transaction_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     currency = db.Column(db.String(10), default='KES')
     category = db.Column(db.String(80))
     # Account received | Receivable | Liability — controls financial section routing
     account_type = db.Column(db.String(40))
+    # received | receivable | liability — set alongside account_type (finance_logic.account_type_code)
+    account_type_code = db.Column(db.String(20))
     # Customer (receivable) or creditor/supplier (liability); optional
     counterparty = db.Column(db.String(200))
     # Optional link to customers table when user picks a customer
@@ -341,6 +455,31 @@ class Transaction(db.Model):
         }
 
 
+class ArAgingSnapshot(db.Model):
+    """
+    Accounts-receivable aging per customer for one as_of day (services.ar_aging): the
+    outstanding balance of open orders and receivable transactions split by age.
+    Written nightly by `python maintenance.py snapshot-ar-aging`.
+    """
+    __tablename__ = 'ar_aging_snapshots'
+    __table_args__ = (
+        db.Index('ix_ar_aging_snapshots_as_of_total', 'as_of', 'total'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    # Null for receivable transactions typed against a counterparty name only
+    customer_id = db.Column(db.Integer, nullable=True)
+    customer_name = db.Column(db.String(200), nullable=False, default='')
+    due_0_30 = db.Column(db.Float, nullable=False, default=0)
+    due_31_60 = db.Column(db.Float, nullable=False, default=0)
+    due_61_90 = db.Column(db.Float, nullable=False, default=0)
+    due_90_plus = db.Column(db.Float, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Liability(db.Model):
     """Amounts owed to suppliers / creditors (independent from customer orders)."""
     __tablename__ = 'liabilities'
@@ -403,8 +542,81 @@ class Expense(db.Model):
         }
 
 
+class FinanceBalance(db.Model):
+    """
+    Running sums of transactions (per currency / method / account_type_code), expenses and
+    liabilities, adjusted by delta on every flush (services.finance_balances) so the
+    finance and cashbook summaries do not rescan history. Verify with maintenance.py.
+    '' stands in for a missing key part (expenses and liabilities only use `source`).
+    """
+    __tablename__ = 'finance_balances'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'source', 'currency', 'method', 'account_type_code', name='uq_finance_balance_key'
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # transaction | expense | liability
+    source = db.Column(db.String(20), nullable=False)
+    currency = db.Column(db.String(10), nullable=False, default='')
+    method = db.Column(db.String(20), nullable=False, default='')
+    account_type_code = db.Column(db.String(20), nullable=False, default='')
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_total = db.Column(db.Float, nullable=False, default=0)
+    # Transactions: in - out (cashbook balance); 0 for the other sources
+    signed_total = db.Column(db.Float, nullable=False, default=0)
+    # Liabilities: sum of paid_amount; 0 for the other sources
+    paid_total = db.Column(db.Float, nullable=False, default=0)
+    # Transactions: earliest transaction_date in the bucket
+    first_date = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReportJob(db.Model):
+    """
+    Background PDF / export render (services.report_jobs). The finished file lives under
+    instance/report_jobs until expires_at. inflight_key is the dedup hash while the job is
+    queued or running (NULL afterwards), so identical requests share one job.
+    """
+    __tablename__ = 'report_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    inflight_key = db.Column(db.String(64), unique=True, nullable=True)
+    # queued | running | done | failed
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    error = db.Column(db.Text)
+    file_path = db.Column(db.String(255))
+    file_name = db.Column(db.String(255))
+    mimetype = db.Column(db.String(80))
+    size = db.Column(db.Integer)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params or '{}'),
+            'status': self.status,
+            'error': self.error,
+            'file_name': self.file_name,
+            'size': self.size,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
 class Swap(db.Model):
     __tablename__ = 'swaps'
+    __table_args__ = (db.Index('ix_swaps_created_at', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
     from_account = db.Column(db.String(20), default='KES')
     to_account = db.Column(db.String(20), default='USD')
@@ -530,6 +742,10 @@ class Inventory(db.Model):
     # Fabric: total purchased / on hand, and remaining after customer deductions
     total_yards = db.Column(db.Float, default=0)
     remaining_yards = db.Column(db.Float, nullable=True)
+    # Optimistic lock: every ORM UPDATE checks and bumps it (StaleDataError on a lost race)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __mapper_args__ = {'version_id_col': version}
 
     color_variants = db.relationship(
         'ProductColor',
@@ -589,6 +805,10 @@ class ProductColor(db.Model):
     yards_per_piece = db.Column(db.Float, default=0)
     remaining_yards = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optimistic lock, as on Inventory
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __mapper_args__ = {'version_id_col': version}
 
     @property
     def capacity_yards(self) -> float:
@@ -641,6 +861,22 @@ class ProductColor(db.Model):
         }
 
 
+class ProductFabricTotals(db.Model):
+    """
+    Per-product sums over product_colors, adjusted by delta on every color flush
+    (services.fabric_totals). Rebuild / verify with maintenance.py.
+    """
+    __tablename__ = 'product_fabric_totals'
+
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    color_count = db.Column(db.Integer, nullable=False, default=0)
+    capacity_yards = db.Column(db.Float, nullable=False, default=0)
+    remaining_yards = db.Column(db.Float, nullable=False, default=0)
+    used_yards = db.Column(db.Float, nullable=False, default=0)
+    pieces_equivalent = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class FabricUsage(db.Model):
     """Audit row: fabric/pieces deducted when a measurement is saved."""
     __tablename__ = 'fabric_usage'
@@ -654,6 +890,61 @@ class FabricUsage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class StockMovement(db.Model):
+    """
+    Append-only stock ledger, written by services.stock_ledger on every flush that changes
+    product / color stock. Product rows (product_color_id NULL) track quantity and remaining
+    yards; color rows track remaining yards and pieces_quantity. No FKs: history outlives
+    deleted products.
+    """
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        db.Index('ix_stock_movements_key', 'product_id', 'product_color_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    product_color_id = db.Column(db.Integer, nullable=True)
+    delta_yards = db.Column(db.Float, nullable=False, default=0)
+    delta_pieces = db.Column(db.Float, nullable=False, default=0)
+    # opening | create | edit | delete | adjust | restock | measurement | measurement_restore | color_sync | reconcile
+    reason = db.Column(db.String(30), nullable=False, default='edit')
+    # e.g. measurement id for measurement / measurement_restore
+    ref_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'product_color_id': self.product_color_id,
+            'delta_yards': self.delta_yards,
+            'delta_pieces': self.delta_pieces,
+            'reason': self.reason,
+            'ref_id': self.ref_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class StockSnapshot(db.Model):
+    """
+    Periodic stock balances. Rows of one snapshot share last_movement_id: balance =
+    snapshot + sum(stock_movements.id > last_movement_id). Keys with zero stock are omitted.
+    """
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        db.Index('ix_stock_snapshots_key', 'product_id', 'product_color_id', 'last_movement_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    last_movement_id = db.Column(db.Integer, nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    product_color_id = db.Column(db.Integer, nullable=True)
+    yards = db.Column(db.Float, nullable=False, default=0)
+    pieces = db.Column(db.Float, nullable=False, default=0)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Task(db.Model):
     __tablename__ = 'tasks'
     id = db.Column(db.Integer, primary_key=True)
@@ -677,8 +968,52 @@ class Task(db.Model):
         }
 
 
+class StockAlert(db.Model):
+    """
+    Precomputed low-stock alert (one row per alerting color or product), refreshed by
+    services.stock_alerts whenever stock for the product changes. Derived data: no
+    foreign keys, so product / color deletes are never blocked by it.
+    """
+    __tablename__ = 'stock_alerts'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'ref_id', name='uq_stock_alert_scope_ref'),
+        db.Index('ix_stock_alerts_sort', 'sort_group', 'sort_value', 'product_id', 'color_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # color | product
+    scope = db.Column(db.String(10), nullable=False)
+    # product_colors.id for scope=color, products.id for scope=product
+    ref_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    product_color_id = db.Column(db.Integer, nullable=True)
+    # color_fabric | fabric | quantity
+    alert_type = db.Column(db.String(20), nullable=False)
+    # Feed order: 0 colors, 1 fabric yards, 2 below min_stock, 3 below default threshold
+    sort_group = db.Column(db.Integer, nullable=False, default=0)
+    sort_value = db.Column(db.Float, nullable=False, default=0)
+    product_name = db.Column(db.String(120))
+    color_name = db.Column(db.String(120))
+    item_type = db.Column(db.String(60))
+    unit = db.Column(db.String(20))
+    quantity = db.Column(db.Float)
+    remaining_yards = db.Column(db.Float)
+    message = db.Column(db.String(80))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ChangeVersion(db.Model):
+    """Monotonic change counter per named data set (e.g. 'stock_alerts'), used for ETags / long-poll."""
+    __tablename__ = 'change_versions'
+    name = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class LowStockAlertRead(db.Model):
     __tablename__ = 'low_stock_alert_reads'
+    __table_args__ = (db.UniqueConstraint('user_id', 'inventory_id', name='uq_user_inventory_read'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     inventory_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
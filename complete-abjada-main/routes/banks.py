@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import OperationalError
 from extensions import db
 from models import Bank, User
+from utils.pagination import paginate
 
 banks_bp = Blueprint('banks', __name__)
 
@@ -19,13 +20,6 @@ def _ensure_banks_table():
             raise
 
 
-def _paginate(q, default_per=25):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
-
-
 def _next_account_number():
     """Generate next account number like ACC-0040."""
     last = Bank.query.order_by(Bank.id.desc()).first()
@@ -37,15 +31,8 @@ def _next_account_number():
 @jwt_required()
 def list_banks():
     _ensure_banks_table()
-    q = Bank.query.order_by(Bank.created_at.desc())
-    pag = _paginate(q)
-    items = [b.to_dict() for b in pag.items]
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page
-    })
+    page = paginate(Bank.query, Bank.created_at, Bank.id)
+    return jsonify({'items': [b.to_dict() for b in page.items], **page.meta})
 
 
 @banks_bp.route('/<int:bid>', methods=['GET'])
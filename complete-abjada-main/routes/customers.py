@@ -1,36 +1,57 @@
+import re
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from extensions import db
 from models import Customer, Measurement, Inventory, ProductColor
 from services.fabric_service import sync_measurement_fabric
+from services.search_index import ranked, search_hits
 from services.yard_breakdown import resolve_fabric_totals
+from utils.pagination import paginate
+from utils.phone import normalize_phone, prefix_keys, prefix_range, suffix_key
 
 customers_bp = Blueprint('customers', __name__)
 
-def _paginate(q, default_per=20):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 500)
-    return q.paginate(page=page, per_page=per, error_out=False)
+# ?search= made only of phone characters is matched on the normalized phone columns.
+_PHONE_LIKE = re.compile(r'[\d\s+().-]+')
 
 @customers_bp.route('', methods=['GET'])
 @jwt_required()
 def list_customers():
     q = Customer.query
     search = request.args.get('search', '').strip()
-    if search:
-        q = q.filter(
-            Customer.full_name.ilike(f'%{search}%') |
-            Customer.phone.ilike(f'%{search}%') |
-            (Customer.email.isnot(None) & Customer.email.ilike(f'%{search}%'))
-        )
+    phone_key = suffix_key(search) if _PHONE_LIKE.fullmatch(search) else None
+    hits = None
+    if phone_key:
+        # "+254 712 ...", "0712 34..." and "...345678" all find the same customer.
+        q = q.filter(or_(
+            prefix_range(Customer.phone_reversed, phone_key),
+            *[prefix_range(Customer.phone_normalized, k) for k in prefix_keys(search)],
+        ))
+    elif search:
+        hits = search_hits(Customer, search)
+        if hits is None:
+            q = q.filter(
+                Customer.full_name.ilike(f'%{search}%') |
+                Customer.phone.ilike(f'%{search}%') |
+                (Customer.email.isnot(None) & Customer.email.ilike(f'%{search}%'))
+            )
     sort_dir = (request.args.get('sort_dir') or 'desc').lower()
     if sort_dir not in ('asc', 'desc'):
         sort_dir = 'desc'
-    order_col = Customer.created_at.asc() if sort_dir == 'asc' else Customer.created_at.desc()
-    pag = _paginate(q.order_by(order_col))
-    ids = [c.id for c in pag.items]
+    if hits is not None:
+        # Indexed search: best match first (sort_dir applies to plain listing only).
+        q, key = ranked(q, hits, Customer.id)
+        page = paginate(q, hits.c.score, Customer.id, default_per=20, max_per=500, min_pages=1, key=key)
+        customers = [row[0] for row in page.items]
+    else:
+        page = paginate(
+            q, Customer.created_at, Customer.id,
+            desc=sort_dir == 'desc', default_per=20, max_per=500, min_pages=1,
+        )
+        customers = page.items
+    ids = [c.id for c in customers]
     count_map = {}
     if ids:
         rows = (
@@ -41,16 +62,13 @@ def list_customers():
         )
         count_map = {int(r[0]): int(r[1]) for r in rows}
     items = []
-    for c in pag.items:
+    for c in customers:
         d = c.to_dict()
         d['has_measurements'] = count_map.get(c.id, 0) > 0
         items.append(d)
     out = {
         'items': items,
-        'total': pag.total,
-        'pages': pag.pages or 1,
-        'page': pag.page,
-        'per_page': pag.per_page,
+        **page.meta,
         'sort_dir': sort_dir,
     }
     if request.args.get('include_stats'):
@@ -67,6 +85,41 @@ def list_customers():
         }
     return jsonify(out)
 
+# Most customers one phone lookup returns (exact matches first, then ends-with matches).
+PHONE_LOOKUP_LIMIT = 20
+
+
+def _phone_match(c, match):
+    return {'id': c.id, 'full_name': c.full_name, 'phone': c.phone, 'match': match}
+
+
+def _phone_duplicates(phone, limit=PHONE_LOOKUP_LIMIT):
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return []
+    rows = Customer.query.filter(Customer.phone_normalized == normalized).order_by(Customer.id).limit(limit)
+    return [_phone_match(c, 'exact') for c in rows]
+
+
+@customers_bp.route('/lookup', methods=['GET'])
+@jwt_required()
+def lookup_by_phone():
+    """Customers by ?phone=: same normalized number first, then numbers ending in the typed digits."""
+    phone = (request.args.get('phone') or '').strip()
+    if not phone:
+        return jsonify({'error': 'phone required'}), 400
+    items = _phone_duplicates(phone)
+    key = suffix_key(phone)
+    if key and len(items) < PHONE_LOOKUP_LIMIT:
+        seen = [x['id'] for x in items]
+        q = Customer.query.filter(prefix_range(Customer.phone_reversed, key))
+        if seen:
+            q = q.filter(Customer.id.notin_(seen))
+        q = q.order_by(Customer.phone_reversed, Customer.id).limit(PHONE_LOOKUP_LIMIT - len(items))
+        items += [_phone_match(c, 'suffix') for c in q]
+    return jsonify({'phone_normalized': normalize_phone(phone), 'items': items})
+
+
 @customers_bp.route('/<int:cid>', methods=['GET'])
 @jwt_required()
 def get_customer(cid):
@@ -87,6 +140,13 @@ def create_customer():
     phone = data.get('phone')
     if not name or not phone:
         return jsonify({'error': 'Full name and phone required'}), 400
+    if not data.get('allow_duplicate'):
+        duplicates = _phone_duplicates(phone)
+        if duplicates:
+            return jsonify({
+                'error': f'A customer with phone {phone} already exists ({duplicates[0]["full_name"]})',
+                'duplicates': duplicates,
+            }), 409
     c = Customer(
         full_name=name,
         phone=phone,
@@ -125,7 +185,7 @@ def create_customer():
                 return d
 
         raw_bd = sub.get('yard_breakdown') or sub.get('fabric_yard_breakdown')
-        fabric_yards, bd_json, res_err = resolve_fabric_totals(sub.get('fabric_yards'), raw_bd)
+        fabric_yards, bd_json, res_err, _ = resolve_fabric_totals(sub.get('fabric_yards'), raw_bd)
         if res_err:
             db.session.rollback()
             return jsonify({'error': res_err}), 400
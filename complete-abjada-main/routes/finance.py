@@ -1,10 +1,10 @@
 """Financial management: received payments, AR, liabilities, expenses, customer profiles."""
-from datetime import datetime, date
+from datetime import date, datetime
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func, or_, and_, cast, String
 from extensions import db
-from models import Order, Payment, Customer, Liability, Expense, User, Transaction
+from models import ArAgingSnapshot, Order, Payment, Customer, Liability, Expense, User, Transaction
 
 # Financial sections on /accounts are driven only by Transaction.account_type
 AT_RECEIVED = 'Account received'
@@ -13,28 +13,33 @@ AT_LIABILITY = 'Liability'
 from role_helpers import is_super_admin_role
 
 
-def _account_type_eq(col, canonical_label):
-    """Match account_type case-insensitively (handles stray spaces in legacy rows)."""
-    return func.lower(func.trim(col)) == (canonical_label or '').strip().lower()
-from finance_logic import validate_order_amounts
+def _account_type_is(canonical_label):
+    """Indexed match on account_type_code (backfilled from legacy account_type text by schema_finance)."""
+    return Transaction.account_type_code == account_type_code(canonical_label)
+from finance_logic import account_type_code, validate_order_amounts
+from services.ar_aging import aging_row_dict, aging_select, aging_totals, latest_snapshot_date
+from services.customer_balances import customer_balance
+from services.finance_balances import finance_totals
+from services.pdf_cache import cached_pdf, send_cached_pdf
+from services.report_jobs import register_report_job
+from utils.date_range import filter_date_range_coalesce, parse_date
+from utils.pagination import paginate, paginate_offset
 
 finance_bp = Blueprint('finance', __name__)
 
+# PDF reports page through their rows this many at a time (no overall row cap).
+REPORT_BATCH_SIZE = 500
 
-def _paginate(q, default_per=25):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 200)
-    return q.paginate(page=page, per_page=per, error_out=False)
 
+# Transaction lists sort by transaction_date, falling back to created_at.
+_TX_DATE = func.coalesce(Transaction.transaction_date, Transaction.created_at)
 
-def _parse_date(s):
-    if not s:
-        return None
-    try:
-        return datetime.strptime(s[:10], '%Y-%m-%d').date()
-    except Exception:
-        return None
+
+def _paginate_transactions(q, default_per=25):
+    return paginate(
+        q, _TX_DATE, Transaction.id, default_per=default_per, max_per=200,
+        key=lambda t: (t.transaction_date or t.created_at, t.id),
+    )
 
 
 def _admin_required():
@@ -52,21 +57,13 @@ def finance_summary():
     if err:
         return err
 
-    # All three buckets come from the Transaction form (account_type routing)
-    total_received = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
-        _account_type_eq(Transaction.account_type, AT_RECEIVED)
-    ).scalar() or 0.0
-
-    total_receivable = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
-        _account_type_eq(Transaction.account_type, AT_RECEIVABLE)
-    ).scalar() or 0.0
-
-    total_liabilities = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
-        _account_type_eq(Transaction.account_type, AT_LIABILITY)
-    ).scalar() or 0.0
-
-    # Expenses
-    total_expenses = db.session.query(func.coalesce(func.sum(Expense.amount), 0)).scalar() or 0.0
+    # All three buckets come from the Transaction form (account_type routing); sums are
+    # kept in finance_balances, so this is one small read however long the history is.
+    totals = finance_totals()
+    total_received = totals[account_type_code(AT_RECEIVED)]
+    total_receivable = totals[account_type_code(AT_RECEIVABLE)]
+    total_liabilities = totals[account_type_code(AT_LIABILITY)]
+    total_expenses = totals['expense']
 
     net_balance = float(total_received) - float(total_expenses) - float(total_liabilities)
 
@@ -86,25 +83,20 @@ def received_payments_report():
     err = _admin_required()
     if err:
         return err
-    df = _parse_date(request.args.get('date_from'))
-    dt = _parse_date(request.args.get('date_to'))
+    df = parse_date(request.args.get('date_from'))
+    dt = parse_date(request.args.get('date_to'))
     search = (request.args.get('search') or '').strip().lower()
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_RECEIVED))
-    eff = func.date(func.coalesce(Transaction.transaction_date, Transaction.created_at))
-    if df:
-        q = q.filter(eff >= df)
-    if dt:
-        q = q.filter(eff <= dt)
+    q = Transaction.query.filter(_account_type_is(AT_RECEIVED))
+    q = filter_date_range_coalesce(q, Transaction.transaction_date, Transaction.created_at, df, dt)
     if search:
         like = '%' + search + '%'
         q = q.filter(or_(
             Transaction.details.ilike(like),
             Transaction.counterparty.ilike(like),
         ))
-    q = q.order_by(func.coalesce(Transaction.transaction_date, Transaction.created_at).desc())
-    pag = _paginate(q)
+    page = _paginate_transactions(q)
     items = []
-    for t in pag.items:
+    for t in page.items:
         items.append({
             'id': t.id,
             'amount': float(t.amount or 0),
@@ -116,12 +108,7 @@ def received_payments_report():
             'details': t.details,
             'currency': t.currency,
         })
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page,
-    })
+    return jsonify({'items': items, **page.meta})
 
 
 @finance_bp.route('/receivable', methods=['GET'])
@@ -131,17 +118,16 @@ def receivable_report():
     if err:
         return err
     search = (request.args.get('search') or '').strip().lower()
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_RECEIVABLE))
+    q = Transaction.query.filter(_account_type_is(AT_RECEIVABLE))
     if search:
         like = '%' + search + '%'
         q = q.filter(or_(
             Transaction.counterparty.ilike(like),
             Transaction.details.ilike(like),
         ))
-    q = q.order_by(func.coalesce(Transaction.transaction_date, Transaction.created_at).desc())
-    pag = _paginate(q, default_per=100)
+    page = _paginate_transactions(q, default_per=100)
     rows = []
-    for t in pag.items:
+    for t in page.items:
         amt = float(t.amount or 0)
         pa_raw = getattr(t, 'paid_amount', None)
         pa_f = float(pa_raw) if pa_raw is not None else 0.0
@@ -156,7 +142,53 @@ def receivable_report():
             'payment_status': getattr(t, 'payment_status', None) or 'unpaid',
             'details': t.details,
         })
-    return jsonify({'items': rows, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    return jsonify({'items': rows, **page.meta})
+
+
+def _ar_aging_query(params):
+    """
+    (as_of, 'snapshot' | 'live', query) for ?as_of= (default: latest snapshot) or ?live=1.
+    Rows are shaped like services.ar_aging.aging_select(); LookupError when the snapshot is missing.
+    """
+    live = (params.get('live') or '').strip().lower() in ('1', 'true')
+    as_of = None if live else (parse_date(params.get('as_of')) or latest_snapshot_date())
+    if as_of is None:
+        # No snapshot taken yet: fall back to computing it now.
+        live = True
+    if live:
+        as_of = datetime.utcnow().date()
+        rows = aging_select(as_of).subquery()
+        q, cols = db.session.query(rows), rows.c
+    else:
+        q, cols = ArAgingSnapshot.query.filter(ArAgingSnapshot.as_of == as_of), ArAgingSnapshot
+        if q.first() is None:
+            raise LookupError('No AR aging snapshot for this date')
+    search = (params.get('search') or '').strip()
+    if search:
+        q = q.filter(cols.customer_name.ilike('%' + search + '%'))
+    return as_of, 'live' if live else 'snapshot', q.order_by(cols.total.desc(), cols.customer_name)
+
+
+@finance_bp.route('/ar-aging', methods=['GET'])
+@jwt_required()
+def ar_aging_report():
+    """Outstanding AR per customer in 0–30 / 31–60 / 61–90 / 90+ day buckets (nightly snapshot or ?live=1)."""
+    err = _admin_required()
+    if err:
+        return err
+    try:
+        as_of, source, q = _ar_aging_query(request.args)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    # Live rows are GROUP BY results without an id to key a cursor on: page / per_page only.
+    page = paginate_offset(q, default_per=50, max_per=200)
+    return jsonify({
+        'as_of': as_of.isoformat(),
+        'source': source,
+        'buckets': aging_totals(q.order_by(None).subquery()),
+        'items': [aging_row_dict(r) for r in page.items],
+        **page.meta,
+    })
 
 
 @finance_bp.route('/liabilities', methods=['GET'])
@@ -165,9 +197,7 @@ def list_liabilities():
     err = _admin_required()
     if err:
         return err
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_LIABILITY)).order_by(
-        func.coalesce(Transaction.transaction_date, Transaction.created_at).desc()
-    )
+    q = Transaction.query.filter(_account_type_is(AT_LIABILITY))
     search = (request.args.get('search') or '').strip()
     if search:
         like = '%' + search + '%'
@@ -175,9 +205,9 @@ def list_liabilities():
             Transaction.counterparty.ilike(like),
             Transaction.details.ilike(like),
         ))
-    pag = _paginate(q)
+    page = _paginate_transactions(q)
     items = []
-    for t in pag.items:
+    for t in page.items:
         ps = (getattr(t, 'payment_status', None) or 'unpaid').lower()
         items.append({
             'id': t.id,
@@ -187,12 +217,7 @@ def list_liabilities():
             'status': ps,
             'details': t.details,
         })
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page,
-    })
+    return jsonify({'items': items, **page.meta})
 
 
 @finance_bp.route('/liabilities', methods=['POST'])
@@ -215,7 +240,7 @@ def create_liability():
     ld = data.get('liability_date')
     liability_date = None
     if ld:
-        liability_date = _parse_date(str(ld))
+        liability_date = parse_date(str(ld))
     L = Liability(
         creditor_name=name,
         phone=(data.get('phone') or '').strip() or None,
@@ -263,7 +288,7 @@ def update_liability(lid):
         L.description = (data.get('description') or '').strip() or None
     if 'liability_date' in data:
         ld = data.get('liability_date')
-        L.liability_date = _parse_date(str(ld)) if ld else None
+        L.liability_date = parse_date(str(ld)) if ld else None
     if L.paid_amount > L.amount + 1e-6:
         return jsonify({'error': 'paid_amount cannot exceed amount'}), 400
     db.session.commit()
@@ -314,9 +339,9 @@ def list_expenses():
     err = _admin_required()
     if err:
         return err
-    q = Expense.query.order_by(Expense.created_at.desc())
-    df = _parse_date(request.args.get('date_from'))
-    dt = _parse_date(request.args.get('date_to'))
+    q = Expense.query
+    df = parse_date(request.args.get('date_from'))
+    dt = parse_date(request.args.get('date_to'))
     cat = (request.args.get('category') or '').strip()
     if df:
         q = q.filter(and_(Expense.expense_date.isnot(None), Expense.expense_date >= df))
@@ -324,13 +349,8 @@ def list_expenses():
         q = q.filter(and_(Expense.expense_date.isnot(None), Expense.expense_date <= dt))
     if cat:
         q = q.filter(Expense.category.ilike('%' + cat + '%'))
-    pag = _paginate(q)
-    return jsonify({
-        'items': [x.to_dict() for x in pag.items],
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page,
-    })
+    page = paginate(q, Expense.created_at, Expense.id, max_per=200)
+    return jsonify({'items': [x.to_dict() for x in page.items], **page.meta})
 
 
 @finance_bp.route('/expenses', methods=['POST'])
@@ -351,7 +371,7 @@ def create_expense():
     if amt <= 0:
         return jsonify({'error': 'amount must be positive'}), 400
     ed = data.get('expense_date')
-    expense_date = _parse_date(str(ed)) if ed else date.today()
+    expense_date = parse_date(str(ed)) if ed else date.today()
     e = Expense(
         category=category,
         amount=amt,
@@ -385,7 +405,7 @@ def update_expense(eid):
         e.description = (data.get('description') or '').strip() or None
     if 'expense_date' in data:
         ed = data.get('expense_date')
-        e.expense_date = _parse_date(str(ed)) if ed else None
+        e.expense_date = parse_date(str(ed)) if ed else None
     db.session.commit()
     return jsonify(e.to_dict())
 
@@ -413,30 +433,30 @@ def customer_financial_profile(cid):
     c = Customer.query.get(cid)
     if not c:
         return jsonify({'error': 'Customer not found'}), 404
-    orders = list(c.orders.all())
-    total_orders = len(orders)
-    total_order_value = sum(float(o.total_price or 0) for o in orders)
-    total_paid = sum(float(o.advance_paid or 0) for o in orders)
-    remaining = max(0, round(total_order_value - total_paid, 2))
-    payment_history = []
-    for o in orders:
-        for p in o.payments.order_by(Payment.created_at.desc()).all():
-            payment_history.append({
-                'id': p.id,
-                'order_id': o.id,
-                'amount': p.amount,
-                'notes': p.notes,
-                'created_at': p.created_at.isoformat() if p.created_at else None,
-            })
-    payment_history.sort(key=lambda x: x.get('created_at') or '', reverse=True)
-    return jsonify({
-        'customer': c.to_dict(),
-        'total_orders': total_orders,
-        'total_order_value': round(total_order_value, 2),
-        'total_paid': round(total_paid, 2),
-        'remaining_balance': remaining,
-        'payment_history': payment_history,
-    })
+    q = (
+        db.session.query(Payment.id, Payment.order_id, Payment.amount, Payment.notes, Payment.created_at)
+        .join(Order, Order.id == Payment.order_id)
+        .filter(Order.customer_id == cid)
+    )
+    out = {'customer': c.to_dict(), **customer_balance(cid)}
+    # Optional ?page= / ?per_page= or ?cursor= on the payment history; without them the full list is returned.
+    if any(k in request.args for k in ('page', 'per_page', 'cursor')):
+        page = paginate(q, Payment.created_at, Payment.id, default_per=50, max_per=200)
+        rows = page.items
+        out['payment_history_page'] = page.meta
+    else:
+        rows = q.order_by(Payment.created_at.desc(), Payment.id.desc()).all()
+    out['payment_history'] = [
+        {
+            'id': p.id,
+            'order_id': p.order_id,
+            'amount': p.amount,
+            'notes': p.notes,
+            'created_at': p.created_at.isoformat() if p.created_at else None,
+        }
+        for p in rows
+    ]
+    return jsonify(out)
 
 
 # --- PDF reports & transaction documents (ReportLab) ---
@@ -454,21 +474,19 @@ def _transaction_to_pdf_dict(t):
     return d
 
 
-@finance_bp.route('/transactions/<int:tid>/pdf', methods=['GET'])
-@jwt_required()
-def transaction_document_pdf(tid):
-    err = _admin_required()
-    if err:
-        return err
-    t = Transaction.query.get(tid)
-    if not t:
-        return jsonify({'error': 'Transaction not found'}), 404
+def _transaction_document_cached(params):
+    """(CachedPdf, download name) for one transaction; params: tid, optional kind."""
     from utils.finance_pdf import (
+        DOCUMENT_TEMPLATE_VERSION,
         pdf_transaction_receipt,
         pdf_transaction_invoice,
         pdf_transaction_liability,
     )
-    kind = (request.args.get('kind') or '').strip().lower()
+    tid = int(params.get('tid'))
+    t = Transaction.query.get(tid)
+    if not t:
+        raise LookupError('Transaction not found')
+    kind = (params.get('kind') or '').strip().lower()
     at = (t.account_type or '').strip().lower()
     if not kind:
         if at == 'account received':
@@ -479,53 +497,93 @@ def transaction_document_pdf(tid):
             kind = 'liability'
         else:
             kind = 'receipt'
-    d = _transaction_to_pdf_dict(t)
     if kind == 'receipt':
-        buf = pdf_transaction_receipt(d)
-        fname = f'receipt_tx_{tid}.pdf'
+        render, fname = pdf_transaction_receipt, f'receipt_tx_{tid}.pdf'
     elif kind == 'invoice':
-        buf = pdf_transaction_invoice(d)
-        fname = f'invoice_tx_{tid}.pdf'
+        render, fname = pdf_transaction_invoice, f'invoice_tx_{tid}.pdf'
     elif kind in ('liability', 'statement'):
-        buf = pdf_transaction_liability(d)
-        fname = f'liability_tx_{tid}.pdf'
+        render, fname = pdf_transaction_liability, f'liability_tx_{tid}.pdf'
     else:
-        return jsonify({'error': 'Invalid kind; use receipt, invoice, or liability'}), 400
-    dl = request.args.get('download') == '1'
-    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
+        raise ValueError('Invalid kind; use receipt, invoice, or liability')
+    # The dict already carries the customer name it falls back to, so it is the whole source.
+    d = _transaction_to_pdf_dict(t)
+    entry = cached_pdf(f'tx-{render.__name__}', DOCUMENT_TEMPLATE_VERSION, d, lambda: render(d))
+    return entry, fname
 
 
-@finance_bp.route('/reports/received.pdf', methods=['GET'])
+def _transaction_document_file(params):
+    entry, fname = _transaction_document_cached(params)
+    return open(entry.path, 'rb'), fname
+
+
+@finance_bp.route('/transactions/<int:tid>/pdf', methods=['GET'])
 @jwt_required()
-def received_payments_pdf():
+def transaction_document_pdf(tid):
     err = _admin_required()
     if err:
         return err
+    try:
+        entry, fname = _transaction_document_cached({'tid': tid, 'kind': request.args.get('kind')})
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    dl = request.args.get('download') == '1'
+    return send_cached_pdf(entry, fname, as_attachment=dl)
+
+
+def _received_report_file(params):
     from utils.finance_pdf import pdf_received_report
-    df = _parse_date(request.args.get('date_from'))
-    dt = _parse_date(request.args.get('date_to'))
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_RECEIVED))
-    eff = func.date(func.coalesce(Transaction.transaction_date, Transaction.created_at))
-    if df:
-        q = q.filter(eff >= df)
-    if dt:
-        q = q.filter(eff <= dt)
+    df = parse_date(params.get('date_from'))
+    dt = parse_date(params.get('date_to'))
+    q = Transaction.query.filter(_account_type_is(AT_RECEIVED))
+    q = filter_date_range_coalesce(q, Transaction.transaction_date, Transaction.created_at, df, dt)
     q = q.order_by(func.coalesce(Transaction.transaction_date, Transaction.created_at).desc())
-    items = q.limit(500).all()
-    rows = []
-    for t in items:
-        rows.append({
-            'amount': float(t.amount or 0),
-            'method': t.method,
-            'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
-            'created_at': t.created_at.isoformat() if t.created_at else None,
-            'counterparty': (t.counterparty or '').strip() or None,
-            'details': t.details,
-            'currency': t.currency,
-        })
+    rows = ({
+        'amount': float(t.amount or 0),
+        'method': t.method,
+        'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
+        'created_at': t.created_at.isoformat() if t.created_at else None,
+        'counterparty': (t.counterparty or '').strip() or None,
+        'details': t.details,
+        'currency': t.currency,
+    } for t in q.yield_per(REPORT_BATCH_SIZE))
     buf = pdf_received_report(rows, str(df) if df else None, str(dt) if dt else None)
+    return buf, 'received_payments_report.pdf'
+
+
+@finance_bp.route('/reports/received.pdf', methods=['GET'])
+@jwt_required()
+def received_payments_pdf():
+    err = _admin_required()
+    if err:
+        return err
+    buf, fname = _received_report_file(request.args)
     dl = request.args.get('download') == '1'
-    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name='received_payments_report.pdf')
+    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
+
+
+def _receivable_report_file(params):
+    from utils.finance_pdf import pdf_receivable_report
+    q = Transaction.query.filter(_account_type_is(AT_RECEIVABLE))
+    q = q.order_by(func.coalesce(Transaction.transaction_date, Transaction.created_at).desc())
+
+    def rows():
+        for t in q.yield_per(REPORT_BATCH_SIZE):
+            amt = float(t.amount or 0)
+            pa_raw = getattr(t, 'paid_amount', None)
+            pa_f = float(pa_raw) if pa_raw is not None else 0.0
+            yield {
+                'amount': amt,
+                'paid_amount': round(pa_f, 2) if pa_raw is not None else None,
+                'balance_due': round(max(0.0, amt - pa_f), 2),
+                'method': getattr(t, 'method', None) or 'cash',
+                'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
+                'customer_name': (t.counterparty or '').strip() or '—',
+                'payment_status': getattr(t, 'payment_status', None) or 'unpaid',
+            }
+
+    return pdf_receivable_report(rows()), 'accounts_receivable_report.pdf'
 
 
 @finance_bp.route('/reports/receivable.pdf', methods=['GET'])
@@ -534,74 +592,113 @@ def receivable_report_pdf():
     err = _admin_required()
     if err:
         return err
-    from utils.finance_pdf import pdf_receivable_report
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_RECEIVABLE))
-    q = q.order_by(func.coalesce(Transaction.transaction_date, Transaction.created_at).desc())
-    items = q.limit(500).all()
-    rows = []
-    for t in items:
-        amt = float(t.amount or 0)
-        pa_raw = getattr(t, 'paid_amount', None)
-        pa_f = float(pa_raw) if pa_raw is not None else 0.0
-        rows.append({
-            'amount': amt,
-            'paid_amount': round(pa_f, 2) if pa_raw is not None else None,
-            'balance_due': round(max(0.0, amt - pa_f), 2),
-            'method': getattr(t, 'method', None) or 'cash',
-            'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
-            'customer_name': (t.counterparty or '').strip() or '—',
-            'payment_status': getattr(t, 'payment_status', None) or 'unpaid',
-        })
-    buf = pdf_receivable_report(rows)
+    buf, fname = _receivable_report_file(request.args)
     dl = request.args.get('download') == '1'
-    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name='accounts_receivable_report.pdf')
+    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
 
 
-@finance_bp.route('/reports/liabilities.pdf', methods=['GET'])
+def _ar_aging_report_file(params):
+    from utils.finance_pdf import pdf_ar_aging_report
+    as_of, _source, q = _ar_aging_query(params)
+    rows = (aging_row_dict(r) for r in q.yield_per(REPORT_BATCH_SIZE))
+    return pdf_ar_aging_report(rows, as_of.isoformat()), f'ar_aging_{as_of.isoformat()}.pdf'
+
+
+@finance_bp.route('/reports/ar-aging.pdf', methods=['GET'])
 @jwt_required()
-def liabilities_report_pdf():
+def ar_aging_report_pdf():
     err = _admin_required()
     if err:
         return err
+    try:
+        buf, fname = _ar_aging_report_file(request.args)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    dl = request.args.get('download') == '1'
+    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
+
+
+def _liabilities_report_file(params):
     from utils.finance_pdf import pdf_liabilities_report
-    q = Transaction.query.filter(_account_type_eq(Transaction.account_type, AT_LIABILITY)).order_by(
+    q = Transaction.query.filter(_account_type_is(AT_LIABILITY)).order_by(
         func.coalesce(Transaction.transaction_date, Transaction.created_at).desc()
     )
-    items = q.limit(500).all()
-    rows = []
-    for t in items:
-        ps = (getattr(t, 'payment_status', None) or 'unpaid').lower()
-        rows.append({
-            'amount': float(t.amount or 0),
-            'creditor_name': (t.counterparty or '').strip() or '—',
-            'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
-            'status': ps,
-            'details': t.details,
-        })
-    buf = pdf_liabilities_report(rows)
-    dl = request.args.get('download') == '1'
-    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name='liabilities_report.pdf')
+    rows = ({
+        'amount': float(t.amount or 0),
+        'creditor_name': (t.counterparty or '').strip() or '—',
+        'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
+        'status': (getattr(t, 'payment_status', None) or 'unpaid').lower(),
+        'details': t.details,
+    } for t in q.yield_per(REPORT_BATCH_SIZE))
+    return pdf_liabilities_report(rows), 'liabilities_report.pdf'
 
 
-@finance_bp.route('/reports/expenses.pdf', methods=['GET'])
+@finance_bp.route('/reports/liabilities.pdf', methods=['GET'])
 @jwt_required()
-def expenses_report_pdf():
+def liabilities_report_pdf():
     err = _admin_required()
     if err:
         return err
+    buf, fname = _liabilities_report_file(request.args)
+    dl = request.args.get('download') == '1'
+    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
+
+
+def _expenses_report_file(params):
     from utils.finance_pdf import pdf_expenses_report
     q = Expense.query.order_by(Expense.created_at.desc())
-    df = _parse_date(request.args.get('date_from'))
-    dt = _parse_date(request.args.get('date_to'))
-    cat = (request.args.get('category') or '').strip()
+    df = parse_date(params.get('date_from'))
+    dt = parse_date(params.get('date_to'))
+    cat = (params.get('category') or '').strip()
     if df:
         q = q.filter(and_(Expense.expense_date.isnot(None), Expense.expense_date >= df))
     if dt:
         q = q.filter(and_(Expense.expense_date.isnot(None), Expense.expense_date <= dt))
     if cat:
         q = q.filter(Expense.category.ilike('%' + cat + '%'))
-    items = q.limit(500).all()
-    rows = [x.to_dict() for x in items]
+    rows = (x.to_dict() for x in q.yield_per(REPORT_BATCH_SIZE))
     buf = pdf_expenses_report(rows, str(df) if df else None, str(dt) if dt else None)
+    return buf, 'expenses_report.pdf'
+
+
+@finance_bp.route('/reports/expenses.pdf', methods=['GET'])
+@jwt_required()
+def expenses_report_pdf():
+    err = _admin_required()
+    if err:
+        return err
+    buf, fname = _expenses_report_file(request.args)
     dl = request.args.get('download') == '1'
-    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name='expenses_report.pdf')
+    return send_file(buf, mimetype='application/pdf', as_attachment=dl, download_name=fname)
+
+
+def _report_params(*names):
+    """Job params for a report: the named keys, as non-empty strings."""
+    def prepare(params, user_id):
+        return {k: str(params[k]).strip() for k in names if params.get(k) not in (None, '')}
+    return prepare
+
+
+# Same documents, rendered off-request via POST /api/jobs (services.report_jobs).
+register_report_job(
+    'transaction_document', _transaction_document_file,
+    authorize=_admin_required, prepare=_report_params('tid', 'kind'),
+)
+register_report_job(
+    'received_report', _received_report_file,
+    authorize=_admin_required, prepare=_report_params('date_from', 'date_to'),
+)
+register_report_job(
+    'receivable_report', _receivable_report_file, authorize=_admin_required, prepare=_report_params(),
+)
+register_report_job(
+    'ar_aging_report', _ar_aging_report_file,
+    authorize=_admin_required, prepare=_report_params('as_of', 'live', 'search'),
+)
+register_report_job(
+    'liabilities_report', _liabilities_report_file, authorize=_admin_required, prepare=_report_params(),
+)
+register_report_job(
+    'expenses_report', _expenses_report_file,
+    authorize=_admin_required, prepare=_report_params('date_from', 'date_to', 'category'),
+)
@@ -1,37 +1,36 @@
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from extensions import db
-import json
 
 from models import (
     Customer,
     FabricUsage,
     Inventory,
     LowStockAlertRead,
-    Measurement,
     ProductColor,
+    StockMovement,
     LOW_FABRIC_YARDS_THRESHOLD,
 )
+from services.fabric_totals import fabric_totals
+from services.measurement_fabric_parts import part_totals as fabric_part_totals
+from services.search_index import ranked, search_hits
+from services.stock_alerts import refresh_stock_alerts
+from services.stock_ledger import ledger_balances, note_stock_reason
+from utils.pagination import paginate
 
 inventory_bp = Blueprint('inventory', __name__)
 
 
 def _fabric_totals_for_product(product_id: int):
-    rows = ProductColor.query.filter_by(product_id=product_id).all()
-    if not rows:
+    totals = fabric_totals(product_id)
+    if not totals:
         return None
-    cap = sum(c.capacity_yards for c in rows)
-    rem = sum(c.effective_remaining_yards() for c in rows)
-    used = sum(c.used_yards for c in rows)
-    qty_eq = sum(c.remaining_pieces_equivalent() for c in rows)
-    return {
-        'total_yards': round(cap, 4),
-        'remaining_yards': round(rem, 4),
-        'used_yards': round(used, 4),
-        'quantity_pieces_equivalent': round(qty_eq, 4),
-    }
+    totals.pop('color_count', None)
+    return totals
 
 
 def _norm(s):
@@ -106,7 +105,8 @@ def inventory_fabric_overview():
 def yard_usage_report():
     """
     Aggregated fabric usage: yards by product, by color, and sum of per-part
-    breakdown (body, sleeve, collar, …) across all measurements that stored yard_breakdown.
+    breakdown (body, sleeve, collar, …) across all measurements that stored yard_breakdown
+    (grouped in SQL over measurement_fabric_parts).
     """
     product_id = request.args.get('product_id', type=int)
 
@@ -126,27 +126,7 @@ def yard_usage_report():
         q2 = q2.filter(FabricUsage.product_id == product_id)
     yards_by_color = {int(r[0]): float(r[1] or 0) for r in q2.all()}
 
-    mq = Measurement.query.filter(Measurement.fabric_yard_breakdown.isnot(None))
-    if product_id:
-        mq = mq.filter(Measurement.product_id == product_id)
-    part_totals = {}
-    for m in mq.all():
-        try:
-            bd = json.loads(m.fabric_yard_breakdown)
-        except Exception:
-            continue
-        if not isinstance(bd, dict):
-            continue
-        for part, yds in bd.items():
-            k = str(part).strip().lower().replace(' ', '_').replace('-', '_')
-            if not k:
-                continue
-            try:
-                part_totals[k] = part_totals.get(k, 0.0) + float(yds)
-            except (TypeError, ValueError):
-                pass
-    for k in list(part_totals.keys()):
-        part_totals[k] = round(part_totals[k], 4)
+    part_totals = fabric_part_totals(product_id)
 
     return jsonify({
         'yards_used_by_product_id': yards_by_product,
@@ -155,12 +135,6 @@ def yard_usage_report():
     })
 
 
-def _paginate(q, default_per=50):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 500)
-    return q.paginate(page=page, per_page=per, error_out=False)
-
 @inventory_bp.route('', methods=['GET'])
 @jwt_required()
 def list_inventory():
@@ -176,17 +150,57 @@ def list_inventory():
     if low_fabric:
         rem_eff = func.coalesce(Inventory.remaining_yards, Inventory.total_yards)
         q = q.filter(Inventory.total_yards > 0, rem_eff < LOW_FABRIC_YARDS_THRESHOLD)
+    hits = search_hits(Inventory, search) if search else None
+    if hits is not None:
+        q, key = ranked(q, hits, Inventory.id)
+        page = paginate(q, hits.c.score, Inventory.id, default_per=50, max_per=500, min_pages=1, key=key)
+        return jsonify({'items': [row[0].to_dict() for row in page.items], **page.meta})
     if search:
         q = q.filter(Inventory.name.ilike('%' + search + '%'))
-    pag = _paginate(q.order_by(Inventory.created_at.desc(), Inventory.name))
+    page = paginate(q, Inventory.created_at, Inventory.id, default_per=50, max_per=500, min_pages=1)
+    return jsonify({'items': [i.to_dict() for i in page.items], **page.meta})
+
+@inventory_bp.route('/<int:iid>/stock-movements', methods=['GET'])
+@jwt_required()
+def stock_movements_for_product(iid):
+    """Stock ledger for this product and its colors, newest first (page / per_page)."""
+    if not Inventory.query.get(iid):
+        return jsonify({'error': 'Item not found'}), 404
+    q = StockMovement.query.filter(StockMovement.product_id == iid)
+    color_id = request.args.get('product_color_id', type=int)
+    if color_id:
+        q = q.filter(StockMovement.product_color_id == color_id)
+    page = paginate(q, StockMovement.id, StockMovement.id, default_per=100, max_per=500, min_pages=1)
+    return jsonify({'product_id': iid, 'items': [m.to_dict() for m in page.items], **page.meta})
+
+
+@inventory_bp.route('/<int:iid>/stock-at', methods=['GET'])
+@jwt_required()
+def stock_at(iid):
+    """Product / color balances at ?at=YYYY-MM-DD[THH:MM[:SS]] (UTC), from snapshot + ledger."""
+    if not Inventory.query.get(iid):
+        return jsonify({'error': 'Item not found'}), 404
+    raw = (request.args.get('at') or '').strip()
+    try:
+        at = datetime.fromisoformat(raw) if raw else None
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO date or datetime'}), 400
+    balances = ledger_balances(product_id=iid, at=at)
+    yards, pieces = balances.get((iid, None), (0.0, 0.0))
+    colors = [
+        {'product_color_id': cid, 'remaining_yards': y, 'pieces_quantity': p}
+        for (_, cid), (y, p) in sorted(balances.items(), key=lambda kv: kv[0][1] or 0)
+        if cid is not None
+    ]
     return jsonify({
-        'items': [i.to_dict() for i in pag.items],
-        'total': pag.total,
-        'pages': pag.pages or 1,
-        'page': pag.page,
-        'per_page': pag.per_page,
+        'product_id': iid,
+        'at': at.isoformat() if at else None,
+        'remaining_yards': yards,
+        'quantity': pieces,
+        'colors': colors,
     })
 
+
 @inventory_bp.route('/<int:iid>/fabric-usage', methods=['GET'])
 @jwt_required()
 def fabric_usage_for_product(iid):
@@ -280,6 +294,8 @@ def create_item():
     )
     db.session.add(i)
     try:
+        db.session.flush()
+        refresh_stock_alerts(i.id, inv=i, colors=[])
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
@@ -332,6 +348,7 @@ def update_item(iid):
         if ry > ty:
             return jsonify({'error': 'remaining_yards cannot exceed total_yards'}), 400
         i.remaining_yards = ry
+    refresh_stock_alerts(iid, inv=i)
     try:
         db.session.commit()
     except IntegrityError:
@@ -351,6 +368,8 @@ def delete_item(iid):
     except Exception:
         pass
     db.session.delete(i)
+    db.session.flush()
+    refresh_stock_alerts(iid, inv=None)
     db.session.commit()
     return jsonify({'ok': True, 'deleted_id': iid})
 
@@ -364,8 +383,10 @@ def adjust_stock(iid):
     delta = data.get('quantity', 0)
     if delta == 0:
         return jsonify(i.to_dict())
+    note_stock_reason(i, 'adjust')
     i.quantity = (i.quantity or 0) + float(delta)
     if i.quantity < 0:
         i.quantity = 0
+    refresh_stock_alerts(iid, inv=i)
     db.session.commit()
     return jsonify(i.to_dict())
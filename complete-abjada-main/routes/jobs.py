@@ -0,0 +1,94 @@
+"""Background report jobs: submit, poll, download (see services.report_jobs)."""
+import os
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, send_file, url_for
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from extensions import db
+from models import ReportJob
+from role_helpers import is_super_admin_role
+from services.report_jobs import job_kind, resume_report_jobs, submit_report_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+def _job_dict(job):
+    d = job.to_dict()
+    d['download_url'] = url_for('jobs.download_job', job_id=job.id) if job.status == 'done' else None
+    return d
+
+
+def _load_job(job_id):
+    """
+    (job, None) or (None, error response). Kinds with authorize() are shared by everyone it
+    admits; other jobs (params, file) are visible only to their creator and admins.
+    """
+    job = db.session.get(ReportJob, job_id)
+    kind = job_kind(job.kind) if job else None
+    if not job or not kind:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    if kind.authorize:
+        err = kind.authorize()
+        if err:
+            return None, err
+    elif job.created_by != int(get_jwt_identity()) and not is_super_admin_role(get_jwt().get('role')):
+        # Same answer as a missing id, so job ids cannot be probed.
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    return job, None
+
+
+@jobs_bp.route('', methods=['POST'])
+@jwt_required()
+def submit_job():
+    """Body: {"kind": "received_report", "params": {...}}. 202 with the (possibly shared) job."""
+    data = request.get_json() or {}
+    name = (data.get('kind') or '').strip()
+    kind = job_kind(name)
+    if not kind:
+        return jsonify({'error': 'Unknown job kind'}), 400
+    if kind.authorize:
+        err = kind.authorize()
+        if err:
+            return err
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    uid = int(get_jwt_identity())
+    if kind.prepare:
+        try:
+            params = kind.prepare(params, uid)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid params for this job kind'}), 400
+    job, shared = submit_report_job(name, params, uid)
+    out = _job_dict(job)
+    out['deduplicated'] = shared
+    return jsonify(out), 202
+
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    resume_report_jobs()
+    job, err = _load_job(job_id)
+    if err:
+        return err
+    return jsonify(_job_dict(job))
+
+
+@jobs_bp.route('/<int:job_id>/download', methods=['GET'])
+@jwt_required()
+def download_job(job_id):
+    job, err = _load_job(job_id)
+    if err:
+        return err
+    if job.status == 'failed':
+        return jsonify({'error': job.error or 'Job failed'}), 409
+    if job.status != 'done':
+        return jsonify({'error': 'Job not finished yet', 'status': job.status}), 409
+    expired = job.expires_at is not None and job.expires_at < datetime.utcnow()
+    if expired or not job.file_path or not os.path.isfile(job.file_path):
+        return jsonify({'error': 'Job output has expired'}), 410
+    return send_file(
+        job.file_path, mimetype=job.mimetype or 'application/octet-stream',
+        as_attachment=True, download_name=job.file_name or f'job_{job.id}',
+    )
@@ -107,7 +107,7 @@ def create_measurement():
                 return jsonify({'error': 'Invalid product_id'}), 400
 
     raw_bd = _raw_yard_breakdown_from_payload(data)
-    fabric_yards, bd_json, res_err = resolve_fabric_totals(data.get('fabric_yards'), raw_bd)
+    fabric_yards, bd_json, res_err, _ = resolve_fabric_totals(data.get('fabric_yards'), raw_bd)
     if res_err:
         return jsonify({'error': res_err}), 400
 
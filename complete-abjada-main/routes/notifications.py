@@ -1,51 +1,94 @@
 """Low stock alert notifications API (piece count + fabric yards + color variants)."""
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
+from sqlalchemy import Integer, and_, exists, literal, select
+from sqlalchemy.exc import IntegrityError
 from extensions import db
 from models import (
     Inventory,
     ProductColor,
+    StockAlert,
     LowStockAlertRead,
     LowStockColorAlertRead,
-    LOW_STOCK_ALERT_THRESHOLD,
     LOW_FABRIC_YARDS_THRESHOLD,
 )
+from services.change_versions import bump_version, current_version, wait_for_change
+from services.stock_alerts import STOCK_ALERTS_VERSION
 
-notifications_bp = Blueprint('notifications', __name__)
-
-
-def _collect_low_stock_product_ids():
-    """Product IDs that should appear in low-stock notifications."""
-    seen = set()
-    for i in Inventory.query.filter(
-        Inventory.min_stock.isnot(None),
-        Inventory.quantity <= Inventory.min_stock,
-    ).all():
-        seen.add(i.id)
-    rem_eff = func.coalesce(Inventory.remaining_yards, Inventory.total_yards)
-    for i in Inventory.query.filter(Inventory.total_yards > 0, rem_eff < LOW_FABRIC_YARDS_THRESHOLD).all():
-        seen.add(i.id)
-    for i in Inventory.query.filter(
-        Inventory.min_stock.is_(None),
-        Inventory.quantity <= LOW_STOCK_ALERT_THRESHOLD,
-    ).all():
-        seen.add(i.id)
-    return seen
+# Default cap for ?wait=N when LOW_STOCK_MAX_WAIT is not configured. A waiting request holds
+# its worker thread, so keep this well under gunicorn's worker timeout (30s) and run with
+# --threads (gthread) so waiters do not block everyone else.
+LOW_STOCK_MAX_WAIT = 10
 
-
-def _collect_low_stock_color_ids():
-    ids = set()
-    for c in ProductColor.query.all():
-        if c.stock_status() != 'ok':
-            ids.add(c.id)
-    return ids
+notifications_bp = Blueprint('notifications', __name__)
 
 
-def _effective_remaining_yards(inv):
-    if inv.remaining_yards is not None:
-        return float(inv.remaining_yards)
-    return float(inv.total_yards or 0)
+def _insert_missing_reads(model, target_col, user_id, alert_scope, alert_col):
+    """
+    INSERT ... SELECT a read row for every current alert of `alert_scope` the user has not
+    read yet: one statement, duplicates skipped by NOT EXISTS and the unique key.
+    Returns the number of rows inserted.
+    """
+    table = model.__table__
+    already_read = exists().where(table.c.user_id == user_id, table.c[target_col] == alert_col)
+    sel = select(literal(user_id, type_=Integer), alert_col).where(
+        StockAlert.scope == alert_scope, ~already_read
+    )
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).from_select(['user_id', target_col], sel).on_conflict_do_nothing()
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).from_select(['user_id', target_col], sel).on_conflict_do_nothing()
+    elif dialect == 'mysql':
+        stmt = table.insert().prefix_with('IGNORE').from_select(['user_id', target_col], sel)
+    else:
+        stmt = table.insert().from_select(['user_id', target_col], sel)
+    return db.session.execute(stmt).rowcount or 0
+
+
+def _alert_to_dict(a, read):
+    if a.scope == 'color':
+        return {
+            'id': a.product_color_id,
+            'scope': 'color',
+            'product_id': a.product_id,
+            'product_name': a.product_name or '',
+            'color_name': a.color_name,
+            'quantity': None,
+            'unit': None,
+            'item_type': a.item_type,
+            'read': read,
+            'alert_type': a.alert_type,
+            'remaining_yards': a.remaining_yards,
+            'message': a.message,
+        }
+    d = {
+        'id': a.product_id,
+        'scope': 'product',
+        'name': a.product_name,
+        'quantity': a.quantity,
+        'unit': a.unit or 'pcs',
+        'item_type': a.item_type,
+        'read': read,
+        'alert_type': a.alert_type,
+    }
+    if a.alert_type == 'fabric':
+        d['remaining_yards'] = a.remaining_yards
+    d['message'] = a.message
+    return d
+
+
+def _feed_etag(user_id, version):
+    return f'lowstock-{version}-{user_id}'
+
+
+def _with_etag(resp, etag):
+    resp.set_etag(etag)
+    # Per-user payload: browsers may keep it but must revalidate every time.
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
 
 
 @notifications_bp.route('/low-stock', methods=['GET'])
@@ -58,109 +101,48 @@ def list_low_stock_alerts():
         except (TypeError, ValueError):
             return jsonify({'error': 'Invalid user'}), 400
 
-    read_ids = {r.inventory_id for r in LowStockAlertRead.query.filter_by(user_id=user_id).all()}
-    read_color_ids = {r.product_color_id for r in LowStockColorAlertRead.query.filter_by(user_id=user_id).all()}
-
-    pids_with_color_rows = {r[0] for r in db.session.query(ProductColor.product_id).distinct().all()}
-
-    seen_inventory = set()
-    seen_color = set()
-    out = []
-
-    # Per-color fabric (most specific)
-    for c in ProductColor.query.order_by(ProductColor.product_id, ProductColor.color_name).all():
-        st = c.stock_status()
-        if st == 'ok':
-            continue
-        if c.id in seen_color:
-            continue
-        seen_color.add(c.id)
-        p = Inventory.query.get(c.product_id)
-        msg = 'Not Available' if st == 'not_available' else 'Low stock warning'
-        out.append({
-            'id': c.id,
-            'scope': 'color',
-            'product_id': c.product_id,
-            'product_name': p.name if p else '',
-            'color_name': c.color_name,
-            'quantity': None,
-            'unit': None,
-            'item_type': p.item_type if p else None,
-            'read': c.id in read_color_ids,
-            'alert_type': 'color_fabric',
-            'remaining_yards': round(c.effective_remaining_yards(), 4),
-            'message': msg,
-        })
-
-    # Legacy: fabric yards low on product row (no per-color split)
-    rem_eff = func.coalesce(Inventory.remaining_yards, Inventory.total_yards)
-    fabric_q = (
-        Inventory.query.filter(Inventory.total_yards > 0, rem_eff < LOW_FABRIC_YARDS_THRESHOLD)
-        .order_by(rem_eff.asc())
+    # Conditional GET: the ETag changes whenever alerts or read state change (any user).
+    # With ?wait=N and a matching If-None-Match, hold the request until that happens.
+    version = current_version(STOCK_ALERTS_VERSION)
+    etag = _feed_etag(user_id, version)
+    wait = request.args.get('wait', type=float)
+    if wait and wait > 0 and etag in request.if_none_match:
+        max_wait = current_app.config.get('LOW_STOCK_MAX_WAIT', LOW_STOCK_MAX_WAIT)
+        version = wait_for_change(STOCK_ALERTS_VERSION, version, min(wait, max_wait))
+        etag = _feed_etag(user_id, version)
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+        return _with_etag(resp, etag)
+
+    # Alerts are precomputed in stock_alerts (services.stock_alerts); one join picks up read state.
+    q = (
+        db.session.query(StockAlert, LowStockAlertRead.id, LowStockColorAlertRead.id)
+        .outerjoin(
+            LowStockAlertRead,
+            and_(
+                StockAlert.scope == 'product',
+                LowStockAlertRead.user_id == user_id,
+                LowStockAlertRead.inventory_id == StockAlert.product_id,
+            ),
+        )
+        .outerjoin(
+            LowStockColorAlertRead,
+            and_(
+                StockAlert.scope == 'color',
+                LowStockColorAlertRead.user_id == user_id,
+                LowStockColorAlertRead.product_color_id == StockAlert.product_color_id,
+            ),
+        )
+        .order_by(StockAlert.sort_group, StockAlert.sort_value, StockAlert.product_id, StockAlert.color_name)
     )
-    for i in fabric_q.all():
-        if i.id in seen_inventory:
-            continue
-        if i.id in pids_with_color_rows:
-            continue
-        seen_inventory.add(i.id)
-        rem = _effective_remaining_yards(i)
-        out.append({
-            'id': i.id,
-            'scope': 'product',
-            'name': i.name,
-            'quantity': i.quantity,
-            'unit': i.unit or 'pcs',
-            'item_type': i.item_type,
-            'read': i.id in read_ids,
-            'alert_type': 'fabric',
-            'remaining_yards': round(rem, 4),
-            'message': 'Stock is running low',
-        })
-
-    for i in Inventory.query.filter(
-        Inventory.min_stock.isnot(None),
-        Inventory.quantity <= Inventory.min_stock,
-    ).order_by(Inventory.quantity.asc()).all():
-        if i.id in seen_inventory:
-            continue
-        seen_inventory.add(i.id)
-        out.append({
-            'id': i.id,
-            'scope': 'product',
-            'name': i.name,
-            'quantity': i.quantity,
-            'unit': i.unit or 'pcs',
-            'item_type': i.item_type,
-            'read': i.id in read_ids,
-            'alert_type': 'quantity',
-            'message': None,
-        })
-
-    for i in Inventory.query.filter(
-        Inventory.min_stock.is_(None),
-        Inventory.quantity <= LOW_STOCK_ALERT_THRESHOLD,
-    ).order_by(Inventory.quantity.asc()).all():
-        if i.id in seen_inventory:
-            continue
-        seen_inventory.add(i.id)
-        out.append({
-            'id': i.id,
-            'scope': 'product',
-            'name': i.name,
-            'quantity': i.quantity,
-            'unit': i.unit or 'pcs',
-            'item_type': i.item_type,
-            'read': i.id in read_ids,
-            'alert_type': 'quantity',
-            'message': None,
-        })
-
-    return jsonify({
+    out = [_alert_to_dict(a, read_id is not None or color_read_id is not None) for a, read_id, color_read_id in q.all()]
+
+    resp = jsonify({
         'alerts': out,
         'unread_count': sum(1 for a in out if not a['read']),
         'low_fabric_threshold_yards': LOW_FABRIC_YARDS_THRESHOLD,
     })
+    return _with_etag(resp, etag)
 
 
 @notifications_bp.route('/low-stock/<int:inventory_id>/read', methods=['POST'])
@@ -179,7 +161,11 @@ def mark_low_stock_read(inventory_id):
     if not rec:
         rec = LowStockAlertRead(user_id=user_id, inventory_id=inventory_id)
         db.session.add(rec)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Marked read concurrently (another tab); the unique key kept one row.
+            db.session.rollback()
     return jsonify({'ok': True})
 
 
@@ -199,7 +185,10 @@ def mark_low_stock_color_read(color_id):
     if not rec:
         rec = LowStockColorAlertRead(user_id=user_id, product_color_id=color_id)
         db.session.add(rec)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
     return jsonify({'ok': True})
 
 
@@ -212,13 +201,14 @@ def mark_all_low_stock_read():
             user_id = int(user_id)
         except (TypeError, ValueError):
             return jsonify({'error': 'Invalid user'}), 400
-    for iid in _collect_low_stock_product_ids():
-        rec = LowStockAlertRead.query.filter_by(user_id=user_id, inventory_id=iid).first()
-        if not rec:
-            db.session.add(LowStockAlertRead(user_id=user_id, inventory_id=iid))
-    for cid in _collect_low_stock_color_ids():
-        rec = LowStockColorAlertRead.query.filter_by(user_id=user_id, product_color_id=cid).first()
-        if not rec:
-            db.session.add(LowStockColorAlertRead(user_id=user_id, product_color_id=cid))
+    inserted = _insert_missing_reads(
+        LowStockAlertRead, 'inventory_id', user_id, 'product', StockAlert.product_id
+    )
+    inserted += _insert_missing_reads(
+        LowStockColorAlertRead, 'product_color_id', user_id, 'color', StockAlert.product_color_id
+    )
+    if inserted:
+        # Core INSERTs skip the ORM flush hook that versions the feed.
+        bump_version(STOCK_ALERTS_VERSION)
     db.session.commit()
     return jsonify({'ok': True})
@@ -6,11 +6,13 @@ from werkzeug.utils import secure_filename
 from sqlalchemy import cast, String
 from extensions import db
 from models import Order, Customer
+from utils.pagination import paginate
 from datetime import datetime
 from finance_logic import (
     validate_order_amounts,
     sync_order_payment_status,
     apply_payment_status_payload,
+    set_order_status,
     PRODUCT_ORDER_PLACEHOLDER_PHONE,
 )
 
@@ -46,12 +48,6 @@ def get_or_create_product_order_customer():
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def _paginate(q, default_per=20):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
-
 @orders_bp.route('', methods=['GET'])
 @jwt_required()
 def list_orders():
@@ -92,19 +88,13 @@ def list_orders():
                 q = q.filter(Order.id == -1)
         else:
             q = q.filter(cast(Order.id, String).ilike('%' + search + '%'))
-    pag = _paginate(q.order_by(Order.created_at.desc()))
+    page = paginate(q, Order.created_at, Order.id, default_per=20, min_pages=1)
     items = []
-    for o in pag.items:
+    for o in page.items:
         d = o.to_dict()
         d['customer'] = o.customer.to_dict() if o.customer else None
         items.append(d)
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages or 1,
-        'page': pag.page,
-        'per_page': pag.per_page,
-    })
+    return jsonify({'items': items, **page.meta})
 
 @orders_bp.route('/<int:oid>', methods=['GET'])
 @jwt_required()
@@ -162,11 +152,11 @@ def create_order():
         design_description=data.get('design_description'),
         design_image=data.get('design_image'),
         delivery_date=delivery,
-        status=st,
         total_price=float(data.get('total_price') or 0),
         advance_paid=float(data.get('advance_paid') or 0),
         assigned_to=data.get('assigned_to')
     )
+    set_order_status(o, st)
     apply_payment_status_payload(o, data)
     ok, msg = validate_order_amounts(o.total_price, o.advance_paid)
     if not ok:
@@ -215,7 +205,7 @@ def update_order(oid):
     if 'status' in data:
         st = (data.get('status') or '').strip()
         if st in ALLOWED_ORDER_STATUSES:
-            o.status = st
+            set_order_status(o, st)
     if 'delivery_date' in data and data['delivery_date']:
         try:
             o.delivery_date = datetime.strptime(data['delivery_date'], '%Y-%m-%d').date()
@@ -230,6 +220,6 @@ def cancel_order(oid):
     o = Order.query.get(oid)
     if not o:
         return jsonify({'error': 'Order not found'}), 404
-    o.status = 'cancelled'
+    set_order_status(o, 'cancelled')
     db.session.commit()
     return jsonify(o.to_dict())
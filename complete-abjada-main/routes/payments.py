@@ -1,17 +1,22 @@
-from flask import Blueprint, request, jsonify, send_file
+import tempfile
+
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from extensions import db
 from models import Payment, Order, Customer, User
 from finance_logic import validate_order_amounts, sync_order_payment_status
+from services.pdf_cache import cached_pdf, send_cached_pdf
+from services.report_jobs import register_report_job
+from utils.date_range import filter_date_range, parse_date
+from utils.finance_pdf import REPORT_SPOOL_BYTES
+from utils.pagination import paginate
+from utils.zip_stream import iter_zip
 
 payments_bp = Blueprint('payments', __name__)
 
-def _paginate(q, default_per=20):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
-
+# Bulk invoice export: orders per request, and orders (+ payments) loaded per query.
+INVOICE_BATCH_LIMIT = 1000
+INVOICE_BATCH_SIZE = 100
 
 @payments_bp.route('/transactions', methods=['GET'])
 @jwt_required()
@@ -22,10 +27,9 @@ def list_transactions():
     claims = get_jwt()
     if not is_super_admin_role(claims.get('role')):
         return jsonify({'error': 'Super Admin access required'}), 403
-    q = Payment.query.order_by(Payment.created_at.desc())
-    pag = _paginate(q)
+    page = paginate(Payment.query, Payment.created_at, Payment.id, default_per=20)
     items = []
-    for p in pag.items:
+    for p in page.items:
         d = p.to_dict()
         if p.order:
             d['order'] = p.order.to_dict()
@@ -38,12 +42,7 @@ def list_transactions():
             d['order_total'] = None
             d['order_paid'] = None
         items.append(d)
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page
-    })
+    return jsonify({'items': items, **page.meta})
 
 
 @payments_bp.route('', methods=['GET'])
@@ -85,22 +84,130 @@ def create_payment():
     return jsonify(p.to_dict()), 201
 
 
+def _invoice_cached(params):
+    """(CachedPdf, download name) for one order; params: order_id, seller_email."""
+    order_id = int(params.get('order_id'))
+    order = Order.query.get(order_id)
+    if not order:
+        raise LookupError('Order not found')
+    if not order.customer:
+        raise LookupError('Customer not found')
+    payments = order.payments.order_by(Payment.id).all()
+    return _cache_invoice(order, payments, params.get('seller_email') or ''), f'invoice_order_{order_id}.pdf'
+
+
+def _cache_invoice(order, payments, seller_email):
+    from utils.invoice import INVOICE_TEMPLATE_VERSION, generate_invoice_pdf
+    source = {
+        'order': order.to_dict(),
+        'payments': [p.to_dict() for p in payments],
+        'seller_email': seller_email,
+    }
+    return cached_pdf(
+        'invoice', INVOICE_TEMPLATE_VERSION, source,
+        lambda: generate_invoice_pdf(order, payments, seller_email=seller_email),
+    )
+
+
+def _invoice_file(params):
+    entry, fname = _invoice_cached(params)
+    return open(entry.path, 'rb'), fname
+
+
+def _seller_email(user_id):
+    u = User.query.get(user_id) if user_id else None
+    return u.email if u else ''
+
+
 @payments_bp.route('/invoice/<int:order_id>', methods=['GET'])
 @jwt_required()
 def invoice_pdf(order_id):
-    order = Order.query.get(order_id)
-    if not order:
-        return jsonify({'error': 'Order not found'}), 404
-    customer = order.customer
-    if not customer:
-        return jsonify({'error': 'Customer not found'}), 404
-    payments = list(order.payments)
-    uid = get_jwt_identity()
-    u = User.query.get(uid) if uid else None
-    seller_email = u.email if u else ''
-    from utils.invoice import generate_invoice_pdf
-    buffer = generate_invoice_pdf(order, list(order.payments), seller_email=seller_email)
-    return send_file(
-        buffer, mimetype='application/pdf',
-        as_attachment=True, download_name=f'invoice_order_{order_id}.pdf'
+    try:
+        entry, fname = _invoice_cached({'order_id': order_id, 'seller_email': _seller_email(get_jwt_identity())})
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    return send_cached_pdf(entry, fname, as_attachment=True)
+
+
+def _batch_order_ids():
+    """(order ids, None) for ?order_ids=1,2,3 or ?date_from=&date_to= (order created_at), else (None, error)."""
+    raw = (request.args.get('order_ids') or '').strip()
+    q = db.session.query(Order.id).join(Customer, Customer.id == Order.customer_id)
+    if raw:
+        try:
+            wanted = sorted({int(x) for x in raw.split(',') if x.strip()})
+        except ValueError:
+            return None, (jsonify({'error': 'order_ids must be a comma-separated list of integers'}), 400)
+        if len(wanted) > INVOICE_BATCH_LIMIT:
+            return None, (jsonify({'error': f'At most {INVOICE_BATCH_LIMIT} orders per export'}), 400)
+        found = {oid for (oid,) in q.filter(Order.id.in_(wanted)).all()}
+        missing = [oid for oid in wanted if oid not in found]
+        if missing:
+            return None, (jsonify({'error': 'Order not found', 'order_ids': missing}), 404)
+        return wanted, None
+    date_from = parse_date(request.args.get('date_from'))
+    date_to = parse_date(request.args.get('date_to'))
+    if not date_from and not date_to:
+        return None, (jsonify({'error': 'order_ids or date_from / date_to required'}), 400)
+    q = filter_date_range(q, Order.created_at, date_from, date_to)
+    ids = [oid for (oid,) in q.order_by(Order.created_at, Order.id).limit(INVOICE_BATCH_LIMIT + 1).all()]
+    if len(ids) > INVOICE_BATCH_LIMIT:
+        return None, (jsonify({'error': f'More than {INVOICE_BATCH_LIMIT} orders in range; narrow the dates'}), 400)
+    if not ids:
+        return None, (jsonify({'error': 'No orders in this range'}), 404)
+    return ids, None
+
+
+def _iter_invoice_orders(ids):
+    """(order, payments) for ids in order, loaded INVOICE_BATCH_SIZE orders (and their payments) per query."""
+    for i in range(0, len(ids), INVOICE_BATCH_SIZE):
+        chunk = ids[i:i + INVOICE_BATCH_SIZE]
+        orders = {o.id: o for o in Order.query.filter(Order.id.in_(chunk)).all()}
+        payments = {}
+        for p in Payment.query.filter(Payment.order_id.in_(chunk)).order_by(Payment.order_id, Payment.id):
+            payments.setdefault(p.order_id, []).append(p)
+        for oid in chunk:
+            if oid in orders:
+                yield orders[oid], payments.get(oid, [])
+
+
+@payments_bp.route('/invoices', methods=['GET'])
+@jwt_required()
+def invoices_export():
+    """
+    Many invoices at once: ?order_ids=1,2,3 or ?date_from=&date_to=, with ?format=zip
+    (default; one cached PDF per order, streamed as each is ready) or ?format=pdf (one merged file).
+    """
+    fmt = (request.args.get('format') or 'zip').lower()
+    if fmt not in ('zip', 'pdf'):
+        return jsonify({'error': 'format must be zip or pdf'}), 400
+    ids, err = _batch_order_ids()
+    if err:
+        return err
+    seller_email = _seller_email(get_jwt_identity())
+    stem = f'invoices_{len(ids)}_orders'
+    if fmt == 'pdf':
+        from utils.invoice import generate_invoices_pdf
+        out = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+        generate_invoices_pdf(((o, p, seller_email) for o, p in _iter_invoice_orders(ids)), out)
+        out.seek(0)
+        return send_file(out, mimetype='application/pdf', as_attachment=True, download_name=f'{stem}.pdf')
+
+    def members():
+        for order, payments in _iter_invoice_orders(ids):
+            entry = _cache_invoice(order, payments, seller_email)
+            yield f'invoice_order_{order.id}.pdf', open(entry.path, 'rb')
+
+    return Response(
+        stream_with_context(iter_zip(members())),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={stem}.zip'},
     )
+
+
+def _invoice_job_params(params, user_id):
+    return {'order_id': int(params.get('order_id')), 'seller_email': _seller_email(user_id)}
+
+
+# Same invoice, rendered off-request via POST /api/jobs (services.report_jobs).
+register_report_job('invoice', _invoice_file, prepare=_invoice_job_params)
@@ -5,6 +5,7 @@ from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from extensions import db
 from models import Inventory, ProductColor, FabricUsage
+from services.stock_ledger import note_stock_reason
 from services.stock_sync import sync_product_quantity_from_colors
 
 product_colors_bp = Blueprint('product_colors', __name__)
@@ -70,7 +71,7 @@ def create_color(product_id):
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Duplicate color'}), 409
-    sync_product_quantity_from_colors(product_id)
+    sync_product_quantity_from_colors(product_id, changed_color_ids=[c.id])
     db.session.commit()
     return jsonify(c.to_dict()), 201
 
@@ -119,7 +120,7 @@ def update_color(product_id, color_id):
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Update failed'}), 409
-    sync_product_quantity_from_colors(product_id)
+    sync_product_quantity_from_colors(product_id, changed_color_ids=[color_id])
     db.session.commit()
     return jsonify(c.to_dict())
 
@@ -134,7 +135,7 @@ def delete_color(product_id, color_id):
         return jsonify({'error': 'Cannot delete: fabric has been used from this color'}), 409
     db.session.delete(c)
     db.session.commit()
-    sync_product_quantity_from_colors(product_id)
+    sync_product_quantity_from_colors(product_id, changed_color_ids=[color_id])
     db.session.commit()
     return jsonify({'ok': True})
 
@@ -150,6 +151,7 @@ def restock_color(product_id, color_id):
     add_pieces = int(data.get('add_pieces') or 0)
     add_yards = float(data.get('add_yards') or 0)
     ypp = float(c.yards_per_piece or 0)
+    note_stock_reason(c, 'restock')
 
     if add_pieces > 0:
         c.pieces_quantity = (c.pieces_quantity or 0) + add_pieces
@@ -160,6 +162,6 @@ def restock_color(product_id, color_id):
         c.remaining_yards = rem + add_yards
 
     db.session.commit()
-    sync_product_quantity_from_colors(product_id)
+    sync_product_quantity_from_colors(product_id, changed_color_ids=[color_id])
     db.session.commit()
     return jsonify(c.to_dict())
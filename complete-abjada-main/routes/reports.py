@@ -1,47 +1,83 @@
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select
 from extensions import db
 from models import Order, Payment, Customer, Inventory, Transaction, Swap, Bank
+from services.payment_rollup import MAX_DAYS, daily_payment_totals
+from services.sales_analytics import GRANULARITIES, MAX_BUCKETS, bucket_count, sales_series
+from services.search_index import search_hits
+from utils.date_range import filter_date_range, parse_date
+from utils.pagination import keyset_order, paginate
+from utils.table_export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_format, export_response
 
 reports_bp = Blueprint('reports', __name__)
 
+# ?format=csv|xlsx columns per report: (header, key in the row dict).
+ORDER_EXPORT_COLUMNS = (
+    ('Order #', 'id'), ('Created', 'created_at'), ('Customer', 'customer_name'), ('Customer ID', 'customer_id'),
+    ('Clothing type', 'clothing_type'), ('Status', 'status'), ('Total', 'total_price'), ('Paid', 'advance_paid'),
+    ('Balance due', 'balance_due'), ('Payment status', 'payment_status'), ('Delivery date', 'delivery_date'),
+    ('Completed', 'completed_at'), ('Fabric', 'fabric_details'), ('Design', 'design_description'),
+)
+PRODUCT_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Name', 'name'), ('Type', 'item_type'), ('Quantity', 'quantity'), ('Unit', 'unit'),
+    ('Min stock', 'min_stock'), ('Low stock', 'is_low_stock'), ('Price', 'price'), ('Total yards', 'total_yards'),
+    ('Remaining yards', 'remaining_yards'), ('Color category', 'color_category'), ('Created', 'created_at'),
+)
+TRANSACTION_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Date', 'transaction_date'), ('Type', 'transaction_type'), ('Category', 'category'),
+    ('Account type', 'account_type'), ('Counterparty', 'counterparty'), ('Amount', 'amount'),
+    ('Paid amount', 'paid_amount'), ('Currency', 'currency'), ('Method', 'method'),
+    ('Payment status', 'payment_status'), ('Details', 'details'), ('Created by', 'created_by'),
+    ('Created', 'created_at'),
+)
+EXCHANGE_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Date', 'created_at'), ('From', 'from_account'), ('To', 'to_account'),
+    ('From cash', 'from_cash_amount'), ('From digital', 'from_digital_amount'), ('To cash', 'to_cash_amount'),
+    ('To digital', 'to_digital_amount'), ('Rate', 'exchange_rate'), ('Details', 'details'),
+    ('Created by', 'created_by'),
+)
+ACCOUNT_EXPORT_COLUMNS = (
+    ('ID', 'id'), ('Name', 'name'), ('Account number', 'account_number'), ('Balance', 'balance'),
+    ('Created', 'created_at'),
+)
 
-def _parse_date(s, default=None):
-    if not s:
-        return default
-    try:
-        return datetime.strptime(str(s)[:10], '%Y-%m-%d').date()
-    except ValueError:
-        return default
 
+def _export(fmt, q, sort, id_col, columns, filename, *, desc=True, to_dict=lambda r: r.to_dict()):
+    """
+    Stream the filtered report query as CSV / XLSX in the JSON listing's order, reading
+    EXPORT_BATCH_SIZE rows per round trip (the result is never loaded as a whole).
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    rows = q.order_by(*keyset_order(sort, id_col, desc)).yield_per(EXPORT_BATCH_SIZE)
+    values = ([d.get(key) for _header, key in columns] for d in map(to_dict, rows))
+    sheet = filename.replace('_', ' ').title()
+    return export_response(fmt, filename, [header for header, _key in columns], values, sheet_name=sheet)
 
-def _paginate(q, default_per=50):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
 
+def _order_export_row(row):
+    d = row.Order.to_dict()
+    d['customer_name'] = row.customer_name
+    return d
 
-# --- Report endpoints with date range, search, filter ---
+
+# --- Report endpoints with date range, search, filter (?format=csv|xlsx streams the full result) ---
 
 @reports_bp.route('/orders', methods=['GET'])
 @jwt_required()
 def report_orders():
     """Orders report with date range, search, status filter."""
     q = Order.query.outerjoin(Customer, Order.customer_id == Customer.id)
-    date_from = _parse_date(request.args.get('date_from'))
-    date_to = _parse_date(request.args.get('date_to'))
+    date_from = parse_date(request.args.get('date_from'))
+    date_to = parse_date(request.args.get('date_to'))
     search = (request.args.get('search') or '').strip()
     category = (request.args.get('category') or '').strip()  # Inventory.item_type (category slug)
     product = (request.args.get('product') or '').strip()    # Inventory.name (stored in Order.clothing_type)
     customer_id = request.args.get('customer_id')
     status = request.args.get('status')
-    if date_from:
-        q = q.filter(func.date(Order.created_at) >= date_from)
-    if date_to:
-        q = q.filter(func.date(Order.created_at) <= date_to)
+    q = filter_date_range(q, Order.created_at, date_from, date_to)
     if category:
         # Order.clothing_type stores the inventory.product name (not item_type),
         # so map category -> inventory names -> order clothing_type.
@@ -60,21 +96,33 @@ def report_orders():
     if status:
         q = q.filter(Order.status == status)
     if search:
-        conds = [
-            Customer.full_name.ilike('%' + search + '%'),
-            Order.clothing_type.ilike('%' + search + '%')
-        ]
+        customer_hits = search_hits(Customer, search)
+        order_hits = search_hits(Order, search)
+        if customer_hits is not None and order_hits is not None:
+            conds = [
+                Order.customer_id.in_(select(customer_hits.c.id)),
+                Order.id.in_(select(order_hits.c.id)),
+            ]
+        else:
+            conds = [
+                Customer.full_name.ilike('%' + search + '%'),
+                Order.clothing_type.ilike('%' + search + '%')
+            ]
         if search.isdigit():
             conds.append(Order.id == int(search))
         q = q.filter(or_(*conds))
-    q = q.order_by(Order.created_at.desc())
-    pag = _paginate(q)
+    fmt = export_format()
+    if fmt:
+        q = q.add_columns(Customer.full_name.label('customer_name'))
+        return _export(fmt, q, Order.created_at, Order.id, ORDER_EXPORT_COLUMNS, 'orders_report',
+                       to_dict=_order_export_row)
+    page = paginate(q, Order.created_at, Order.id, default_per=50)
     items = []
-    for o in pag.items:
+    for o in page.items:
         d = o.to_dict()
         d['customer'] = o.customer.to_dict() if o.customer else None
         items.append(d)
-    return jsonify({'items': items, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    return jsonify({'items': items, **page.meta})
 
 
 @reports_bp.route('/products', methods=['GET'])
@@ -89,12 +137,16 @@ def report_products():
         q = q.filter(Inventory.item_type == item_type)
     if low_stock:
         q = q.filter(Inventory.min_stock.isnot(None), Inventory.quantity <= Inventory.min_stock)
-    if search:
+    hits = search_hits(Inventory, search) if search else None
+    if hits is not None:
+        q = q.filter(Inventory.id.in_(select(hits.c.id)))
+    elif search:
         q = q.filter(or_(Inventory.name.ilike('%' + search + '%'), Inventory.item_type.ilike('%' + search + '%')))
-    q = q.order_by(Inventory.name)
-    pag = _paginate(q)
-    items = [i.to_dict() for i in pag.items]
-    return jsonify({'items': items, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    fmt = export_format()
+    if fmt:
+        return _export(fmt, q, Inventory.name, Inventory.id, PRODUCT_EXPORT_COLUMNS, 'products_report', desc=False)
+    page = paginate(q, Inventory.name, Inventory.id, desc=False, default_per=50)
+    return jsonify({'items': [i.to_dict() for i in page.items], **page.meta})
 
 
 @reports_bp.route('/transactions', methods=['GET'])
@@ -102,18 +154,15 @@ def report_products():
 def report_transactions():
     """Transactions report with date range, search, currency, type filter."""
     q = Transaction.query
-    date_from = _parse_date(request.args.get('date_from'))
-    date_to = _parse_date(request.args.get('date_to'))
+    date_from = parse_date(request.args.get('date_from'))
+    date_to = parse_date(request.args.get('date_to'))
     search = (request.args.get('search') or '').strip()
     currency = request.args.get('currency')
     trans_type = request.args.get('transaction_type')
     category = (request.args.get('category') or '').strip()
     created_by = request.args.get('created_by')
     method = (request.args.get('method') or '').strip()
-    if date_from:
-        q = q.filter(func.date(Transaction.transaction_date) >= date_from)
-    if date_to:
-        q = q.filter(func.date(Transaction.transaction_date) <= date_to)
+    q = filter_date_range(q, Transaction.transaction_date, date_from, date_to)
     if currency:
         q = q.filter(Transaction.currency == currency)
     if trans_type:
@@ -127,16 +176,21 @@ def report_transactions():
             pass
     if method:
         q = q.filter(Transaction.method == method)
-    if search:
+    hits = search_hits(Transaction, search) if search else None
+    if hits is not None:
+        q = q.filter(Transaction.id.in_(select(hits.c.id)))
+    elif search:
         q = q.filter(or_(
             Transaction.details.ilike('%' + search + '%'),
             Transaction.category.ilike('%' + search + '%'),
             Transaction.currency.ilike('%' + search + '%')
         ))
-    q = q.order_by(Transaction.transaction_date.desc())
-    pag = _paginate(q)
-    items = [t.to_dict() for t in pag.items]
-    return jsonify({'items': items, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    fmt = export_format()
+    if fmt:
+        return _export(fmt, q, Transaction.transaction_date, Transaction.id, TRANSACTION_EXPORT_COLUMNS,
+                       'transactions_report')
+    page = paginate(q, Transaction.transaction_date, Transaction.id, default_per=50)
+    return jsonify({'items': [t.to_dict() for t in page.items], **page.meta})
 
 
 @reports_bp.route('/exchange', methods=['GET'])
@@ -144,15 +198,12 @@ def report_transactions():
 def report_exchange():
     """Exchange report - swaps/currency exchange."""
     q = Swap.query
-    date_from = _parse_date(request.args.get('date_from'))
-    date_to = _parse_date(request.args.get('date_to'))
+    date_from = parse_date(request.args.get('date_from'))
+    date_to = parse_date(request.args.get('date_to'))
     search = (request.args.get('search') or '').strip()
     exchange_type = (request.args.get('exchange_type') or '').strip().lower()
     created_by = request.args.get('created_by')
-    if date_from:
-        q = q.filter(func.date(Swap.created_at) >= date_from)
-    if date_to:
-        q = q.filter(func.date(Swap.created_at) <= date_to)
+    q = filter_date_range(q, Swap.created_at, date_from, date_to)
     if exchange_type == 'deposit':
         q = q.filter(Swap.details.ilike('%deposit%'))
     elif exchange_type == 'withdraw':
@@ -162,16 +213,20 @@ def report_exchange():
             q = q.filter(Swap.created_by == int(created_by))
         except (TypeError, ValueError):
             pass
-    if search:
+    hits = search_hits(Swap, search) if search else None
+    if hits is not None:
+        q = q.filter(Swap.id.in_(select(hits.c.id)))
+    elif search:
         q = q.filter(or_(
             Swap.details.ilike('%' + search + '%'),
             Swap.from_account.ilike('%' + search + '%'),
             Swap.to_account.ilike('%' + search + '%')
         ))
-    q = q.order_by(Swap.created_at.desc())
-    pag = _paginate(q)
-    items = [s.to_dict() for s in pag.items]
-    return jsonify({'items': items, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    fmt = export_format()
+    if fmt:
+        return _export(fmt, q, Swap.created_at, Swap.id, EXCHANGE_EXPORT_COLUMNS, 'exchange_report')
+    page = paginate(q, Swap.created_at, Swap.id, default_per=50)
+    return jsonify({'items': [s.to_dict() for s in page.items], **page.meta})
 
 
 @reports_bp.route('/swaps', methods=['GET'])
@@ -189,66 +244,88 @@ def report_accounts():
     search = (request.args.get('search') or '').strip()
     if search:
         q = q.filter(or_(Bank.name.ilike('%' + search + '%'), Bank.account_number.ilike('%' + search + '%')))
-    q = q.order_by(Bank.created_at.desc())
-    pag = _paginate(q)
-    items = [b.to_dict() for b in pag.items]
-    return jsonify({'items': items, 'total': pag.total, 'pages': pag.pages, 'page': pag.page})
+    fmt = export_format()
+    if fmt:
+        return _export(fmt, q, Bank.created_at, Bank.id, ACCOUNT_EXPORT_COLUMNS, 'accounts_report')
+    page = paginate(q, Bank.created_at, Bank.id, default_per=50)
+    return jsonify({'items': [b.to_dict() for b in page.items], **page.meta})
 
 @reports_bp.route('/sales', methods=['GET'])
 @jwt_required()
 def sales_report():
-    period = request.args.get('period', 'daily')  # daily, weekly, monthly
+    # ?date_from= / ?date_to= pick any range; ?period= (daily, weekly, monthly) is the
+    # default range ending today. Orders count on the day they were completed / delivered.
+    period = request.args.get('period', 'daily')
     today = datetime.utcnow().date()
     if period == 'daily':
         start = today
-        end = today
     elif period == 'weekly':
         start = today - timedelta(days=today.weekday())
-        end = today
     else:
         start = today.replace(day=1)
-        end = today
-    # Revenue from orders (advance_paid + completed full payments)
-    orders = Order.query.filter(
-        Order.status.in_(['completed', 'delivered']),
-        func.date(Order.updated_at) >= start,
-        func.date(Order.updated_at) <= end
-    ).all()
-    total_revenue = sum((o.total_price or 0) for o in orders)
-    total_orders = len(orders)
-    # By clothing type
-    by_type = {}
-    for o in orders:
-        by_type[o.clothing_type] = by_type.get(o.clothing_type, 0) + 1
+    start = parse_date(request.args.get('date_from'), start)
+    end = parse_date(request.args.get('date_to'), today)
+    granularity = (request.args.get('granularity') or 'day').strip().lower()
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+    if end < start:
+        return jsonify({'error': 'date_to is before date_from'}), 400
+    if bucket_count(start, end, granularity) > MAX_BUCKETS:
+        return jsonify({'error': f'Range too long for granularity {granularity} (max {MAX_BUCKETS} buckets)'}), 400
     return jsonify({
         'period': period,
+        'granularity': granularity,
         'start': str(start),
         'end': str(end),
-        'total_revenue': total_revenue,
-        'total_orders': total_orders,
-        'by_clothing_type': by_type
+        **sales_series(start, end, granularity),
     })
 
 @reports_bp.route('/income', methods=['GET'])
 @jwt_required()
 def daily_income():
-    day = request.args.get('date')
-    if day:
-        try:
-            target = datetime.strptime(day, '%Y-%m-%d').date()
-        except ValueError:
-            target = datetime.utcnow().date()
-    else:
-        target = datetime.utcnow().date()
-    payments = Payment.query.filter(func.date(Payment.created_at) == target).all()
-    total = sum(p.amount for p in payments)
+    # Totals only, from the payments_daily rollup; the payments themselves are paged by
+    # GET /income/payments.
+    target = parse_date(request.args.get('date'), datetime.utcnow().date())
+    day = daily_payment_totals(target, target)[0]
+    return jsonify(day)
+
+@reports_bp.route('/income/daily', methods=['GET'])
+@jwt_required()
+def daily_income_range():
+    # ?date_from= / ?date_to=, or ?days=N ending today (default 30): one row per day.
+    today = datetime.utcnow().date()
+    days = request.args.get('days', 30, type=int) or 30
+    end = parse_date(request.args.get('date_to'), today)
+    start = parse_date(request.args.get('date_from'), end - timedelta(days=days - 1))
+    if end < start:
+        return jsonify({'error': 'date_to is before date_from'}), 400
+    if (end - start).days + 1 > MAX_DAYS:
+        return jsonify({'error': f'At most {MAX_DAYS} days per request'}), 400
+    series = daily_payment_totals(start, end)
     return jsonify({
-        'date': str(target),
-        'total_income': total,
-        'payments_count': len(payments),
-        'payments': [p.to_dict() for p in payments]
+        'start': str(start),
+        'end': str(end),
+        'total_income': round(sum(d['total_income'] for d in series), 2),
+        'payments_count': sum(d['payments_count'] for d in series),
+        'days': series,
     })
 
+@reports_bp.route('/income/payments', methods=['GET'])
+@jwt_required()
+def income_payments():
+    # Payments behind /income (?date=) or /income/daily (?date_from= / ?date_to=), newest first.
+    target = parse_date(request.args.get('date'))
+    date_from = parse_date(request.args.get('date_from'), target)
+    date_to = parse_date(request.args.get('date_to'), target)
+    if date_from is None and date_to is None:
+        date_from = date_to = datetime.utcnow().date()
+    q = filter_date_range(Payment.query, Payment.created_at, date_from, date_to)
+    payment_type = request.args.get('payment_type')
+    if payment_type:
+        q = q.filter(Payment.payment_type == payment_type)
+    page = paginate(q, Payment.created_at, Payment.id, default_per=50, max_per=200)
+    return jsonify({'items': [p.to_dict() for p in page.items], **page.meta})
+
 @reports_bp.route('/best-customers', methods=['GET'])
 @jwt_required()
 def best_customers():
@@ -2,30 +2,17 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from models import Swap
+from utils.pagination import paginate
 
 swaps_bp = Blueprint('swaps', __name__)
 
 
-def _paginate(q, default_per=25):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
-
-
 @swaps_bp.route('', methods=['GET'])
 @jwt_required()
 def list_swaps():
     """List all swaps."""
-    q = Swap.query.order_by(Swap.created_at.desc())
-    pag = _paginate(q)
-    items = [s.to_dict() for s in pag.items]
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page
-    })
+    page = paginate(Swap.query, Swap.created_at, Swap.id)
+    return jsonify({'items': [s.to_dict() for s in page.items], **page.meta})
 
 
 @swaps_bp.route('', methods=['POST'])
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from models import Task, Order, User
+from finance_logic import set_order_status
 
 tasks_bp = Blueprint('tasks', __name__)
 
@@ -58,7 +59,7 @@ def create_task():
     db.session.add(t)
     order = Order.query.get(order_id)
     order.assigned_to = assigned_to
-    order.status = 'in_progress'
+    set_order_status(order, 'in_progress')
     db.session.commit()
     return jsonify(t.to_dict()), 201
 
@@ -74,7 +75,7 @@ def update_task(tid):
         if data['status'] == 'completed':
             t.completed_at = datetime.utcnow()
             if t.order:
-                t.order.status = 'completed'
+                set_order_status(t.order, 'completed')
     if 'progress_notes' in data:
         t.progress_notes = data['progress_notes']
     db.session.commit()
@@ -1,8 +1,13 @@
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func, case
+from sqlalchemy import func
 from extensions import db
 from models import Transaction, User, Customer
+from finance_logic import account_type_code
+from services.finance_balances import cashbook_balances
+from utils.pagination import paginate
 
 transactions_bp = Blueprint('transactions', __name__)
 
@@ -98,23 +103,13 @@ def _normalize_account_type(v):
 @transactions_bp.route('/summary', methods=['GET'])
 @jwt_required()
 def transaction_summary():
-    """Balance summary by currency. Methods: cash and mpesa (M-Pesa)."""
-    signed = case(
-        (Transaction.transaction_type == 'in', Transaction.amount),
-        (Transaction.transaction_type == 'out', -Transaction.amount),
-        else_=0
-    )
-    rows = db.session.query(
-        Transaction.currency,
-        Transaction.method,
-        func.sum(signed).label('balance')
-    ).group_by(Transaction.currency, Transaction.method).all()
-
-    first_dates = db.session.query(
-        Transaction.currency,
-        func.min(Transaction.transaction_date).label('first_date')
-    ).group_by(Transaction.currency).all()
-    first_by_currency = {r.currency: r.first_date for r in first_dates}
+    """Balance summary by currency. Methods: cash and mpesa (M-Pesa). Read from finance_balances."""
+    rows = cashbook_balances()
+    first_by_currency = {}
+    for r in rows:
+        cur = (r.currency or 'KES').upper()
+        if r.first_date and (first_by_currency.get(cur) is None or r.first_date < first_by_currency[cur]):
+            first_by_currency[cur] = r.first_date
 
     def _bucket(method):
         m = (method or 'cash').lower().replace(' ', '_').replace('-', '')
@@ -158,34 +153,55 @@ def transaction_summary():
     return jsonify(summary)
 
 
-def _paginate(q, default_per=25):
-    page = request.args.get('page', 1, type=int)
-    per = request.args.get('per_page', default_per, type=int)
-    per = min(per, 100)
-    return q.paginate(page=page, per_page=per, error_out=False)
+# Keys of Transaction.to_dict(), all plain columns; ?fields= picks from these plus created_by_name.
+TRANSACTION_LIST_FIELDS = (
+    'id', 'currency', 'category', 'account_type', 'counterparty', 'customer_id', 'amount',
+    'paid_amount', 'transaction_type', 'method', 'transaction_date', 'details',
+    'payment_status', 'created_by', 'created_at',
+)
+
+
+def _user_display_name():
+    """full_name, or username when it is empty (SQL expression; the users row must be joined)."""
+    return func.coalesce(func.nullif(User.full_name, ''), User.username)
+
+
+def _created_by_name(user_id) -> str:
+    u = db.session.get(User, user_id) if user_id else None
+    return (u.full_name or u.username) if u else '-'
 
 
 @transactions_bp.route('', methods=['GET'])
 @jwt_required()
 def list_transactions():
-    """List all shop transactions (currency, category, amount, type, method, date, details)."""
-    q = Transaction.query.order_by(Transaction.transaction_date.desc())
-    pag = _paginate(q)
+    """
+    List all shop transactions (currency, category, amount, type, method, date, details).
+    Optional ?fields=id,amount,... returns only those keys (id and transaction_date, the
+    paging key, are always included).
+    """
+    raw = (request.args.get('fields') or '').strip()
+    if raw:
+        wanted = {f.strip() for f in raw.split(',') if f.strip()}
+        unknown = sorted(wanted - set(TRANSACTION_LIST_FIELDS) - {'created_by_name'})
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        fields = [f for f in TRANSACTION_LIST_FIELDS if f in ('id', 'transaction_date') or f in wanted]
+        with_user = 'created_by_name' in wanted
+    else:
+        fields, with_user = list(TRANSACTION_LIST_FIELDS), True
+    cols = [getattr(Transaction, f) for f in fields]
+    if with_user:
+        q = db.session.query(*cols, _user_display_name()).outerjoin(User, User.id == Transaction.created_by)
+    else:
+        q = db.session.query(*cols)
+    page = paginate(q, Transaction.transaction_date, Transaction.id)
     items = []
-    for t in pag.items:
-        d = t.to_dict()
-        try:
-            u = User.query.get(t.created_by) if getattr(t, 'created_by', None) else None
-            d['created_by_name'] = (u.full_name or u.username) if u else '-'
-        except Exception:
-            d['created_by_name'] = '-'
+    for row in page.items:
+        d = {f: (v.isoformat() if isinstance(v, datetime) else v) for f, v in zip(fields, row)}
+        if with_user:
+            d['created_by_name'] = row[-1] or '-'
         items.append(d)
-    return jsonify({
-        'items': items,
-        'total': pag.total,
-        'pages': pag.pages,
-        'page': pag.page
-    })
+    return jsonify({'items': items, **page.meta})
 
 
 @transactions_bp.route('', methods=['POST'])
@@ -259,6 +275,7 @@ def create_transaction():
         currency=currency,
         category=cat,
         account_type=account_type,
+        account_type_code=account_type_code(account_type),
         counterparty=cp,
         customer_id=cid,
         amount=amount,
@@ -322,11 +339,7 @@ def get_transaction(tid: int):
     if not t:
         return jsonify({'error': 'Transaction not found'}), 404
     d = t.to_dict()
-    try:
-        u = User.query.get(t.created_by) if getattr(t, 'created_by', None) else None
-        d['created_by_name'] = (u.full_name or u.username) if u else '-'
-    except Exception:
-        d['created_by_name'] = '-'
+    d['created_by_name'] = _created_by_name(t.created_by)
     try:
         if getattr(t, 'customer_id', None):
             c = Customer.query.get(t.customer_id)
@@ -351,6 +364,7 @@ def update_transaction(tid: int):
         t.category = (data.get('category') or '').strip() or None
     if 'account_type' in data:
         t.account_type = _normalize_account_type(data.get('account_type'))
+        t.account_type_code = account_type_code(t.account_type)
     if 'amount' in data:
         try:
             t.amount = float(data.get('amount'))
@@ -419,11 +433,7 @@ def update_transaction(tid: int):
     db.session.commit()
 
     d = t.to_dict()
-    try:
-        u = User.query.get(t.created_by) if getattr(t, 'created_by', None) else None
-        d['created_by_name'] = (u.full_name or u.username) if u else '-'
-    except Exception:
-        d['created_by_name'] = '-'
+    d['created_by_name'] = _created_by_name(t.created_by)
     return jsonify(d)
 
 
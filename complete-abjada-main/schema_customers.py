@@ -0,0 +1,64 @@
+"""Normalized phone columns on customers for existing DBs, backfilled from customers.phone."""
+from sqlalchemy import inspect, text
+
+from utils.phone import normalize_phone, reversed_phone
+
+_BACKFILL_BATCH = 1000
+
+
+def apply_customer_schema_patches(db) -> None:
+    """Run after db.create_all() and before schema_indexes (which indexes these columns)."""
+    try:
+        insp = inspect(db.engine)
+    except Exception:
+        return
+
+    uri = str(db.engine.url)
+    is_sqlite = "sqlite" in uri
+    if "customers" not in insp.get_table_names():
+        return
+    cols = {c["name"] for c in insp.get_columns("customers")}
+
+    for name in ("phone_normalized", "phone_reversed"):
+        if name in cols:
+            continue
+        try:
+            if is_sqlite:
+                db.session.execute(text(f"ALTER TABLE customers ADD COLUMN {name} VARCHAR(20)"))
+            else:
+                db.session.execute(text(f"ALTER TABLE `customers` ADD COLUMN `{name}` VARCHAR(20) NULL"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    backfill_phone_normalized(db)
+
+
+def backfill_phone_normalized(db) -> int:
+    """Fill phone_normalized / phone_reversed where missing. Returns rows updated."""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            text(
+                "SELECT id, phone FROM customers WHERE phone_normalized IS NULL AND id > :last "
+                "ORDER BY id LIMIT :n"
+            ),
+            {"last": last_id, "n": _BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = []
+        for row in rows:
+            normalized = normalize_phone(row.phone)
+            if normalized:
+                params.append({"id": row.id, "n": normalized, "r": reversed_phone(normalized)})
+        if params:
+            db.session.execute(
+                text("UPDATE customers SET phone_normalized = :n, phone_reversed = :r WHERE id = :id"),
+                params,
+            )
+            updated += len(params)
+        db.session.commit()
+    return updated
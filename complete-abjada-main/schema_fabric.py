@@ -40,6 +40,9 @@ def apply_fabric_schema_patches(db) -> None:
     add_column_sqlite("products", "remaining_yards FLOAT")
     add_column_mysql("products", "`remaining_yards` FLOAT NULL")
 
+    add_column_sqlite("products", "version INTEGER NOT NULL DEFAULT 0")
+    add_column_mysql("products", "`version` INT NOT NULL DEFAULT 0")
+
     add_column_sqlite("measurements", "product_id INTEGER")
     add_column_mysql("measurements", "`product_id` INT NULL")
 
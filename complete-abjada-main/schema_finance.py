@@ -35,9 +35,60 @@ def apply_finance_schema_patches(db) -> None:
         except Exception:
             db.session.rollback()
 
+    def add_index(table: str, name: str, cols: str):
+        if name in {ix['name'] for ix in insp.get_indexes(table)}:
+            return
+        try:
+            if is_sqlite:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})'))
+            else:
+                db.session.execute(text(f'ALTER TABLE `{table}` ADD INDEX `{name}` ({cols})'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    def backfill_account_type_codes():
+        # Same label match the finance filters used before (LOWER(TRIM(account_type)));
+        # unknown legacy labels stay NULL and so stay out of every finance bucket.
+        from finance_logic import ACCOUNT_TYPE_CODES
+        whens = ' '.join(
+            f"WHEN '{label.lower()}' THEN '{code}'" for label, code in ACCOUNT_TYPE_CODES.items()
+        )
+        try:
+            db.session.execute(text(
+                f'UPDATE transactions SET account_type_code = CASE LOWER(TRIM(account_type)) {whens} END '
+                'WHERE account_type_code IS NULL AND account_type IS NOT NULL'
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    def backfill_order_timestamps():
+        from finance_logic import ORDER_DONE_STATUSES
+        done = ', '.join(f"'{s}'" for s in ORDER_DONE_STATUSES)
+        try:
+            db.session.execute(text(
+                f'UPDATE orders SET completed_at = COALESCE(updated_at, created_at) '
+                f'WHERE completed_at IS NULL AND LOWER(TRIM(status)) IN ({done})'
+            ))
+            db.session.execute(text('UPDATE orders SET updated_at = created_at WHERE updated_at IS NULL'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
     add_column_sqlite('orders', "payment_status VARCHAR(20) DEFAULT 'unpaid'")
     add_column_mysql('orders', "`payment_status` VARCHAR(20) DEFAULT 'unpaid'")
 
+    # Order.updated_at / completed_at (sales analytics). Done orders from before the column
+    # existed are counted on their created_at day.
+    add_column_sqlite('orders', 'updated_at DATETIME')
+    add_column_mysql('orders', '`updated_at` DATETIME NULL')
+    add_column_sqlite('orders', 'completed_at DATETIME')
+    add_column_mysql('orders', '`completed_at` DATETIME NULL')
+    backfill_order_timestamps()
+    add_index('orders', 'ix_orders_updated_at', 'updated_at')
+    add_index('orders', 'ix_orders_completed_at', 'completed_at')
+
     add_column_sqlite('transactions', 'payment_status VARCHAR(20)')
     add_column_mysql('transactions', '`payment_status` VARCHAR(20)')
 
@@ -53,6 +104,11 @@ def apply_finance_schema_patches(db) -> None:
     add_column_sqlite('transactions', 'paid_amount FLOAT')
     add_column_mysql('transactions', '`paid_amount` FLOAT NULL')
 
+    add_column_sqlite('transactions', 'account_type_code VARCHAR(20)')
+    add_column_mysql('transactions', '`account_type_code` VARCHAR(20) NULL')
+    backfill_account_type_codes()
+    add_index('transactions', 'ix_transactions_account_type_code_date', 'account_type_code, transaction_date')
+
     # TransactionCategory.allowed_users (older DBs created before this column)
     add_column_sqlite('transaction_categories', "allowed_users VARCHAR(80) DEFAULT 'all'")
     add_column_mysql('transaction_categories', "`allowed_users` VARCHAR(80) DEFAULT 'all'")
@@ -0,0 +1,43 @@
+"""Date-range report (see utils.date_range) and lookup indexes for existing SQLite / MySQL databases."""
+from sqlalchemy import inspect, text
+
+# (table, index name, columns) — keep in sync with the models' __table_args__
+REPORT_INDEXES = (
+    ("orders", "ix_orders_created_at", "created_at"),
+    ("orders", "ix_orders_status_created_at", "status, created_at"),
+    ("orders", "ix_orders_customer_id", "customer_id"),
+    ("customers", "ix_customers_phone_normalized", "phone_normalized"),
+    ("customers", "ix_customers_phone_reversed", "phone_reversed"),
+    ("transactions", "ix_transactions_transaction_date_currency", "transaction_date, currency"),
+    ("transactions", "ix_transactions_created_at", "created_at"),
+    ("payments", "ix_payments_created_at", "created_at"),
+    ("payments", "ix_payments_order_id_created_at", "order_id, created_at"),
+    ("swaps", "ix_swaps_created_at", "created_at"),
+)
+
+
+def apply_index_schema_patches(db) -> None:
+    """Run after db.create_all(). Safe to call multiple times."""
+    try:
+        insp = inspect(db.engine)
+    except Exception:
+        return
+
+    uri = str(db.engine.url)
+    is_sqlite = "sqlite" in uri
+    tables = set(insp.get_table_names())
+
+    def add_index(table: str, name: str, cols: str):
+        if table not in tables or name in {ix["name"] for ix in insp.get_indexes(table)}:
+            return
+        try:
+            if is_sqlite:
+                db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+            else:
+                db.session.execute(text(f"ALTER TABLE `{table}` ADD INDEX `{name}` ({cols})"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    for table, name, cols in REPORT_INDEXES:
+        add_index(table, name, cols)
@@ -0,0 +1,40 @@
+"""Unique (user_id, inventory_id) on low_stock_alert_reads for existing DBs."""
+from sqlalchemy import inspect, text
+
+
+def apply_notification_schema_patches(db) -> None:
+    try:
+        insp = inspect(db.engine)
+    except Exception:
+        return
+
+    uri = str(db.engine.url)
+    is_sqlite = "sqlite" in uri
+
+    def existing_index_names(table: str):
+        names = {ix["name"] for ix in insp.get_indexes(table)}
+        names.update(uc["name"] for uc in insp.get_unique_constraints(table) if uc.get("name"))
+        return names
+
+    def drop_duplicate_rows(table: str, cols: str):
+        # Keep the oldest row per key; derived table keeps MySQL happy (no self-reference in DELETE).
+        db.session.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM {table} GROUP BY {cols}) AS keep_rows)"
+        ))
+        db.session.commit()
+
+    def add_unique_index(table: str, name: str, cols: str):
+        if table not in insp.get_table_names() or name in existing_index_names(table):
+            return
+        try:
+            drop_duplicate_rows(table, cols)
+            if is_sqlite:
+                db.session.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+            else:
+                db.session.execute(text(f"ALTER TABLE `{table}` ADD UNIQUE INDEX `{name}` ({cols})"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    add_unique_index("low_stock_alert_reads", "uq_user_inventory_read", "user_id, inventory_id")
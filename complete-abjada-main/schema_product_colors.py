@@ -54,3 +54,6 @@ def apply_product_color_schema_patches(db) -> None:
 
     add_column_sqlite("products", "default_yards_per_piece REAL")
     add_column_mysql("products", "`default_yards_per_piece` DOUBLE NULL")
+
+    add_column_sqlite("product_colors", "version INTEGER NOT NULL DEFAULT 0")
+    add_column_mysql("product_colors", "`version` INT NOT NULL DEFAULT 0")
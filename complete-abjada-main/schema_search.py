@@ -0,0 +1,41 @@
+"""Full-text search shadow tables (see services.search_index): FTS5 on SQLite, FULLTEXT on MySQL."""
+from sqlalchemy import inspect, text
+
+
+def apply_search_schema_patches(db) -> None:
+    """Run after db.create_all(). Safe to call multiple times; other dialects keep ILIKE search."""
+    from services.search_index import SEARCH_INDEXES, reset_search_ready
+
+    try:
+        insp = inspect(db.engine)
+    except Exception:
+        return
+
+    dialect = db.engine.dialect.name
+    if dialect not in ("sqlite", "mysql"):
+        return
+    tables = set(insp.get_table_names())
+
+    for idx in SEARCH_INDEXES.values():
+        if idx.table in tables:
+            continue
+        cols = ", ".join(idx.fields)
+        if dialect == "sqlite":
+            # Prefix indexes make 2- and 3-character "jo*" queries (the customer picker) cheap.
+            ddl = (
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {idx.table} USING fts5("
+                f"{cols}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        else:
+            col_defs = ", ".join(f"`{c}` TEXT" for c in idx.fields)
+            ddl = (
+                f"CREATE TABLE IF NOT EXISTS `{idx.table}` (`id` INT NOT NULL PRIMARY KEY, {col_defs}, "
+                f"FULLTEXT KEY `ft_{idx.table}` ({cols})) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+            )
+        try:
+            db.session.execute(text(ddl))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    reset_search_ready()
@@ -0,0 +1,140 @@
+"""
+Accounts-receivable aging: outstanding balances per customer, split by age, in SQL.
+
+Sources are the same as the AR rules in finance_logic.order_is_accounts_receivable plus
+receivable transactions:
+  - orders not cancelled / not paid with total_price - advance_paid > 0.01, aged by created_at;
+  - Receivable transactions with amount - paid_amount > 0.01, aged by transaction_date.
+Walk-in product sales (the PRODUCT_ORDER_PLACEHOLDER_PHONE customer) are filtered out in
+the query. take_ar_aging_snapshot() stores one as_of day in ar_aging_snapshots.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, literal, or_, select, union_all
+
+from extensions import db
+from finance_logic import PRODUCT_ORDER_PLACEHOLDER_PHONE, account_type_code
+from models import ArAgingSnapshot, Customer, Order, Transaction
+from utils.date_range import day_start
+
+# (column, oldest age in days that still falls in the bucket); the last bucket is open-ended.
+AGING_BUCKETS = (
+    ('due_0_30', 30),
+    ('due_31_60', 60),
+    ('due_61_90', 90),
+    ('due_90_plus', None),
+)
+AGING_COLUMNS = tuple(name for name, _days in AGING_BUCKETS)
+
+# Balances at or below this are treated as settled (matches order_is_accounts_receivable).
+_SETTLED = 0.01
+
+
+def _bucket(col, as_of: date):
+    """CASE naming the aging bucket of `col` as of the end of `as_of` (undated rows count as oldest)."""
+    whens = [
+        (col >= day_start(as_of - timedelta(days=days)), name)
+        for name, days in AGING_BUCKETS if days is not None
+    ]
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+
+def _not_placeholder():
+    return or_(Customer.phone.is_(None), Customer.phone != PRODUCT_ORDER_PLACEHOLDER_PHONE)
+
+
+def _open_items(as_of: date):
+    """UNION ALL of (customer_id, customer_name, due, bucket) for every open AR item."""
+    order_due = func.coalesce(Order.total_price, 0) - func.coalesce(Order.advance_paid, 0)
+    orders = (
+        select(
+            Order.customer_id.label('customer_id'),
+            func.coalesce(Customer.full_name, '').label('customer_name'),
+            order_due.label('due'),
+            _bucket(Order.created_at, as_of).label('bucket'),
+        )
+        .join(Customer, Customer.id == Order.customer_id)
+        .where(
+            or_(Order.status.is_(None), Order.status != 'cancelled'),
+            func.lower(func.trim(func.coalesce(Order.payment_status, 'unpaid'))).in_(('unpaid', 'partial')),
+            order_due > _SETTLED,
+            _not_placeholder(),
+        )
+    )
+    tx_due = func.coalesce(Transaction.amount, 0) - func.coalesce(Transaction.paid_amount, 0)
+    receivables = (
+        select(
+            Transaction.customer_id.label('customer_id'),
+            func.coalesce(Customer.full_name, func.trim(Transaction.counterparty), '').label('customer_name'),
+            tx_due.label('due'),
+            _bucket(func.coalesce(Transaction.transaction_date, Transaction.created_at), as_of).label('bucket'),
+        )
+        .outerjoin(Customer, Customer.id == Transaction.customer_id)
+        .where(
+            Transaction.account_type_code == account_type_code('Receivable'),
+            func.lower(func.coalesce(Transaction.payment_status, 'unpaid')) != 'paid',
+            tx_due > _SETTLED,
+            _not_placeholder(),
+        )
+    )
+    return union_all(orders, receivables).subquery('ar_items')
+
+
+def aging_select(as_of: date):
+    """One row per customer: customer_id, customer_name, AGING_COLUMNS..., total, item_count."""
+    items = _open_items(as_of)
+    return (
+        select(
+            items.c.customer_id,
+            items.c.customer_name,
+            *[
+                func.sum(case((items.c.bucket == name, items.c.due), else_=0)).label(name)
+                for name in AGING_COLUMNS
+            ],
+            func.sum(items.c.due).label('total'),
+            func.count().label('item_count'),
+        )
+        .group_by(items.c.customer_id, items.c.customer_name)
+    )
+
+
+def aging_row_dict(row) -> dict:
+    d = {
+        'customer_id': row.customer_id,
+        'customer_name': row.customer_name or '—',
+        'item_count': int(row.item_count or 0),
+        'total': round(float(row.total or 0), 2),
+    }
+    for name in AGING_COLUMNS:
+        d[name] = round(float(getattr(row, name) or 0), 2)
+    return d
+
+
+def aging_totals(rows_subquery) -> dict:
+    """Sum of each bucket and the total over a subquery shaped like aging_select()."""
+    cols = AGING_COLUMNS + ('total',)
+    row = db.session.execute(
+        select(*[func.coalesce(func.sum(rows_subquery.c[c]), 0).label(c) for c in cols])
+    ).one()
+    return {c: round(float(getattr(row, c)), 2) for c in cols}
+
+
+def latest_snapshot_date() -> date | None:
+    return db.session.query(func.max(ArAgingSnapshot.as_of)).scalar()
+
+
+def take_ar_aging_snapshot(as_of: date | None = None) -> int:
+    """Replace the snapshot for as_of (default: today, UTC) with a fresh INSERT ... SELECT. Returns rows written."""
+    as_of = as_of or datetime.utcnow().date()
+    table = ArAgingSnapshot.__table__
+    agg = aging_select(as_of).subquery()
+    cols = ('customer_id', 'customer_name') + AGING_COLUMNS + ('total', 'item_count')
+    db.session.execute(table.delete().where(table.c.as_of == as_of))
+    res = db.session.execute(table.insert().from_select(
+        ['as_of', *cols, 'taken_at'],
+        select(literal(as_of, table.c.as_of.type), *[agg.c[c] for c in cols], literal(datetime.utcnow(), table.c.taken_at.type)),
+    ))
+    db.session.commit()
+    return res.rowcount
@@ -0,0 +1,82 @@
+"""Named change counters (change_versions table) for cheap ETags and long-poll wakeups.
+
+bump_version() increments a counter inside the flush that changes the data it tracks, so
+it commits (or rolls back) together with that data; bump_version_now() increments it
+afterwards in its own transaction, for counters too hot to lock in every writer.
+Either way the counter is shared by every worker process.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import ChangeVersion
+from services.delta_tracking import upsert_add
+
+# Wakes long-poll waiters in this process as soon as a bump commits.
+_changed = threading.Condition()
+
+_PENDING_KEY = 'change_versions_bumped'
+
+
+def bump_version(name: str, session=None) -> None:
+    """Increment counter `name` in the current transaction (creates it on first use)."""
+    session = session or db.session
+    # One upsert statement: concurrent first bumps of a new counter both land instead of
+    # racing UPDATE-then-INSERT into a duplicate key.
+    upsert_add(
+        session.connection(), ChangeVersion.__table__, dict(name=name), dict(version=1),
+        extra=dict(updated_at=datetime.utcnow()),
+    )
+    session.info.setdefault(_PENDING_KEY, set()).add(name)
+
+
+def bump_version_now(name: str) -> None:
+    """
+    Increment counter `name` in its own short transaction (for after_commit hooks), so
+    the writer that triggered it never holds the counter's row lock.
+    """
+    with db.engine.begin() as conn:
+        upsert_add(conn, ChangeVersion.__table__, dict(name=name), dict(version=1), extra=dict(updated_at=datetime.utcnow()))
+    with _changed:
+        _changed.notify_all()
+
+
+def current_version(name: str) -> int:
+    row = db.session.query(ChangeVersion.version).filter(ChangeVersion.name == name).first()
+    return int(row[0]) if row else 0
+
+
+def wait_for_change(name: str, seen: int, timeout: float, poll_interval: float = 2.0) -> int:
+    """
+    Block until counter `name` differs from `seen` or `timeout` seconds pass; returns the
+    latest version. Wakes immediately for commits in this process and re-reads the DB
+    every `poll_interval` seconds to pick up other workers.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        # End the read transaction so the next SELECT sees other connections' commits.
+        db.session.rollback()
+        v = current_version(name)
+        remaining = deadline - time.monotonic()
+        if v != seen or remaining <= 0:
+            return v
+        with _changed:
+            _changed.wait(min(poll_interval, remaining))
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_waiters(session):
+    if session.info.pop(_PENDING_KEY, None):
+        with _changed:
+            _changed.notify_all()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_pending(session):
+    session.info.pop(_PENDING_KEY, None)
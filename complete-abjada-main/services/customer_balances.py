@@ -0,0 +1,132 @@
+"""customer_balances: per-customer order totals maintained by delta on flush."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Customer, CustomerBalance, Order
+from services.delta_tracking import attrs_changed, old_value, track_history, upsert_add
+
+# Payments change a customer's balance only through Order.advance_paid (routes.payments).
+_TRACKED_ATTRS = ('customer_id', 'total_price', 'advance_paid')
+
+_SUM_COLUMNS = ('order_count', 'order_total', 'paid_total')
+
+track_history(Order, _TRACKED_ATTRS)
+
+
+def _contribution(get) -> tuple:
+    return 1, float(get('total_price') or 0), float(get('advance_paid') or 0)
+
+
+def _collect_deltas(session) -> dict:
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def add(get, sign):
+        customer_id = get('customer_id')
+        if customer_id is None:
+            return
+        d = deltas[customer_id]
+        for i, v in enumerate(_contribution(get)):
+            d[i] += sign * v
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(lambda a: getattr(obj, a), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            add(lambda a: old_value(obj, a), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Order) or obj in session.deleted:
+            continue
+        if not attrs_changed(obj, _TRACKED_ATTRS):
+            continue
+        add(lambda a: old_value(obj, a), -1)
+        add(lambda a: getattr(obj, a), 1)
+    return {
+        cid: d for cid, d in deltas.items()
+        if d[0] != 0 or any(abs(v) > 1e-9 for v in d[1:])
+    }
+
+
+def _upsert(conn, customer_id, delta) -> None:
+    upsert_add(
+        conn, CustomerBalance.__table__, dict(customer_id=customer_id),
+        dict(zip(_SUM_COLUMNS, delta)), extra=dict(updated_at=datetime.utcnow()),
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_customer_balance_deltas(session, flush_context):
+    conn = None
+    for customer_id, delta in _collect_deltas(session).items():
+        conn = conn or session.connection()
+        _upsert(conn, customer_id, delta)
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Customer)]
+    if removed:
+        table = CustomerBalance.__table__
+        (conn or session.connection()).execute(table.delete().where(table.c.customer_id.in_(removed)))
+
+
+def customer_balance(customer_id: int) -> dict:
+    """Cached order count / value / paid and the remaining balance for one customer."""
+    table = CustomerBalance.__table__
+    row = db.session.execute(select(table).where(table.c.customer_id == customer_id)).first()
+    count, total, paid = (int(row.order_count), float(row.order_total), float(row.paid_total)) if row else (0, 0.0, 0.0)
+    return {
+        'total_orders': count,
+        'total_order_value': round(total, 2),
+        'total_paid': round(paid, 2),
+        'remaining_balance': max(0, round(total - paid, 2)),
+    }
+
+
+def _scan_balances() -> dict:
+    """customer_id -> _SUM_COLUMNS values recomputed from orders (one GROUP BY)."""
+    rows = db.session.query(
+        Order.customer_id, func.count(Order.id), func.sum(Order.total_price), func.sum(Order.advance_paid)
+    ).group_by(Order.customer_id).all()
+    return {cid: [n, float(total or 0), float(paid or 0)] for cid, n, total, paid in rows}
+
+
+def verify_customer_balances(fix: bool = False) -> list[dict]:
+    """Recompute every customer's totals from orders and report (or repair) drift."""
+    expected = _scan_balances()
+    cached = {r.customer_id: r for r in CustomerBalance.query.populate_existing().all()}
+    drift = []
+    for customer_id in sorted(set(expected) | set(cached)):
+        want = expected.get(customer_id, [0, 0.0, 0.0])
+        row = cached.get(customer_id)
+        have = [getattr(row, c) or 0 for c in _SUM_COLUMNS] if row else [0, 0.0, 0.0]
+        bad = [c for c, w, h in zip(_SUM_COLUMNS, want, have) if abs(float(w) - float(h)) > 1e-4]
+        if not bad:
+            continue
+        drift.append({
+            'customer_id': customer_id,
+            'columns': bad,
+            'cached': dict(zip(_SUM_COLUMNS, have)),
+            'expected': dict(zip(_SUM_COLUMNS, want)),
+        })
+        if fix:
+            if row is None:
+                row = CustomerBalance(customer_id=customer_id)
+                db.session.add(row)
+            for c, w in zip(_SUM_COLUMNS, want):
+                setattr(row, c, w)
+    if fix and drift:
+        db.session.commit()
+    return drift
+
+
+def backfill_customer_balances_if_empty() -> bool:
+    """First run after upgrade: build the totals when orders exist but the table is empty."""
+    if CustomerBalance.query.first() is not None:
+        return False
+    if Order.query.first() is None:
+        return False
+    verify_customer_balances(fix=True)
+    return True
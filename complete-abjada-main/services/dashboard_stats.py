@@ -0,0 +1,191 @@
+"""Dashboard aggregates: one grouped scan each of orders and products, cached per role.
+
+Revenue figures (totals, 6-month chart, top products) read the order_revenue_daily rollup.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, case, event, func, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Customer, Inventory, Order, ProductColor
+from services.change_versions import bump_version_now, current_version
+from services.revenue_rollup import done_by_clothing_type, done_revenue_by_ranges, done_totals
+
+# Seconds a computed payload is served before the next request recomputes it.
+DASHBOARD_CACHE_TTL = 30
+
+DONE_STATUSES = ('completed', 'delivered')
+CLOSED_STATUSES = ('delivered', 'completed', 'cancelled')
+
+# Models whose committed changes make cached dashboard numbers stale.
+_WATCHED_MODELS = (Order, Inventory, ProductColor)
+
+# change_versions counter bumped after every commit with watched changes; cached payloads
+# are keyed on it, so a commit in any worker process makes every process rebuild on its next
+# request. It is bumped after the commit, in its own statement, so order / payment / fabric
+# writers do not serialize on its row lock; if that bump fails, other processes catch up
+# within DASHBOARD_CACHE_TTL.
+DASHBOARD_VERSION = 'dashboard'
+
+# key -> (dashboard version it was built at, expiry, payload)
+_cache: dict[str, tuple[int, float, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate_dashboard_cache() -> None:
+    """Drop every cached payload (all roles) in this process."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _cached(key: str, ttl: float, build):
+    # Read the version before building: a change committed mid-build leaves the entry
+    # under the older version, so the next request rebuilds instead of serving it.
+    version = current_version(DASHBOARD_VERSION)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == version and hit[1] > now:
+            return hit[2]
+    payload = build()
+    with _cache_lock:
+        _cache[key] = (version, now + ttl, payload)
+    return payload
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_watched_changes(session, flush_context):
+    if session.info.get('dashboard_stale'):
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _WATCHED_MODELS):
+            session.info['dashboard_stale'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('dashboard_stale', False):
+        invalidate_dashboard_cache()
+        try:
+            bump_version_now(DASHBOARD_VERSION)
+        except Exception as ex:
+            current_app.logger.warning('dashboard version bump failed: %s', ex)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('dashboard_stale', None)
+
+
+def _add_months(d, months: int):
+    idx = d.year * 12 + (d.month - 1) + months
+    return d.replace(year=idx // 12, month=idx % 12 + 1, day=1)
+
+
+def _month_bounds(today, count: int = 6):
+    """[(start, end), ...] calendar months, oldest first; end is exclusive."""
+    first = today.replace(day=1)
+    out = []
+    for i in range(count - 1, -1, -1):
+        start = _add_months(first, -i)
+        out.append((start, _add_months(start, 1)))
+    return out
+
+
+def _count_if(cond):
+    return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+
+def _employee_stats() -> dict:
+    from routes.orders import PRODUCT_ORDER_CUSTOMER_PHONE
+
+    placeholder_ids = select(Customer.id).where(Customer.phone == PRODUCT_ORDER_CUSTOMER_PHONE)
+    row = db.session.query(
+        func.count(Order.id),
+        _count_if(Order.status.notin_(CLOSED_STATUSES)),
+        select(func.count(Customer.id)).scalar_subquery(),
+    ).filter(Order.customer_id.notin_(placeholder_ids)).one()
+    return {
+        'mode': 'employee',
+        'tailor_orders_total': int(row[0] or 0),
+        'tailor_orders_open': int(row[1] or 0),
+        'active_customers': int(row[2] or 0),
+    }
+
+
+def _super_admin_stats() -> dict:
+    today = datetime.utcnow().date()
+    months = _month_bounds(today)
+    done = Order.status.in_(DONE_STATUSES)
+
+    # Orders: status counts in a single pass; revenue comes from the daily rollup.
+    orow = db.session.query(
+        func.count(Order.id),
+        _count_if(done),
+        _count_if(Order.status == 'pending'),
+        _count_if(Order.status == 'in_progress'),
+    ).one()
+    total_orders, completed, pending, in_progress = orow
+    _, total_revenue = done_totals()
+    month_revenue = done_revenue_by_ranges(months)
+
+    # Products: counts and stock totals in a single pass (+ two cheap scalar counts).
+    qty = func.coalesce(Inventory.quantity, 0)
+    prow = db.session.query(
+        func.count(Inventory.id),
+        func.coalesce(func.sum(Inventory.quantity), 0),
+        _count_if(and_(Inventory.min_stock.isnot(None), Inventory.quantity <= Inventory.min_stock)),
+        _count_if(qty <= 0),
+        select(func.count(ProductColor.id)).scalar_subquery(),
+        select(func.count(Customer.id)).scalar_subquery(),
+    ).one()
+    total_products, total_stock, low_stock_items, out_of_stock_items, color_variants_count, active_customers = prow
+
+    # Profit is not explicitly stored; expose zero so frontend can render consistently.
+    monthly_data = [
+        {'month': s.strftime('%Y-%m'), 'revenue': rev, 'profit': 0.0}
+        for (s, _), rev in zip(months, month_revenue)
+    ]
+
+    # Top products from completed/delivered orders (rollup grouped by clothing_type)
+    top_products = [{
+        'product': (ct or 'Unknown'),
+        'quantity_sold': n,
+        'price': (amount / n) if n else 0.0,
+        'total_sales': amount,
+        'profit': 0.0
+    } for ct, n, amount in done_by_clothing_type(limit=10)]
+
+    return {
+        'mode': 'super_admin',
+        'total_orders': int(total_orders or 0),
+        'completed_orders': int(completed or 0),
+        'pending_orders': int(pending or 0),
+        'in_progress_orders': int(in_progress or 0),
+        'total_revenue': float(total_revenue or 0),
+        'active_customers': int(active_customers or 0),
+        'monthly_revenue': month_revenue[-1] if month_revenue else 0.0,
+        'monthly_chart': monthly_data,
+        'total_products': int(total_products or 0),
+        'color_variants_count': int(color_variants_count or 0),
+        'inventory_overview_url': '/api/inventory/overview',
+        'inventory_yard_usage_report_url': '/api/inventory/yard-usage-report',
+        'total_stock': float(total_stock or 0),
+        'low_stock_items': int(low_stock_items or 0),
+        'out_of_stock_items': int(out_of_stock_items or 0),
+        'top_products': top_products,
+    }
+
+
+def dashboard_stats(mode: str, ttl: float = DASHBOARD_CACHE_TTL) -> dict:
+    """Return the dashboard payload for 'employee' or 'super_admin', from cache when fresh."""
+    if mode == 'employee':
+        return _cached('employee', ttl, _employee_stats)
+    return _cached('super_admin', ttl, _super_admin_stats)
@@ -0,0 +1,65 @@
+"""
+Shared plumbing for derived tables kept current by delta in Session after_flush listeners
+(rollups, balances, ledgers): old attribute values of flushed rows, and one-statement
+"add to bucket" upserts.
+"""
+from __future__ import annotations
+
+from sqlalchemy import and_, event, inspect
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def track_history(model, attrs) -> None:
+    """Make attribute history carry the previous value even when it was not loaded."""
+    for attr in attrs:
+        event.listen(getattr(model, attr), 'set', _noop, active_history=True)
+
+
+def old_value(obj, attr):
+    """attr as last loaded / flushed (the value a delta must subtract)."""
+    hist = inspect(obj).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    if hist.unchanged:
+        return hist.unchanged[0]
+    return getattr(obj, attr)
+
+
+def attrs_changed(obj, attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def upsert_add(conn, table, key: dict, sums: dict, extra: dict | None = None, on_update: dict | None = None) -> None:
+    """
+    Add `sums` to the row of `table` identified by `key` (its primary key or a unique
+    constraint), inserting key + sums + extra when the row does not exist yet. on_update
+    (default: extra) is also set on an existing row; its expressions may read the row.
+
+    One INSERT ... ON CONFLICT / ON DUPLICATE KEY statement on SQLite, PostgreSQL and MySQL,
+    so concurrent first deltas for a new key both land instead of racing to INSERT.
+    """
+    extra = extra or {}
+    values = {**key, **sums, **extra}
+    updates = {c: table.c[c] + v for c, v in sums.items()}
+    updates.update(extra if on_update is None else on_update)
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        conn.execute(insert(table).values(**values).on_conflict_do_update(index_elements=list(key), set_=updates))
+        return
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        conn.execute(insert(table).values(**values).on_duplicate_key_update(**updates))
+        return
+    res = conn.execute(
+        table.update().where(and_(*(table.c[c] == v for c, v in key.items()))).values(**updates)
+    )
+    if not res.rowcount:
+        conn.execute(table.insert().values(**values))
@@ -5,6 +5,8 @@ from datetime import datetime
 
 from extensions import db
 from models import FabricUsage, Inventory, Measurement, ProductColor
+from services.stock_alerts import refresh_stock_alerts
+from services.stock_ledger import note_stock_reason
 from services.stock_sync import sync_product_quantity_from_colors
 
 
@@ -12,6 +14,17 @@ class FabricError(Exception):
     """Business rule violation (insufficient stock, invalid input)."""
 
 
+def _locked(model, pk):
+    """
+    Load a stock row with SELECT ... FOR UPDATE (ignored on SQLite) and fresh values, so
+    concurrent deductions serialize; the models' version column catches anything else.
+    Lock order is always product, then color.
+    """
+    if pk is None:
+        return None
+    return db.session.get(model, pk, with_for_update=True, populate_existing=True)
+
+
 def _effective_remaining_yards(inv: Inventory) -> float:
     if inv.remaining_yards is not None:
         return float(inv.remaining_yards)
@@ -31,19 +44,23 @@ def restore_fabric_for_usage(usage: FabricUsage | None) -> None:
     if not usage:
         return
     if usage.product_color_id:
-        pc = ProductColor.query.get(usage.product_color_id)
+        parent = _locked(Inventory, usage.product_id)
+        pc = _locked(ProductColor, usage.product_color_id)
         if not pc:
             return
+        if parent:
+            note_stock_reason(parent, 'measurement_restore', usage.measurement_id)
         cur = pc.effective_remaining_yards()
         cap = pc.capacity_yards
         new_rem = cur + float(usage.yards_used or 0)
         if cap > 0:
             new_rem = min(new_rem, cap)
+        note_stock_reason(pc, 'measurement_restore', usage.measurement_id)
         _set_color_remaining(pc, new_rem)
-        sync_product_quantity_from_colors(usage.product_id)
+        sync_product_quantity_from_colors(usage.product_id, changed_color_ids=[pc.id])
         return
 
-    inv = Inventory.query.get(usage.product_id)
+    inv = _locked(Inventory, usage.product_id)
     if not inv:
         return
     cur = _effective_remaining_yards(inv)
@@ -51,9 +68,10 @@ def restore_fabric_for_usage(usage: FabricUsage | None) -> None:
     new_rem = cur + float(usage.yards_used or 0)
     if cap is not None:
         new_rem = min(new_rem, cap)
+    note_stock_reason(inv, 'measurement_restore', usage.measurement_id)
     _set_remaining(inv, new_rem)
     inv.quantity = (inv.quantity or 0) + float(usage.pieces_deducted or 0)
-    sync_product_quantity_from_colors(usage.product_id)
+    sync_product_quantity_from_colors(usage.product_id, changed_color_ids=[])
 
 
 def deduct_fabric(
@@ -78,7 +96,9 @@ def deduct_fabric(
         raise FabricError('Specify fabric_yards or pieces_to_deduct')
 
     if product_color_id:
-        pc = ProductColor.query.get(product_color_id)
+        # Parent first: the color sync below rewrites products.quantity.
+        parent = _locked(Inventory, product_id)
+        pc = _locked(ProductColor, product_color_id)
         if not pc:
             raise FabricError('Color variant not found')
         if pc.product_id != product_id:
@@ -89,6 +109,9 @@ def deduct_fabric(
             raise FabricError(
                 f'Not enough fabric: need {total_yards:.4f} yd but only {rem:.4f} yd available for this color'
             )
+        note_stock_reason(pc, 'measurement', measurement_id)
+        if parent:
+            note_stock_reason(parent, 'measurement', measurement_id)
         _set_color_remaining(pc, rem - total_yards)
 
         u = FabricUsage(
@@ -101,10 +124,10 @@ def deduct_fabric(
             created_at=datetime.utcnow(),
         )
         db.session.add(u)
-        sync_product_quantity_from_colors(product_id)
+        sync_product_quantity_from_colors(product_id, changed_color_ids=[pc.id])
         return u
 
-    inv = Inventory.query.get(product_id)
+    inv = _locked(Inventory, product_id)
     if not inv:
         raise FabricError('Product not found')
 
@@ -120,10 +143,12 @@ def deduct_fabric(
             f'Not enough pieces: need {pieces} but only {qty} available'
         )
 
+    note_stock_reason(inv, 'measurement', measurement_id)
     if total_yards > 0:
         _set_remaining(inv, rem - total_yards)
     if pieces > 0:
         inv.quantity = max(0.0, qty - pieces)
+    refresh_stock_alerts(product_id, inv=inv)
 
     u = FabricUsage(
         measurement_id=measurement_id,
@@ -0,0 +1,137 @@
+"""product_fabric_totals: per-product color sums maintained by delta on flush."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Inventory, ProductColor, ProductFabricTotals
+from services.delta_tracking import attrs_changed, old_value, track_history, upsert_add
+
+_TRACKED_ATTRS = ('remaining_yards', 'pieces_quantity', 'yards_per_piece')
+
+_SUM_COLUMNS = ('color_count', 'capacity_yards', 'remaining_yards', 'used_yards', 'pieces_equivalent')
+
+track_history(ProductColor, _TRACKED_ATTRS)
+
+
+def _contribution(get) -> tuple:
+    """One color's share of each _SUM_COLUMNS value (same rules as the ProductColor methods)."""
+    ypp = float(get('yards_per_piece') or 0)
+    cap = float(get('pieces_quantity') or 0) * ypp
+    rem_raw = get('remaining_yards')
+    rem = float(rem_raw) if rem_raw is not None else cap
+    return 1, cap, rem, max(0.0, cap - rem), (rem / ypp if ypp > 0 else 0.0)
+
+
+def _collect_deltas(session) -> dict:
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+
+    def add(product_id, contrib, sign):
+        d = deltas[product_id]
+        for i, v in enumerate(contrib):
+            d[i] += sign * v
+
+    for obj in session.new:
+        if isinstance(obj, ProductColor):
+            add(obj.product_id, _contribution(lambda a: getattr(obj, a)), 1)
+    for obj in session.deleted:
+        if isinstance(obj, ProductColor):
+            add(obj.product_id, _contribution(lambda a: old_value(obj, a)), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, ProductColor) or obj in session.deleted:
+            continue
+        if not attrs_changed(obj, _TRACKED_ATTRS):
+            continue
+        add(obj.product_id, _contribution(lambda a: old_value(obj, a)), -1)
+        add(obj.product_id, _contribution(lambda a: getattr(obj, a)), 1)
+    return {
+        pid: d for pid, d in deltas.items()
+        if d[0] != 0 or any(abs(v) > 1e-9 for v in d[1:])
+    }
+
+
+def _upsert(conn, product_id, delta) -> None:
+    upsert_add(
+        conn, ProductFabricTotals.__table__, dict(product_id=product_id),
+        dict(zip(_SUM_COLUMNS, delta)), extra=dict(updated_at=datetime.utcnow()),
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_fabric_total_deltas(session, flush_context):
+    conn = None
+    for product_id, delta in _collect_deltas(session).items():
+        conn = conn or session.connection()
+        _upsert(conn, product_id, delta)
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Inventory)]
+    if removed:
+        table = ProductFabricTotals.__table__
+        (conn or session.connection()).execute(table.delete().where(table.c.product_id.in_(removed)))
+
+
+def fabric_totals(product_id: int) -> dict | None:
+    """Cached sums for one product, or None when it has no colors."""
+    table = ProductFabricTotals.__table__
+    row = db.session.execute(select(table).where(table.c.product_id == product_id)).first()
+    if not row or not row.color_count:
+        return None
+    return {
+        'color_count': int(row.color_count),
+        'total_yards': round(float(row.capacity_yards), 4),
+        'remaining_yards': round(float(row.remaining_yards), 4),
+        'used_yards': round(float(row.used_yards), 4),
+        'quantity_pieces_equivalent': round(float(row.pieces_equivalent), 4),
+    }
+
+
+def _scan_totals() -> dict:
+    """product_id -> list of _SUM_COLUMNS values recomputed from every color row."""
+    out = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+    for c in ProductColor.query.all():
+        d = out[c.product_id]
+        for i, v in enumerate(_contribution(lambda a: getattr(c, a))):
+            d[i] += v
+    return out
+
+
+def verify_fabric_totals(fix: bool = False) -> list[dict]:
+    """Recompute every product's sums from product_colors and report (or repair) drift."""
+    expected = _scan_totals()
+    cached = {r.product_id: r for r in ProductFabricTotals.query.populate_existing().all()}
+    drift = []
+    for product_id in sorted(set(expected) | set(cached)):
+        want = expected.get(product_id, [0, 0.0, 0.0, 0.0, 0.0])
+        row = cached.get(product_id)
+        have = [getattr(row, c) or 0 for c in _SUM_COLUMNS] if row else [0, 0.0, 0.0, 0.0, 0.0]
+        bad = [c for c, w, h in zip(_SUM_COLUMNS, want, have) if abs(float(w) - float(h)) > 1e-4]
+        if not bad:
+            continue
+        drift.append({
+            'product_id': product_id,
+            'columns': bad,
+            'cached': dict(zip(_SUM_COLUMNS, have)),
+            'expected': dict(zip(_SUM_COLUMNS, want)),
+        })
+        if fix:
+            if row is None:
+                row = ProductFabricTotals(product_id=product_id)
+                db.session.add(row)
+            for c, w in zip(_SUM_COLUMNS, want):
+                setattr(row, c, w)
+    if fix and drift:
+        db.session.commit()
+    return drift
+
+
+def backfill_fabric_totals_if_empty() -> bool:
+    """First run after upgrade: build the cache when colors exist but it is empty."""
+    if ProductFabricTotals.query.first() is not None:
+        return False
+    if ProductColor.query.first() is None:
+        return False
+    verify_fabric_totals(fix=True)
+    return True
@@ -0,0 +1,230 @@
+"""finance_balances: transaction / expense / liability sums maintained by delta on flush."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Expense, FinanceBalance, Liability, Transaction
+from services.delta_tracking import attrs_changed, old_value, track_history, upsert_add
+
+_TRACKED_ATTRS = {
+    Transaction: (
+        'currency', 'method', 'account_type_code', 'amount', 'transaction_type', 'transaction_date'
+    ),
+    Expense: ('amount',),
+    Liability: ('amount', 'paid_amount'),
+}
+
+_SUM_COLUMNS = ('row_count', 'amount_total', 'signed_total', 'paid_total')
+
+for _model, _attrs in _TRACKED_ATTRS.items():
+    track_history(_model, _attrs)
+
+
+def _contribution(obj, get) -> tuple:
+    """(key, _SUM_COLUMNS values, transaction_date or None) for one row."""
+    amount = float(get('amount') or 0)
+    if isinstance(obj, Transaction):
+        key = ('transaction', get('currency') or '', get('method') or '', get('account_type_code') or '')
+        tt = get('transaction_type')
+        signed = amount if tt == 'in' else -amount if tt == 'out' else 0.0
+        return key, (1, amount, signed, 0.0), get('transaction_date')
+    if isinstance(obj, Liability):
+        return ('liability', '', '', ''), (1, amount, 0.0, float(get('paid_amount') or 0)), None
+    return ('expense', '', '', ''), (1, amount, 0.0, 0.0), None
+
+
+def _collect_deltas(session):
+    """key -> [sums..., earliest new date]; plus {key: earliest removed date} needing a MIN recheck."""
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0, None])
+    recheck = {}
+
+    def add(obj, get, sign):
+        key, values, when = _contribution(obj, get)
+        d = deltas[key]
+        for i, v in enumerate(values):
+            d[i] += sign * v
+        if when is None:
+            return
+        if sign > 0:
+            d[4] = when if d[4] is None else min(d[4], when)
+        else:
+            recheck[key] = when if key not in recheck else min(recheck[key], when)
+
+    tracked = tuple(_TRACKED_ATTRS)
+    for obj in session.new:
+        if isinstance(obj, tracked):
+            add(obj, lambda a: getattr(obj, a), 1)
+    for obj in session.deleted:
+        if isinstance(obj, tracked):
+            add(obj, lambda a: old_value(obj, a), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, tracked) or obj in session.deleted:
+            continue
+        if not attrs_changed(obj, _TRACKED_ATTRS[type(obj)]):
+            continue
+        add(obj, lambda a: old_value(obj, a), -1)
+        add(obj, lambda a: getattr(obj, a), 1)
+    return deltas, recheck
+
+
+def _key_filter(table, key):
+    return and_(
+        table.c.source == key[0], table.c.currency == key[1],
+        table.c.method == key[2], table.c.account_type_code == key[3],
+    )
+
+
+def _upsert(conn, key, delta) -> None:
+    table = FinanceBalance.__table__
+    now = datetime.utcnow()
+    when = delta[4]
+    on_update = {'updated_at': now}
+    if when is not None:
+        on_update['first_date'] = case(
+            (or_(table.c.first_date.is_(None), table.c.first_date > when), when),
+            else_=table.c.first_date,
+        )
+    upsert_add(
+        conn, table,
+        dict(source=key[0], currency=key[1], method=key[2], account_type_code=key[3]),
+        dict(zip(_SUM_COLUMNS, delta[:4])),
+        extra=dict(first_date=when, updated_at=now), on_update=on_update,
+    )
+
+
+def _transaction_bucket_filter(key):
+    return and_(
+        func.coalesce(Transaction.currency, '') == key[1],
+        func.coalesce(Transaction.method, '') == key[2],
+        func.coalesce(Transaction.account_type_code, '') == key[3],
+    )
+
+
+def _recheck_first_date(conn, key, removed) -> None:
+    """A row dated `removed` left the bucket; recompute first_date if it may have been the minimum."""
+    table = FinanceBalance.__table__
+    earliest = select(func.min(Transaction.transaction_date)).where(_transaction_bucket_filter(key))
+    conn.execute(
+        table.update()
+        .where(_key_filter(table, key))
+        .where(or_(table.c.first_date.is_(None), table.c.first_date >= removed))
+        .values(first_date=earliest.scalar_subquery())
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_finance_balance_deltas(session, flush_context):
+    deltas, recheck = _collect_deltas(session)
+    conn = None
+    for key, delta in deltas.items():
+        if delta[0] == 0 and delta[4] is None and all(abs(v) < 1e-9 for v in delta[1:4]):
+            continue
+        conn = conn or session.connection()
+        _upsert(conn, key, delta)
+    for key, removed in recheck.items():
+        conn = conn or session.connection()
+        _recheck_first_date(conn, key, removed)
+
+
+def finance_totals() -> dict:
+    """Summed amounts: received / receivable / liability transactions (by code) and expenses."""
+    rows = db.session.query(
+        FinanceBalance.source, FinanceBalance.account_type_code, func.sum(FinanceBalance.amount_total)
+    ).filter(FinanceBalance.source.in_(('transaction', 'expense'))).group_by(
+        FinanceBalance.source, FinanceBalance.account_type_code
+    ).all()
+    out = {'received': 0.0, 'receivable': 0.0, 'liability': 0.0, 'expense': 0.0}
+    for source, code, total in rows:
+        name = code if source == 'transaction' else source
+        if name in out:
+            out[name] += float(total or 0)
+    return out
+
+
+def cashbook_balances() -> list:
+    """(currency, method, signed balance, first transaction_date) per transaction bucket."""
+    return db.session.query(
+        FinanceBalance.currency,
+        FinanceBalance.method,
+        func.sum(FinanceBalance.signed_total).label('balance'),
+        func.min(FinanceBalance.first_date).label('first_date'),
+    ).filter(FinanceBalance.source == 'transaction').group_by(
+        FinanceBalance.currency, FinanceBalance.method
+    ).having(func.sum(FinanceBalance.row_count) > 0).all()
+
+
+def _scan_balances() -> dict:
+    """key -> [_SUM_COLUMNS..., first_date] recomputed from the raw tables (one GROUP BY each)."""
+    out = {}
+    signed = case(
+        (Transaction.transaction_type == 'in', Transaction.amount),
+        (Transaction.transaction_type == 'out', -Transaction.amount),
+        else_=0,
+    )
+    cur = func.coalesce(Transaction.currency, '')
+    meth = func.coalesce(Transaction.method, '')
+    code = func.coalesce(Transaction.account_type_code, '')
+    for c, m, a, n, amt, sgn, first in db.session.query(
+        cur, meth, code, func.count(Transaction.id), func.sum(Transaction.amount),
+        func.sum(signed), func.min(Transaction.transaction_date),
+    ).group_by(cur, meth, code).all():
+        out[('transaction', c, m, a)] = [n, float(amt or 0), float(sgn or 0), 0.0, first]
+    n, amt = db.session.query(func.count(Expense.id), func.sum(Expense.amount)).one()
+    if n:
+        out[('expense', '', '', '')] = [n, float(amt or 0), 0.0, 0.0, None]
+    n, amt, paid = db.session.query(
+        func.count(Liability.id), func.sum(Liability.amount), func.sum(Liability.paid_amount)
+    ).one()
+    if n:
+        out[('liability', '', '', '')] = [n, float(amt or 0), 0.0, float(paid or 0), None]
+    return out
+
+
+def verify_finance_balances(fix: bool = False) -> list[dict]:
+    """Recompute every bucket from transactions / expenses / liabilities and report (or repair) drift."""
+    expected = _scan_balances()
+    cached = {
+        (r.source, r.currency, r.method, r.account_type_code): r
+        for r in FinanceBalance.query.populate_existing().all()
+    }
+    empty = [0, 0.0, 0.0, 0.0, None]
+    drift = []
+    for key in sorted(set(expected) | set(cached)):
+        want = expected.get(key, empty)
+        row = cached.get(key)
+        have = [getattr(row, c) or 0 for c in _SUM_COLUMNS] + [row.first_date] if row else empty
+        bad = [c for c, w, h in zip(_SUM_COLUMNS, want, have) if abs(float(w) - float(h)) > 1e-4]
+        if want[4] != have[4]:
+            bad.append('first_date')
+        if not bad:
+            continue
+        drift.append({
+            'key': '/'.join(k or '-' for k in key),
+            'columns': bad,
+            'cached': dict(zip(_SUM_COLUMNS + ('first_date',), have)),
+            'expected': dict(zip(_SUM_COLUMNS + ('first_date',), want)),
+        })
+        if fix:
+            if row is None:
+                row = FinanceBalance(source=key[0], currency=key[1], method=key[2], account_type_code=key[3])
+                db.session.add(row)
+            for c, w in zip(_SUM_COLUMNS + ('first_date',), want):
+                setattr(row, c, w)
+    if fix and drift:
+        db.session.commit()
+    return drift
+
+
+def backfill_finance_balances_if_empty() -> bool:
+    """First run after upgrade: build the sums when finance rows exist but the table is empty."""
+    if FinanceBalance.query.first() is not None:
+        return False
+    if not any(m.query.first() is not None for m in (Transaction, Expense, Liability)):
+        return False
+    verify_finance_balances(fix=True)
+    return True
@@ -0,0 +1,95 @@
+"""measurement_fabric_parts: per-part yards of each measurement, rewritten on flush."""
+from __future__ import annotations
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Measurement, MeasurementFabricPart
+from services.yard_breakdown import parts_from_stored_breakdown
+
+_TRACKED_ATTRS = ('fabric_yard_breakdown', 'product_id', 'product_color_id')
+
+
+def _part_rows(m: Measurement) -> list[dict]:
+    return [
+        dict(
+            measurement_id=m.id,
+            product_id=m.product_id,
+            product_color_id=m.product_color_id,
+            part=part,
+            yards=round(yds, 4),
+        )
+        for part, yds in parts_from_stored_breakdown(m.fabric_yard_breakdown).items()
+    ]
+
+
+def _tracked_change(m: Measurement) -> bool:
+    state = inspect(m)
+    return any(state.attrs[a].history.has_changes() for a in _TRACKED_ATTRS)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_measurement_fabric_parts(session, flush_context):
+    stale_ids = set()
+    rows = []
+    for obj in session.deleted:
+        if isinstance(obj, Measurement) and obj.id is not None:
+            stale_ids.add(obj.id)
+    for obj in session.new:
+        if isinstance(obj, Measurement):
+            rows.extend(_part_rows(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Measurement) and obj not in session.deleted and _tracked_change(obj):
+            stale_ids.add(obj.id)
+            rows.extend(_part_rows(obj))
+    if not stale_ids and not rows:
+        return
+    table = MeasurementFabricPart.__table__
+    conn = session.connection()
+    if stale_ids:
+        conn.execute(table.delete().where(table.c.measurement_id.in_(stale_ids)))
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def rebuild_measurement_fabric_parts(batch_size: int = 1000) -> int:
+    """Recompute every part row from measurements (backfill / repair). Returns row count."""
+    table = MeasurementFabricPart.__table__
+    db.session.execute(table.delete())
+    n = 0
+    last_id = 0
+    while True:
+        batch = (
+            Measurement.query.filter(Measurement.fabric_yard_breakdown.isnot(None), Measurement.id > last_id)
+            .order_by(Measurement.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = [r for m in batch for r in _part_rows(m)]
+        if rows:
+            db.session.execute(table.insert(), rows)
+            n += len(rows)
+    db.session.commit()
+    return n
+
+
+def backfill_measurement_fabric_parts_if_empty() -> bool:
+    """First run after upgrade: split existing breakdowns into part rows."""
+    if MeasurementFabricPart.query.first() is not None:
+        return False
+    if Measurement.query.filter(Measurement.fabric_yard_breakdown.isnot(None)).first() is None:
+        return False
+    rebuild_measurement_fabric_parts()
+    return True
+
+
+def part_totals(product_id: int | None = None) -> dict:
+    """{part: total yards} across measurements, optionally for one product."""
+    q = db.session.query(MeasurementFabricPart.part, func.sum(MeasurementFabricPart.yards))
+    if product_id:
+        q = q.filter(MeasurementFabricPart.product_id == product_id)
+    return {part: round(float(total or 0), 4) for part, total in q.group_by(MeasurementFabricPart.part).all()}
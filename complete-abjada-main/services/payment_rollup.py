@@ -0,0 +1,154 @@
+"""payments_daily: payment count / total per day and payment_type, maintained by delta on flush."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Payment, PaymentDaily
+from services.delta_tracking import attrs_changed, old_value, track_history, upsert_add
+
+_TRACKED_ATTRS = ('created_at', 'payment_type', 'amount')
+
+# Longest ?date_from= .. ?date_to= span the daily income series answers.
+MAX_DAYS = 1000
+
+track_history(Payment, _TRACKED_ATTRS)
+
+
+def _as_date(v):
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return datetime.strptime(str(v)[:10], '%Y-%m-%d').date()
+
+
+def _key(get):
+    day = _as_date(get('created_at'))
+    if day is None:
+        return None
+    return day, get('payment_type') or ''
+
+
+def _collect_deltas(session) -> dict:
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    def add(get, sign):
+        key = _key(get)
+        if key is None:
+            return
+        d = deltas[key]
+        d[0] += sign
+        d[1] += sign * float(get('amount') or 0)
+
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            add(lambda a: getattr(obj, a), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            add(lambda a: old_value(obj, a), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Payment) or obj in session.deleted:
+            continue
+        if not attrs_changed(obj, _TRACKED_ATTRS):
+            continue
+        add(lambda a: old_value(obj, a), -1)
+        add(lambda a: getattr(obj, a), 1)
+    return {k: d for k, d in deltas.items() if d[0] != 0 or abs(d[1]) > 1e-9}
+
+
+def _upsert(conn, key, n, amount) -> None:
+    day, payment_type = key
+    upsert_add(
+        conn, PaymentDaily.__table__, dict(day=day, payment_type=payment_type),
+        dict(payment_count=n, total=amount),
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_payment_daily_deltas(session, flush_context):
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+    conn = session.connection()
+    for key, (n, amount) in deltas.items():
+        _upsert(conn, key, n, amount)
+
+
+def daily_payment_totals(start: date, end: date) -> list[dict]:
+    """
+    One row per day in [start, end] (zero-filled): {date, payments_count, total_income,
+    by_payment_type: {type: total}}, from one range query on payments_daily.
+    """
+    rows = (
+        db.session.query(PaymentDaily.day, PaymentDaily.payment_type, PaymentDaily.payment_count, PaymentDaily.total)
+        .filter(PaymentDaily.day >= start, PaymentDaily.day <= end, PaymentDaily.payment_count != 0)
+        .all()
+    )
+    days = {start + timedelta(days=i): [0, 0.0, {}] for i in range((end - start).days + 1)}
+    for day, payment_type, n, amount in rows:
+        d = days.get(_as_date(day))
+        if d is None:
+            continue
+        d[0] += int(n or 0)
+        d[1] += float(amount or 0)
+        d[2][payment_type] = round(float(amount or 0), 2)
+    return [
+        {'date': str(day), 'payments_count': n, 'total_income': round(amount, 2), 'by_payment_type': by_type}
+        for day, (n, amount, by_type) in days.items()
+    ]
+
+
+def _scan_payments_daily() -> dict:
+    """(day, payment_type) -> [count, total] recomputed from payments (one GROUP BY)."""
+    day = func.date(Payment.created_at)
+    payment_type = func.coalesce(Payment.payment_type, '')
+    rows = (
+        db.session.query(day, payment_type, func.count(Payment.id), func.sum(Payment.amount))
+        .filter(Payment.created_at.isnot(None))
+        .group_by(day, payment_type)
+        .all()
+    )
+    return {(_as_date(d), t or ''): [n, float(total or 0)] for d, t, n, total in rows}
+
+
+def verify_payments_daily(fix: bool = False) -> list[dict]:
+    """Recompute every (day, payment_type) bucket from payments and report (or repair) drift."""
+    expected = _scan_payments_daily()
+    cached = {(r.day, r.payment_type): r for r in PaymentDaily.query.populate_existing().all()}
+    drift = []
+    for key in sorted(set(expected) | set(cached)):
+        want = expected.get(key, [0, 0.0])
+        row = cached.get(key)
+        have = [row.payment_count or 0, row.total or 0.0] if row else [0, 0.0]
+        if want[0] == have[0] and abs(float(want[1]) - float(have[1])) <= 1e-4:
+            continue
+        drift.append({
+            'key': {'day': str(key[0]), 'payment_type': key[1]},
+            'cached': {'payment_count': have[0], 'total': have[1]},
+            'expected': {'payment_count': want[0], 'total': want[1]},
+        })
+        if fix:
+            if row is None:
+                row = PaymentDaily(day=key[0], payment_type=key[1])
+                db.session.add(row)
+            row.payment_count, row.total = want
+    if fix and drift:
+        db.session.commit()
+    return drift
+
+
+def backfill_payments_daily_if_empty() -> bool:
+    """First run after upgrade: build the rollup when payments exist but it is empty."""
+    if PaymentDaily.query.first() is not None:
+        return False
+    if Payment.query.first() is None:
+        return False
+    verify_payments_daily(fix=True)
+    return True
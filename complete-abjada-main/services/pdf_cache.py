@@ -0,0 +1,144 @@
+"""
+Content-addressed cache for rendered document PDFs (invoices, receipts) under instance/pdf_cache.
+
+The key hashes the document's source data (e.g. order + payments) with the template
+version, so any edit to the rows or a template change renders a fresh file. Least
+recently served files are evicted once the cache grows past PDF_CACHE_MAX_BYTES.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from flask import current_app, send_file
+
+_evict_lock = threading.Lock()
+
+# Seconds between full rescans of the cache directory; in between, a running byte total
+# (seeded by the last scan, plus every file this process writes) decides whether to evict.
+# The rescan picks up files written by other worker processes.
+_RESCAN_INTERVAL = 300
+
+# Eviction trims the cache to this fraction of PDF_CACHE_MAX_BYTES, so a full cache is
+# listed once per batch of misses rather than on every one.
+_EVICT_TO = 0.9
+
+# cache dir -> (approximate bytes on disk, monotonic time of the last scan)
+_sizes: dict[str, tuple[int, float]] = {}
+
+
+@dataclass(frozen=True)
+class CachedPdf:
+    path: str
+    etag: str
+    last_modified: datetime
+
+
+def _cache_dir() -> str:
+    path = os.path.join(current_app.instance_path, 'pdf_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def pdf_cache_key(namespace: str, template_version, source) -> str:
+    raw = json.dumps([namespace, template_version, source], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _entry(path: str, key: str) -> CachedPdf:
+    mtime = os.stat(path).st_mtime
+    return CachedPdf(path=path, etag=key, last_modified=datetime.fromtimestamp(mtime, tz=timezone.utc))
+
+
+def cached_pdf(namespace: str, template_version, source, render) -> CachedPdf:
+    """
+    Return the cached PDF for (namespace, template_version, source), calling render()
+    (-> file-like with the PDF bytes) only on a miss. Hits refresh the file's atime,
+    which is what eviction orders by; mtime stays the render time (Last-Modified).
+    """
+    key = pdf_cache_key(namespace, template_version, source)
+    path = os.path.join(_cache_dir(), f'{namespace}-{key}.pdf')
+    try:
+        st = os.stat(path)
+        os.utime(path, (time.time(), st.st_mtime))
+        return _entry(path, key)
+    except FileNotFoundError:
+        pass
+    buf = render()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buf.getvalue() if hasattr(buf, 'getvalue') else buf.read())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _evict(keep=path, added=os.stat(path).st_size)
+    return _entry(path, key)
+
+
+def _scan(cache_dir: str) -> list[tuple[float, int, str]]:
+    files = []
+    for e in os.scandir(cache_dir):
+        if not e.is_file() or not e.name.endswith('.pdf'):
+            continue
+        st = e.stat()
+        files.append((st.st_atime, st.st_size, e.path))
+    return files
+
+
+def _evict(keep: str, added: int) -> None:
+    """
+    Account for a newly written file of `added` bytes; only when the running total is
+    over PDF_CACHE_MAX_BYTES (or due for a rescan) is the directory listed, and only when
+    the listed total is over budget are files sorted and removed.
+    """
+    limit = int(current_app.config.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    cache_dir = os.path.dirname(keep)
+    now = time.monotonic()
+    with _evict_lock:
+        known = _sizes.get(cache_dir)
+        if known is not None:
+            total = known[0] + added
+            if total <= limit and now - known[1] < _RESCAN_INTERVAL:
+                _sizes[cache_dir] = (total, known[1])
+                return
+        files = _scan(cache_dir)
+        total = sum(size for _atime, size, _path in files)
+        if total > limit:
+            target = int(limit * _EVICT_TO)
+            for _atime, size, path in sorted(files):
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= target:
+                    break
+        _sizes[cache_dir] = (total, now)
+
+
+def send_cached_pdf(entry: CachedPdf, download_name: str, as_attachment: bool):
+    """send_file with the cache key as ETag and the render time as Last-Modified (304s handled)."""
+    resp = send_file(
+        entry.path,
+        mimetype='application/pdf',
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=entry.etag,
+        last_modified=entry.last_modified,
+        conditional=True,
+    )
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
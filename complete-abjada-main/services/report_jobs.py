@@ -0,0 +1,190 @@
+"""
+Background report jobs: a report_jobs table plus a small thread pool in this process.
+
+Route modules register the documents they can render (register_report_job); clients
+POST /api/jobs, poll the job and download the file once it is done. Identical in-flight
+requests (same kind + params) share one job; finished files expire after REPORT_JOB_TTL.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import ReportJob
+
+# A job still 'running' this long after it started is assumed lost (process restarted).
+STALE_RUNNING_SECONDS = 15 * 60
+
+
+@dataclass(frozen=True)
+class _JobKind:
+    # render(params) -> (file object, download name); runs in a worker with an app context
+    render: Callable[[dict], tuple]
+    # authorize() -> Flask error response or None; runs in the request (submit / status / download)
+    authorize: Optional[Callable[[], Any]] = None
+    # prepare(params, user_id) -> params stored on the job (validate / add request-derived values)
+    prepare: Optional[Callable[[dict, Optional[int]], dict]] = None
+    mimetype: str = 'application/pdf'
+
+
+_KINDS: dict[str, _JobKind] = {}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_resumed = False
+
+
+def register_report_job(kind: str, render, *, authorize=None, prepare=None, mimetype='application/pdf') -> None:
+    _KINDS[kind] = _JobKind(render=render, authorize=authorize, prepare=prepare, mimetype=mimetype)
+
+
+def job_kind(kind: str) -> Optional[_JobKind]:
+    return _KINDS.get(kind)
+
+
+def _jobs_dir() -> str:
+    path = os.path.join(current_app.instance_path, 'report_jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _dedup_key(kind: str, params: dict, owner: Optional[int] = None) -> str:
+    raw = json.dumps({'kind': kind, 'params': params, 'owner': owner}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(current_app.config.get('REPORT_JOB_WORKERS', 2)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-job')
+        return _executor
+
+
+def _dispatch(job_id: int) -> None:
+    _get_executor().submit(_run_job, current_app._get_current_object(), job_id)
+
+
+def submit_report_job(kind: str, params: dict, user_id: Optional[int]) -> tuple[ReportJob, bool]:
+    """
+    Queue a job (or return the identical one already in flight). Returns (job, deduplicated).
+    Kinds without authorize() are private to their creator, so only that user's jobs are shared.
+    """
+    resume_report_jobs()
+    purge_expired_report_jobs()
+    spec = _KINDS.get(kind)
+    key = _dedup_key(kind, params, None if spec and spec.authorize else user_id)
+    existing = ReportJob.query.filter_by(inflight_key=key).first()
+    if existing:
+        return existing, True
+    job = ReportJob(
+        kind=kind, params=json.dumps(params, sort_keys=True, default=str),
+        inflight_key=key, status='queued', created_by=user_id,
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Same request raced us between the lookup and the insert.
+        db.session.rollback()
+        existing = ReportJob.query.filter_by(inflight_key=key).first()
+        if existing:
+            return existing, True
+        raise
+    _dispatch(job.id)
+    return job, False
+
+
+def _claim(job_id: int) -> bool:
+    res = db.session.execute(
+        ReportJob.__table__.update()
+        .where(ReportJob.id == job_id, ReportJob.status == 'queued')
+        .values(status='running', started_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return bool(res.rowcount)
+
+
+def _finish(job: ReportJob, **values) -> None:
+    now = datetime.utcnow()
+    ttl = int(current_app.config.get('REPORT_JOB_TTL', 3600))
+    for k, v in values.items():
+        setattr(job, k, v)
+    job.inflight_key = None
+    job.finished_at = now
+    job.expires_at = now + timedelta(seconds=ttl)
+    db.session.commit()
+
+
+def _run_job(app, job_id: int) -> None:
+    with app.app_context():
+        if not _claim(job_id):
+            return
+        job = db.session.get(ReportJob, job_id)
+        kind = _KINDS.get(job.kind)
+        try:
+            if kind is None:
+                raise ValueError(f'Unknown job kind: {job.kind}')
+            src, download_name = kind.render(json.loads(job.params or '{}'))
+            path = os.path.join(_jobs_dir(), f'{job.id}-{secrets.token_hex(8)}')
+            try:
+                with open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            finally:
+                src.close()
+            _finish(
+                job, status='done', file_path=path, file_name=download_name,
+                mimetype=kind.mimetype, size=os.path.getsize(path),
+            )
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ReportJob, job_id)
+            _finish(job, status='failed', error=str(e)[:500] or e.__class__.__name__)
+
+
+def resume_report_jobs() -> int:
+    """Once per process: re-dispatch queued jobs and requeue ones whose worker died."""
+    global _resumed
+    with _executor_lock:
+        if _resumed:
+            return 0
+        _resumed = True
+    stale = datetime.utcnow() - timedelta(seconds=STALE_RUNNING_SECONDS)
+    db.session.execute(
+        ReportJob.__table__.update()
+        .where(ReportJob.status == 'running', ReportJob.started_at < stale)
+        .values(status='queued', started_at=None)
+    )
+    db.session.commit()
+    ids = [jid for (jid,) in db.session.query(ReportJob.id).filter(ReportJob.status == 'queued').all()]
+    for jid in ids:
+        _dispatch(jid)
+    return len(ids)
+
+
+def purge_expired_report_jobs() -> int:
+    """Delete finished jobs past expires_at, with their files."""
+    expired = ReportJob.query.filter(ReportJob.expires_at.isnot(None), ReportJob.expires_at < datetime.utcnow()).all()
+    for job in expired:
+        if job.file_path:
+            try:
+                os.remove(job.file_path)
+            except OSError:
+                pass
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+    return len(expired)
@@ -0,0 +1,224 @@
+"""Incrementally maintained order_revenue_daily rollup (day x clothing_type x status bucket)."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+
+from extensions import db
+from finance_logic import ORDER_DONE_STATUSES
+from models import Order, OrderRevenueDaily
+from services.delta_tracking import old_value, track_history, upsert_add
+
+BUCKET_DONE = 'done'
+BUCKET_OPEN = 'open'
+BUCKET_CANCELLED = 'cancelled'
+
+DONE_STATUSES = ORDER_DONE_STATUSES
+
+_TRACKED_ATTRS = ('created_at', 'clothing_type', 'status', 'total_price')
+
+
+def status_bucket(status) -> str:
+    s = (status or '').strip().lower()
+    if s in DONE_STATUSES:
+        return BUCKET_DONE
+    if s == 'cancelled':
+        return BUCKET_CANCELLED
+    return BUCKET_OPEN
+
+
+def _status_bucket_sql(col):
+    # Same normalization as status_bucket(), so rebuilds bucket legacy "Completed " rows alike.
+    s = func.lower(func.trim(col))
+    return case(
+        (s.in_(DONE_STATUSES), BUCKET_DONE),
+        (s == 'cancelled', BUCKET_CANCELLED),
+        else_=BUCKET_OPEN,
+    )
+
+
+def _as_date(v):
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return datetime.strptime(str(v)[:10], '%Y-%m-%d').date()
+
+
+def _money(v) -> float:
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+track_history(Order, _TRACKED_ATTRS)
+
+
+def _key(created_at, clothing_type, status):
+    day = _as_date(created_at)
+    if day is None:
+        return None
+    return day, (clothing_type or ''), status_bucket(status)
+
+
+def _old_key(order):
+    return _key(*(old_value(order, a) for a in ('created_at', 'clothing_type', 'status')))
+
+
+def _new_key(order):
+    return _key(order.created_at, order.clothing_type, order.status)
+
+
+def _collect_deltas(session):
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    def add(key, n, amount):
+        if key is None:
+            return
+        d = deltas[key]
+        d[0] += n
+        d[1] += amount
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add(_new_key(obj), 1, _money(obj.total_price))
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            add(_old_key(obj), -1, -_money(old_value(obj, 'total_price')))
+    for obj in session.dirty:
+        if not isinstance(obj, Order) or obj in session.deleted:
+            continue
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        old_k, new_k = _old_key(obj), _new_key(obj)
+        old_amt, new_amt = _money(old_value(obj, 'total_price')), _money(obj.total_price)
+        if old_k == new_k and abs(old_amt - new_amt) < 1e-9:
+            continue
+        add(old_k, -1, -old_amt)
+        add(new_k, 1, new_amt)
+    return {k: v for k, v in deltas.items() if v[0] != 0 or abs(v[1]) > 1e-9}
+
+
+def _upsert(conn, key, n, amount) -> None:
+    day, clothing_type, bucket = key
+    upsert_add(
+        conn, OrderRevenueDaily.__table__,
+        dict(day=day, clothing_type=clothing_type, status_bucket=bucket),
+        dict(order_count=n, revenue=amount),
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_order_revenue_deltas(session, flush_context):
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+    conn = session.connection()
+    for key, (n, amount) in deltas.items():
+        _upsert(conn, key, n, amount)
+
+
+def rebuild_order_revenue_daily() -> int:
+    """Recompute the whole rollup from orders (backfill / repair). Returns row count."""
+    bucket = _status_bucket_sql(Order.status)
+    day = func.date(Order.created_at)
+    rows = (
+        db.session.query(
+            day,
+            func.coalesce(Order.clothing_type, ''),
+            bucket,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_price), 0),
+        )
+        .filter(Order.created_at.isnot(None))
+        .group_by(day, func.coalesce(Order.clothing_type, ''), bucket)
+        .all()
+    )
+    OrderRevenueDaily.query.delete(synchronize_session=False)
+    for d, ct, b, n, amount in rows:
+        db.session.add(OrderRevenueDaily(
+            day=_as_date(d),
+            clothing_type=ct or '',
+            status_bucket=b,
+            order_count=int(n or 0),
+            revenue=float(amount or 0),
+        ))
+    db.session.commit()
+    return len(rows)
+
+
+def backfill_order_revenue_daily_if_empty() -> bool:
+    """First run after upgrade: build the rollup when orders exist but it is empty."""
+    if OrderRevenueDaily.query.first() is not None:
+        return False
+    if Order.query.first() is None:
+        return False
+    rebuild_order_revenue_daily()
+    return True
+
+
+# --- Readers (O(days) instead of O(orders)) ---
+
+
+def done_revenue_by_ranges(bounds) -> list[float]:
+    """Revenue of completed/delivered orders for each [start, end) date range."""
+    if not bounds:
+        return []
+    lo = min(s for s, _ in bounds)
+    hi = max(e for _, e in bounds)
+    rows = (
+        db.session.query(OrderRevenueDaily.day, func.sum(OrderRevenueDaily.revenue))
+        .filter(
+            OrderRevenueDaily.status_bucket == BUCKET_DONE,
+            OrderRevenueDaily.day >= lo,
+            OrderRevenueDaily.day < hi,
+        )
+        .group_by(OrderRevenueDaily.day)
+        .all()
+    )
+    out = [0.0] * len(bounds)
+    for d, amount in rows:
+        d = _as_date(d)
+        for i, (s, e) in enumerate(bounds):
+            if s <= d < e:
+                out[i] += float(amount or 0)
+    return out
+
+
+def done_totals(start=None, end=None):
+    """(order_count, revenue) of completed/delivered orders; start/end are [start, end) dates."""
+    q = db.session.query(
+        func.coalesce(func.sum(OrderRevenueDaily.order_count), 0),
+        func.coalesce(func.sum(OrderRevenueDaily.revenue), 0),
+    ).filter(OrderRevenueDaily.status_bucket == BUCKET_DONE)
+    if start is not None:
+        q = q.filter(OrderRevenueDaily.day >= start)
+    if end is not None:
+        q = q.filter(OrderRevenueDaily.day < end)
+    n, amount = q.one()
+    return int(n or 0), float(amount or 0)
+
+
+def done_by_clothing_type(start=None, end=None, limit=None):
+    """[(clothing_type, order_count, revenue), ...] ordered by revenue desc."""
+    total = func.sum(OrderRevenueDaily.revenue)
+    q = db.session.query(
+        OrderRevenueDaily.clothing_type,
+        func.sum(OrderRevenueDaily.order_count),
+        total,
+    ).filter(OrderRevenueDaily.status_bucket == BUCKET_DONE)
+    if start is not None:
+        q = q.filter(OrderRevenueDaily.day >= start)
+    if end is not None:
+        q = q.filter(OrderRevenueDaily.day < end)
+    q = q.group_by(OrderRevenueDaily.clothing_type).having(func.sum(OrderRevenueDaily.order_count) > 0)
+    q = q.order_by(total.desc())
+    if limit:
+        q = q.limit(limit)
+    return [(ct, int(n or 0), float(amount or 0)) for ct, n, amount in q.all()]
@@ -0,0 +1,123 @@
+"""
+Sales series for GET /api/reports/sales: completed / delivered orders bucketed by the day,
+week (starting Monday) or month of Order.completed_at.
+
+One GROUP BY (bucket, clothing_type) query over the indexed completed_at range gives the
+series, the totals and the per-type breakdown; buckets without sales are filled with zeros
+so charts get a continuous axis.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+
+from extensions import db
+from finance_logic import ORDER_DONE_STATUSES
+from models import Order
+from utils.date_range import day_start
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Longest series one request may ask for (e.g. ~2.7 years by day).
+MAX_BUCKETS = 1000
+
+
+def bucket_start(d: date, granularity: str) -> date:
+    if granularity == 'week':
+        return d - timedelta(days=d.weekday())
+    if granularity == 'month':
+        return d.replace(day=1)
+    return d
+
+
+def _next_bucket(d: date, granularity: str) -> date:
+    if granularity == 'week':
+        return d + timedelta(days=7)
+    if granularity == 'month':
+        return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return d + timedelta(days=1)
+
+
+def iter_buckets(start: date, end: date, granularity: str):
+    """Bucket start dates covering [start, end] (both inclusive)."""
+    d = bucket_start(start, granularity)
+    while d <= end:
+        yield d
+        d = _next_bucket(d, granularity)
+
+
+def bucket_count(start: date, end: date, granularity: str) -> int:
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    if granularity == 'month':
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if granularity == 'week' else 1) + 1
+
+
+def _bucket_sql(col, granularity: str, dialect: str):
+    """SQL expression for the first day of col's bucket (a DATE or 'YYYY-MM-DD')."""
+    if dialect == 'sqlite':
+        if granularity == 'week':
+            return func.date(col, 'weekday 0', '-6 days')
+        if granularity == 'month':
+            return func.strftime('%Y-%m-01', col)
+        return func.date(col)
+    if dialect == 'mysql':
+        if granularity == 'week':
+            return func.date(func.subdate(col, func.weekday(col)))
+        if granularity == 'month':
+            return func.date_format(col, '%Y-%m-01')
+        return func.date(col)
+    return func.date(func.date_trunc(granularity, col))
+
+
+def _as_date(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return datetime.strptime(str(v)[:10], '%Y-%m-%d').date()
+
+
+def sales_series(start: date, end: date, granularity: str = 'day') -> dict:
+    """
+    Done orders with completed_at in [start, end] (dates, inclusive):
+    series [{bucket, orders, revenue}], totals and per-clothing-type counts / revenue.
+    """
+    bucket = _bucket_sql(Order.completed_at, granularity, db.session.get_bind().dialect.name)
+    clothing_type = func.coalesce(Order.clothing_type, '')
+    rows = (
+        db.session.query(
+            bucket.label('bucket'),
+            clothing_type.label('clothing_type'),
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_price), 0),
+        )
+        .filter(
+            Order.completed_at >= day_start(start),
+            Order.completed_at < day_start(end + timedelta(days=1)),
+            # Same normalization as set_order_status() and the completed_at backfill.
+            func.lower(func.trim(Order.status)).in_(ORDER_DONE_STATUSES),
+        )
+        .group_by(bucket, clothing_type)
+        .all()
+    )
+    series = {d: [0, 0.0] for d in iter_buckets(start, end, granularity)}
+    by_type = {}
+    for b, ct, n, amount in rows:
+        point = series.setdefault(_as_date(b), [0, 0.0])
+        point[0] += int(n or 0)
+        point[1] += float(amount or 0)
+        t = by_type.setdefault(ct, [0, 0.0])
+        t[0] += int(n or 0)
+        t[1] += float(amount or 0)
+    return {
+        'series': [
+            {'bucket': str(d), 'orders': n, 'revenue': round(amount, 2)}
+            for d, (n, amount) in sorted(series.items())
+        ],
+        'total_orders': sum(n for n, _ in by_type.values()),
+        'total_revenue': round(sum(amount for _, amount in by_type.values()), 2),
+        'by_clothing_type': {ct: n for ct, (n, _) in by_type.items()},
+        'revenue_by_clothing_type': {ct: round(amount, 2) for ct, (_, amount) in by_type.items()},
+    }
@@ -0,0 +1,224 @@
+"""
+Full-text search over customers, orders, transactions, swaps and products.
+
+Each indexed model has a shadow table search_<table> keyed by the row id: an FTS5 virtual
+table on SQLite, an InnoDB table with a FULLTEXT key on MySQL (created by schema_search).
+Rows are rewritten on flush when a searched column changes. search_hits(Model, term)
+returns a subquery (id, score) of matches, best first by score; every word of the term must
+match a word of the document, either whole or as a prefix ("jo ke" finds "John Kamau Kenya").
+
+search_hits() returns None when this database has no index (another dialect, SQLite built
+without FTS5) or the term has no word the index can match; callers then keep their ILIKE
+filter. Bulk SQL that bypasses the ORM needs `python maintenance.py rebuild-search-index`.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import Float, Integer, event, inspect, text
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Customer, Inventory, Order, Swap, Transaction
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (default 3); such terms use ILIKE.
+MYSQL_MIN_TOKEN = 3
+
+_BATCH = 1000
+
+
+def _digits(value) -> str:
+    return re.sub(r'\D', '', value or '')
+
+
+@dataclass(frozen=True)
+class SearchIndex:
+    model: type
+    # Model columns copied verbatim into the shadow table.
+    columns: tuple
+    # (shadow column, model column, fn(value) -> str) for derived text, e.g. a phone without separators.
+    computed: tuple = ()
+
+    @property
+    def table(self) -> str:
+        return 'search_' + self.model.__tablename__
+
+    @property
+    def fields(self) -> tuple:
+        return self.columns + tuple(name for name, _src, _fn in self.computed)
+
+    @property
+    def sources(self) -> tuple:
+        """Model columns the document is built from."""
+        return tuple(dict.fromkeys(self.columns + tuple(src for _name, src, _fn in self.computed)))
+
+    def document(self, row) -> dict:
+        doc = {c: getattr(row, c) or '' for c in self.columns}
+        doc.update((name, fn(getattr(row, src))) for name, src, fn in self.computed)
+        return doc
+
+
+SEARCH_INDEXES = {
+    idx.model: idx for idx in (
+        SearchIndex(Customer, ('full_name', 'phone', 'email'), (('phone_digits', 'phone', _digits),)),
+        SearchIndex(Order, ('clothing_type',)),
+        SearchIndex(Transaction, ('details', 'category', 'currency')),
+        SearchIndex(Swap, ('details', 'from_account', 'to_account')),
+        SearchIndex(Inventory, ('name', 'item_type')),
+    )
+}
+
+# Engine URL -> whether every search_* table exists (checked once per process).
+_ready: dict = {}
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def search_ready(bind=None) -> bool:
+    """Whether every search_* table exists for this engine / connection (checked once per process)."""
+    engine = (bind if bind is not None else db.engine).engine
+    key = str(engine.url)
+    if key not in _ready:
+        if _dialect(engine) not in ('sqlite', 'mysql'):
+            _ready[key] = False
+        else:
+            tables = set(inspect(engine).get_table_names())
+            _ready[key] = all(idx.table in tables for idx in SEARCH_INDEXES.values())
+    return _ready[key]
+
+
+def reset_search_ready() -> None:
+    """Forget cached availability (after schema_search creates the tables)."""
+    _ready.clear()
+
+
+def search_words(term: str) -> list[str]:
+    """Lower-cased words of term as both FTS5 (unicode61) and InnoDB split them."""
+    return re.findall(r'[^\W_]+', (term or '').lower())
+
+
+def _match_expression(words: list[str], dialect: str) -> str:
+    if dialect == 'sqlite':
+        return ' '.join(f'"{w}"*' for w in words)
+    return ' '.join(f'+{w}*' for w in words)
+
+
+def search_hits(model, term: str):
+    """Subquery (id, score) of rows of model matching every word of term, or None (use ILIKE)."""
+    idx = SEARCH_INDEXES[model]
+    bind = db.session.get_bind()
+    if not search_ready(bind):
+        return None
+    dialect = _dialect(bind)
+    words = search_words(term)
+    if not words or (dialect == 'mysql' and any(len(w) < MYSQL_MIN_TOKEN for w in words)):
+        return None
+    if dialect == 'sqlite':
+        # bm25() is lower for better matches; negate so every caller sorts score descending.
+        sql = f'SELECT rowid AS id, -bm25({idx.table}) AS score FROM {idx.table} WHERE {idx.table} MATCH :q'
+    else:
+        match = f"MATCH({', '.join(idx.fields)}) AGAINST (:q IN BOOLEAN MODE)"
+        sql = f'SELECT id, {match} AS score FROM {idx.table} WHERE {match}'
+    stmt = text(sql).bindparams(q=_match_expression(words, dialect))
+    return stmt.columns(id=Integer, score=Float).subquery(f'{idx.table}_hits')
+
+
+def _write(conn, idx: SearchIndex, rows) -> None:
+    id_col = 'rowid' if _dialect(conn) == 'sqlite' else 'id'
+    cols = ', '.join((id_col,) + idx.fields)
+    params = ', '.join(':' + c for c in ('id',) + idx.fields)
+    conn.execute(text(f'INSERT INTO {idx.table} ({cols}) VALUES ({params})'), [
+        {'id': row.id, **idx.document(row)} for row in rows
+    ])
+
+
+def _delete(conn, idx: SearchIndex, ids) -> None:
+    id_col = 'rowid' if _dialect(conn) == 'sqlite' else 'id'
+    for start in range(0, len(ids), _BATCH):
+        chunk = ids[start:start + _BATCH]
+        conn.execute(
+            text(f"DELETE FROM {idx.table} WHERE {id_col} IN ({', '.join(str(int(i)) for i in chunk)})")
+        )
+
+
+def _searched_columns_changed(obj, idx: SearchIndex) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[c].history.has_changes() for c in idx.sources)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    changed: dict[SearchIndex, dict] = {}
+    removed: dict[SearchIndex, set] = {}
+    for obj in session.new:
+        idx = SEARCH_INDEXES.get(type(obj))
+        if idx is not None:
+            changed.setdefault(idx, {})[obj.id] = obj
+    for obj in session.dirty:
+        idx = SEARCH_INDEXES.get(type(obj))
+        if idx is not None and obj not in session.deleted and _searched_columns_changed(obj, idx):
+            changed.setdefault(idx, {})[obj.id] = obj
+    for obj in session.deleted:
+        idx = SEARCH_INDEXES.get(type(obj))
+        if idx is not None:
+            removed.setdefault(idx, set()).add(obj.id)
+    if not changed and not removed:
+        return
+    conn = session.connection()
+    if not search_ready(conn):
+        return
+    for idx in set(changed) | set(removed):
+        rows = changed.get(idx, {})
+        _delete(conn, idx, sorted(set(rows) | removed.get(idx, set())))
+        if rows:
+            _write(conn, idx, rows.values())
+
+
+def rebuild_search_index(model=None) -> int:
+    """Rewrite the shadow table(s) from the base tables. Returns documents indexed."""
+    if not search_ready():
+        return 0
+    conn = db.session.connection()
+    n = 0
+    for idx in SEARCH_INDEXES.values():
+        if model is not None and idx.model is not model:
+            continue
+        conn.execute(text(f'DELETE FROM {idx.table}'))
+        q = db.session.query(idx.model.id, *[getattr(idx.model, c) for c in idx.sources]).order_by(idx.model.id)
+        batch = []
+        for row in q.yield_per(_BATCH):
+            batch.append(row)
+            if len(batch) >= _BATCH:
+                _write(conn, idx, batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            _write(conn, idx, batch)
+            n += len(batch)
+    db.session.commit()
+    return n
+
+
+def backfill_search_index_if_empty() -> bool:
+    """First run after upgrade: index existing rows when customers exist but search_customers is empty."""
+    if not search_ready():
+        return False
+    idx = SEARCH_INDEXES[Customer]
+    if db.session.execute(text(f'SELECT 1 FROM {idx.table} LIMIT 1')).first() is not None:
+        return False
+    if Customer.query.first() is None:
+        return False
+    rebuild_search_index()
+    return True
+
+
+def ranked(q, hits, id_col) -> tuple:
+    """
+    q joined to search hits with the score as an extra column, for
+    paginate(q, hits.c.score, id_col, key=...) — items are (entity, score) rows.
+    """
+    q = q.join(hits, hits.c.id == id_col).add_columns(hits.c.score)
+    return q, (lambda row: (row.score, row[0].id))
@@ -0,0 +1,184 @@
+"""Precomputed low-stock alerts (stock_alerts table), refreshed per product when stock changes."""
+from __future__ import annotations
+
+from collections import defaultdict
+
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import (
+    Inventory,
+    ProductColor,
+    StockAlert,
+    LowStockAlertRead,
+    LowStockColorAlertRead,
+    LOW_STOCK_ALERT_THRESHOLD,
+    LOW_FABRIC_YARDS_THRESHOLD,
+)
+from services.change_versions import bump_version
+
+# change_versions counter bumped whenever alerts or their read state change (feed ETag).
+STOCK_ALERTS_VERSION = 'stock_alerts'
+
+_VERSIONED_MODELS = (StockAlert, LowStockAlertRead, LowStockColorAlertRead)
+
+SCOPE_COLOR = 'color'
+SCOPE_PRODUCT = 'product'
+
+# Feed order (matches the legacy list: colors, fabric yards, min_stock, default threshold)
+SORT_COLOR = 0
+SORT_FABRIC = 1
+SORT_QTY_MIN_STOCK = 2
+SORT_QTY_DEFAULT = 3
+
+_FIELDS = (
+    'product_id', 'product_color_id', 'alert_type', 'sort_group', 'sort_value', 'product_name',
+    'color_name', 'item_type', 'unit', 'quantity', 'remaining_yards', 'message',
+)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_feed_version(session, flush_context):
+    changed = any(isinstance(o, _VERSIONED_MODELS) for o in (*session.new, *session.deleted)) or any(
+        isinstance(o, _VERSIONED_MODELS) and session.is_modified(o, include_collections=False)
+        for o in session.dirty
+    )
+    if changed:
+        bump_version(STOCK_ALERTS_VERSION, session)
+
+
+def _effective_remaining_yards(inv: Inventory) -> float:
+    if inv.remaining_yards is not None:
+        return float(inv.remaining_yards)
+    return float(inv.total_yards or 0)
+
+
+def _desired_alerts(inv: Inventory, colors, has_colors: bool | None = None) -> dict:
+    """
+    (scope, ref_id) -> column values for every alert this product should raise.
+    `colors` may be a subset when has_colors says whether the product has any color.
+    """
+    if has_colors is None:
+        has_colors = bool(colors)
+    out = {}
+    for c in colors:
+        st = c.stock_status()
+        if st == 'ok':
+            continue
+        out[(SCOPE_COLOR, c.id)] = dict(
+            product_id=inv.id,
+            product_color_id=c.id,
+            alert_type='color_fabric',
+            sort_group=SORT_COLOR,
+            sort_value=0.0,
+            product_name=inv.name,
+            color_name=c.color_name,
+            item_type=inv.item_type,
+            unit=None,
+            quantity=None,
+            remaining_yards=round(c.effective_remaining_yards(), 4),
+            message='Not Available' if st == 'not_available' else 'Low stock warning',
+        )
+
+    base = dict(
+        product_id=inv.id,
+        product_color_id=None,
+        product_name=inv.name,
+        color_name=None,
+        item_type=inv.item_type,
+        unit=inv.unit or 'pcs',
+        quantity=inv.quantity,
+    )
+    qty = inv.quantity
+    rem = _effective_remaining_yards(inv)
+    if not has_colors and float(inv.total_yards or 0) > 0 and rem < LOW_FABRIC_YARDS_THRESHOLD:
+        # Legacy: fabric yards low on product row (no per-color split)
+        out[(SCOPE_PRODUCT, inv.id)] = dict(
+            base,
+            alert_type='fabric',
+            sort_group=SORT_FABRIC,
+            sort_value=rem,
+            remaining_yards=round(rem, 4),
+            message='Stock is running low',
+        )
+    elif qty is not None and inv.min_stock is not None and qty <= inv.min_stock:
+        out[(SCOPE_PRODUCT, inv.id)] = dict(
+            base, alert_type='quantity', sort_group=SORT_QTY_MIN_STOCK, sort_value=float(qty),
+            remaining_yards=None, message=None,
+        )
+    elif qty is not None and inv.min_stock is None and qty <= LOW_STOCK_ALERT_THRESHOLD:
+        out[(SCOPE_PRODUCT, inv.id)] = dict(
+            base, alert_type='quantity', sort_group=SORT_QTY_DEFAULT, sort_value=float(qty),
+            remaining_yards=None, message=None,
+        )
+    return out
+
+
+def _apply(existing, desired) -> None:
+    by_key = {(a.scope, a.ref_id): a for a in existing}
+    for key, row in by_key.items():
+        if key not in desired:
+            db.session.delete(row)
+    for (scope, ref_id), values in desired.items():
+        row = by_key.get((scope, ref_id))
+        if row is None:
+            db.session.add(StockAlert(scope=scope, ref_id=ref_id, **values))
+            continue
+        for f in _FIELDS:
+            if getattr(row, f) != values[f]:
+                setattr(row, f, values[f])
+
+
+def refresh_stock_alerts(
+    product_id: int,
+    inv: Inventory | None = None,
+    colors=None,
+    *,
+    changed_color_ids=None,
+    has_colors: bool | None = None,
+) -> None:
+    """
+    Recompute alert rows for one product and its colors (call after any stock change).
+    Pass inv / colors when the caller already loaded them. With changed_color_ids only the
+    product row and those colors' rows are recomputed: `colors` then holds the ones that
+    still exist and has_colors whether the product has any color at all.
+    """
+    if inv is None:
+        inv = Inventory.query.get(product_id)
+    q = StockAlert.query.filter_by(product_id=product_id)
+    if inv and changed_color_ids is not None:
+        q = q.filter(or_(
+            StockAlert.scope == SCOPE_PRODUCT,
+            StockAlert.ref_id.in_(list(changed_color_ids) or [-1]),
+        ))
+    existing = q.all()
+    if not inv:
+        for row in existing:
+            db.session.delete(row)
+        return
+    if colors is None:
+        colors = ProductColor.query.filter_by(product_id=product_id).all()
+    _apply(existing, _desired_alerts(inv, colors, has_colors))
+
+
+def rebuild_stock_alerts() -> int:
+    """Recompute every alert row from products + colors (backfill / repair)."""
+    colors_by_product = defaultdict(list)
+    for c in ProductColor.query.all():
+        colors_by_product[c.product_id].append(c)
+    desired = {}
+    for inv in Inventory.query.all():
+        desired.update(_desired_alerts(inv, colors_by_product.get(inv.id, [])))
+    _apply(StockAlert.query.all(), desired)
+    db.session.commit()
+    return len(desired)
+
+
+def backfill_stock_alerts_if_empty() -> bool:
+    if StockAlert.query.first() is not None:
+        return False
+    if Inventory.query.first() is None:
+        return False
+    rebuild_stock_alerts()
+    return True
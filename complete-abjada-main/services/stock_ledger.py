@@ -0,0 +1,225 @@
+"""
+stock_movements ledger (appended on flush) + stock_snapshots (periodic balances).
+
+Balances: product rows (product_color_id None) = (effective remaining yards, quantity);
+color rows = (effective remaining yards, pieces_quantity). Callers tag why stock moved
+with note_stock_reason(); untagged changes are recorded as create / edit / delete.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Inventory, ProductColor, StockMovement, StockSnapshot
+from services.delta_tracking import old_value, track_history
+
+_REASONS_KEY = 'stock_movement_reasons'
+
+_TRACKED_ATTRS = {
+    Inventory: ('quantity', 'remaining_yards', 'total_yards'),
+    ProductColor: ('remaining_yards', 'pieces_quantity', 'yards_per_piece'),
+}
+
+# Ignore float noise when diffing balances.
+_EPS = 1e-6
+
+# Snapshots only fold movements at least this old, so a still-open transaction's
+# (lower-id, not yet visible) rows are not skipped past.
+SNAPSHOT_SETTLE_SECONDS = 60
+
+for _model, _attrs in _TRACKED_ATTRS.items():
+    track_history(_model, _attrs)
+
+
+def note_stock_reason(obj, reason: str, ref_id: int | None = None, *, overwrite: bool = True) -> None:
+    """Tag the next ledger rows for `obj` (Inventory / ProductColor) in this transaction."""
+    reasons = db.session.info.setdefault(_REASONS_KEY, {})
+    if overwrite or obj not in reasons:
+        reasons[obj] = (reason, ref_id)
+
+
+def _balance(obj, get) -> tuple[float, float]:
+    if isinstance(obj, Inventory):
+        rem = get('remaining_yards')
+        yards = float(rem) if rem is not None else float(get('total_yards') or 0)
+        return yards, float(get('quantity') or 0)
+    pieces = float(get('pieces_quantity') or 0)
+    rem = get('remaining_yards')
+    yards = float(rem) if rem is not None else pieces * float(get('yards_per_piece') or 0)
+    return yards, pieces
+
+
+def _key(obj):
+    if isinstance(obj, Inventory):
+        return obj.id, None
+    return obj.product_id, obj.id
+
+
+@event.listens_for(Session, 'after_flush')
+def _append_stock_movements(session, flush_context):
+    reasons = session.info.get(_REASONS_KEY, {})
+    now = datetime.utcnow()
+    rows = []
+
+    def add(obj, old, new, default_reason):
+        dy, dp = round(new[0] - old[0], 4), round(new[1] - old[1], 4)
+        if abs(dy) < _EPS and abs(dp) < _EPS:
+            return
+        product_id, color_id = _key(obj)
+        reason, ref_id = reasons.get(obj, (default_reason, None))
+        rows.append(dict(
+            product_id=product_id, product_color_id=color_id, delta_yards=dy, delta_pieces=dp,
+            reason=reason, ref_id=ref_id, created_at=now,
+        ))
+
+    zero = (0.0, 0.0)
+    for obj in session.new:
+        if isinstance(obj, (Inventory, ProductColor)):
+            add(obj, zero, _balance(obj, lambda a: getattr(obj, a)), 'create')
+    for obj in session.deleted:
+        if isinstance(obj, (Inventory, ProductColor)):
+            add(obj, _balance(obj, lambda a: old_value(obj, a)), zero, 'delete')
+    for obj in session.dirty:
+        if not isinstance(obj, (Inventory, ProductColor)) or obj in session.deleted:
+            continue
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        add(obj, _balance(obj, lambda a: old_value(obj, a)), _balance(obj, lambda a: getattr(obj, a)), 'edit')
+    if rows:
+        session.connection().execute(StockMovement.__table__.insert(), rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_reasons(session):
+    session.info.pop(_REASONS_KEY, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_reasons_on_rollback(session):
+    session.info.pop(_REASONS_KEY, None)
+
+
+def _live_balances() -> dict:
+    """(product_id, color_id or None) -> (yards, pieces) from the mutable stock columns."""
+    out = {}
+    for inv in Inventory.query.all():
+        out[(inv.id, None)] = _balance(inv, lambda a: getattr(inv, a))
+    for c in ProductColor.query.all():
+        out[(c.product_id, c.id)] = _balance(c, lambda a: getattr(c, a))
+    return out
+
+
+def backfill_stock_ledger_if_empty() -> bool:
+    """First run after upgrade: one 'opening' movement per product / color with stock."""
+    if StockMovement.query.first() is not None:
+        return False
+    live = _live_balances()
+    if not live:
+        return False
+    now = datetime.utcnow()
+    for (product_id, color_id), (yards, pieces) in live.items():
+        if abs(yards) < _EPS and abs(pieces) < _EPS:
+            continue
+        db.session.add(StockMovement(
+            product_id=product_id, product_color_id=color_id, delta_yards=round(yards, 4),
+            delta_pieces=round(pieces, 4), reason='opening', created_at=now,
+        ))
+    db.session.commit()
+    return True
+
+
+def _snapshot_watermark(at: datetime | None = None) -> int:
+    q = db.session.query(func.max(StockSnapshot.last_movement_id))
+    if at is not None:
+        q = q.filter(StockSnapshot.taken_at <= at)
+    return int(q.scalar() or 0)
+
+
+def ledger_balances(
+    product_id: int | None = None, at: datetime | None = None, upto_id: int | None = None
+) -> dict:
+    """
+    (product_id, color_id or None) -> (yards, pieces) from the latest snapshot (taken at or
+    before `at`) plus later movements (created at or before `at`, id <= upto_id).
+    """
+    wm = _snapshot_watermark(at)
+    out = defaultdict(lambda: [0.0, 0.0])
+    if wm:
+        sq = StockSnapshot.query.filter(StockSnapshot.last_movement_id == wm)
+        if product_id is not None:
+            sq = sq.filter(StockSnapshot.product_id == product_id)
+        for s in sq.all():
+            out[(s.product_id, s.product_color_id)] = [float(s.yards), float(s.pieces)]
+    mq = db.session.query(
+        StockMovement.product_id,
+        StockMovement.product_color_id,
+        func.sum(StockMovement.delta_yards),
+        func.sum(StockMovement.delta_pieces),
+    ).filter(StockMovement.id > wm)
+    if product_id is not None:
+        mq = mq.filter(StockMovement.product_id == product_id)
+    if at is not None:
+        mq = mq.filter(StockMovement.created_at <= at)
+    if upto_id is not None:
+        mq = mq.filter(StockMovement.id <= upto_id)
+    for pid, cid, dy, dp in mq.group_by(StockMovement.product_id, StockMovement.product_color_id).all():
+        bal = out[(pid, cid)]
+        bal[0] += float(dy or 0)
+        bal[1] += float(dp or 0)
+    return {k: (round(v[0], 4), round(v[1], 4)) for k, v in out.items()}
+
+
+def take_stock_snapshot() -> int:
+    """Fold movements since the last snapshot into a new one. Returns rows written."""
+    cutoff = datetime.utcnow() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    hi = db.session.query(func.max(StockMovement.id)).filter(StockMovement.created_at <= cutoff).scalar()
+    if not hi or _snapshot_watermark() >= hi:
+        return 0
+    balances = ledger_balances(upto_id=hi)
+    now = datetime.utcnow()
+    n = 0
+    for (product_id, color_id), (yards, pieces) in balances.items():
+        if abs(yards) < _EPS and abs(pieces) < _EPS:
+            continue
+        db.session.add(StockSnapshot(
+            last_movement_id=hi, product_id=product_id, product_color_id=color_id,
+            yards=yards, pieces=pieces, taken_at=now,
+        ))
+        n += 1
+    db.session.commit()
+    return n
+
+
+def reconcile_stock(fix: bool = False) -> list[dict]:
+    """
+    Compare ledger balances with products / product_colors. With fix=True, append
+    'reconcile' movements so the ledger matches the live columns again.
+    """
+    ledger = ledger_balances()
+    live = _live_balances()
+    drift = []
+    for key in sorted(set(ledger) | set(live), key=lambda k: (k[0], k[1] or 0)):
+        ly, lp = ledger.get(key, (0.0, 0.0))
+        vy, vp = live.get(key, (0.0, 0.0))
+        if abs(ly - vy) < 1e-3 and abs(lp - vp) < 1e-3:
+            continue
+        drift.append({
+            'product_id': key[0],
+            'product_color_id': key[1],
+            'ledger_yards': ly,
+            'ledger_pieces': lp,
+            'live_yards': round(vy, 4),
+            'live_pieces': round(vp, 4),
+        })
+        if fix:
+            db.session.add(StockMovement(
+                product_id=key[0], product_color_id=key[1], delta_yards=round(vy - ly, 4),
+                delta_pieces=round(vp - lp, 4), reason='reconcile', created_at=datetime.utcnow(),
+            ))
+    if fix and drift:
+        db.session.commit()
+    return drift
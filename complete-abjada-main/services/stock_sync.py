@@ -3,20 +3,44 @@ from __future__ import annotations
 
 from extensions import db
 from models import Inventory, ProductColor
+from services.fabric_totals import fabric_totals
+from services.stock_alerts import refresh_stock_alerts
+from services.stock_ledger import note_stock_reason
 
 
-def sync_product_quantity_from_colors(product_id: int) -> None:
+def sync_product_quantity_from_colors(product_id: int, changed_color_ids=None) -> None:
     """
     When a product has color variants, quantity = sum(remaining_yards / yards_per_piece)
     per color (fractional pieces allowed). Legacy products without colors are unchanged.
+    Low-stock alert rows for the product are refreshed either way.
+
+    Pass changed_color_ids (colors created / edited / deleted in this transaction) to read
+    the sum from product_fabric_totals instead of rescanning every color; without it the
+    product's colors are reloaded and summed (repair path).
     """
     inv = Inventory.query.get(product_id)
     if not inv:
+        refresh_stock_alerts(product_id, inv=None)
         return
-    colors = ProductColor.query.filter_by(product_id=product_id).all()
-    if not colors:
+    if changed_color_ids is None:
+        colors = ProductColor.query.filter_by(product_id=product_id).all()
+        if colors:
+            total_equiv = 0.0
+            for c in colors:
+                total_equiv += float(c.remaining_pieces_equivalent())
+            note_stock_reason(inv, 'color_sync', overwrite=False)
+            inv.quantity = round(total_equiv, 4)
+        refresh_stock_alerts(product_id, inv=inv, colors=colors)
         return
-    total_equiv = 0.0
-    for c in colors:
-        total_equiv += float(c.remaining_pieces_equivalent())
-    inv.quantity = round(total_equiv, 4)
+
+    ids = [int(i) for i in changed_color_ids]
+    # Pending color edits reach product_fabric_totals on flush.
+    db.session.flush()
+    totals = fabric_totals(product_id)
+    if totals:
+        note_stock_reason(inv, 'color_sync', overwrite=False)
+        inv.quantity = totals['quantity_pieces_equivalent']
+    colors = ProductColor.query.filter(ProductColor.id.in_(ids)).all() if ids else []
+    refresh_stock_alerts(
+        product_id, inv=inv, colors=colors, changed_color_ids=ids, has_colors=totals is not None
+    )
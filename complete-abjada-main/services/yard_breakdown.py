@@ -52,6 +52,31 @@ def breakdown_to_json(bd: Optional[dict]) -> Optional[str]:
     return json.dumps(bd, sort_keys=True)
 
 
+def parts_from_stored_breakdown(stored: Any) -> dict:
+    """
+    Lenient read of a stored fabric_yard_breakdown (JSON text) for reporting: part key ->
+    yards, skipping unparsable values instead of rejecting the whole breakdown.
+    """
+    if not stored:
+        return {}
+    try:
+        bd = json.loads(stored) if isinstance(stored, str) else stored
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(bd, dict):
+        return {}
+    out: dict[str, float] = {}
+    for part, yds in bd.items():
+        key = str(part).strip().lower().replace(' ', '_').replace('-', '_')
+        if not key:
+            continue
+        try:
+            out[key] = out.get(key, 0.0) + float(yds)
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
 def resolve_fabric_totals(
     fabric_yards: Any,
     yard_breakdown: Any,
@@ -68,10 +68,27 @@ async function api(path, options = {}) {
     window.location.href = '/login';
     throw new Error('Session expired');
   }
-  if (!res.ok) throw new Error(data.error || data.message || res.statusText);
+  if (!res.ok) {
+    const err = new Error(data.error || data.message || res.statusText);
+    err.status = res.status;
+    err.data = data;
+    throw err;
+  }
   return data;
 }
 
+// POST /customers; on a duplicate phone (409) ask before creating another customer with it.
+async function createCustomer(body) {
+  try {
+    return await api('/customers', { method: 'POST', body: JSON.stringify(body) });
+  } catch (err) {
+    if (err.status !== 409 || !err.data || !err.data.duplicates) throw err;
+    const names = err.data.duplicates.map(d => `${d.full_name} (${d.phone})`).join('\n');
+    if (!confirm(`This phone is already used by:\n${names}\n\nCreate a new customer anyway?`)) throw err;
+    return api('/customers', { method: 'POST', body: JSON.stringify({ ...body, allow_duplicate: true }) });
+  }
+}
+
 function apiBlob(path) {
   const url = path.startsWith('http') ? path : `${API_BASE}/api${path.startsWith('/') ? '' : '/'}${path}`;
   const headers = {};
@@ -6,6 +6,9 @@
   var LOW_STOCK_THRESHOLD = 5;
   var POLL_INTERVAL_MS = 60000;
   var pollTimer = null;
+  // Last ETag / payload from GET /notifications/low-stock (server answers 304 when unchanged).
+  var lastEtag = null;
+  var lastData = null;
   var SETTINGS_KEY = 'abjad_settings_notifications';
 
   function getSettings() {
@@ -112,6 +115,27 @@
       });
   }
 
+  function getLowStock() {
+    // Conditional GET: api() treats 304 as an error, so call fetch directly.
+    var headers = { 'Authorization': 'Bearer ' + getToken() };
+    if (lastEtag && lastData) headers['If-None-Match'] = lastEtag;
+    return fetch(API_BASE + '/api/notifications/low-stock', { headers: headers, cache: 'no-store' })
+      .then(function(res) {
+        if (res.status === 304 && lastData) return lastData;
+        if (res.status === 401) {
+          clearToken();
+          window.location.href = '/login';
+          throw new Error('Session expired');
+        }
+        if (!res.ok) throw new Error(res.statusText);
+        return res.json().then(function(data) {
+          lastEtag = res.headers.get('ETag');
+          lastData = data;
+          return data;
+        });
+      });
+  }
+
   function fetchAlerts(updatePanel) {
     // Respect user settings: if low-stock notifications are disabled, clear UI and skip polling.
     var prefs = getSettings();
@@ -126,7 +150,7 @@
 
     if (typeof getToken !== 'function' || !getToken()) return;
     if (typeof api !== 'function') return;
-    api('/notifications/low-stock')
+    getLowStock()
       .then(function(data) {
         var alerts = data.alerts || [];
         var unreadCount = data.unread_count != null ? data.unread_count : alerts.filter(function(a) { return !a.read; }).length;
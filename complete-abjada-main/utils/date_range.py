@@ -0,0 +1,64 @@
+"""
+Half-open datetime bounds for ?date_from= / ?date_to= filters.
+
+`col >= from 00:00 AND col < (to + 1 day) 00:00` matches the same rows as
+`DATE(col) BETWEEN from AND to` but lets the database use an index on `col`.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, or_
+
+
+def parse_date(s, default=None):
+    """'YYYY-MM-DD' (anything after the first 10 chars is ignored) -> date, else default."""
+    if not s:
+        return default
+    try:
+        return datetime.strptime(str(s)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return default
+
+
+def day_start(d: date) -> datetime:
+    return datetime.combine(d, time.min)
+
+
+def day_bounds(date_from: date | None, date_to: date | None):
+    """(start, end) datetimes; end is exclusive (midnight after date_to). Either may be None."""
+    start = day_start(date_from) if date_from else None
+    end = day_start(date_to + timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def date_range_clause(col, date_from: date | None, date_to: date | None):
+    """SQL condition for DATE(col) in [date_from, date_to], or None when unbounded."""
+    start, end = day_bounds(date_from, date_to)
+    conds = []
+    if start is not None:
+        conds.append(col >= start)
+    if end is not None:
+        conds.append(col < end)
+    if not conds:
+        return None
+    return and_(*conds)
+
+
+def filter_date_range(q, col, date_from: date | None, date_to: date | None):
+    cond = date_range_clause(col, date_from, date_to)
+    return q.filter(cond) if cond is not None else q
+
+
+def filter_date_range_coalesce(q, col, fallback, date_from: date | None, date_to: date | None):
+    """
+    Range on COALESCE(col, fallback) written as an OR of two sargable branches, so each
+    column's index can still be used.
+    """
+    primary = date_range_clause(col, date_from, date_to)
+    if primary is None:
+        return q
+    return q.filter(or_(
+        primary,
+        and_(col.is_(None), date_range_clause(fallback, date_from, date_to)),
+    ))
@@ -1,18 +1,22 @@
 """
 Professional PDF documents for finance: receipts, invoices, and section reports.
 Uses ReportLab; branding aligned with utils.invoice.
+
+Section reports take any iterable of row dicts (e.g. a generator over Query.yield_per)
+and lay it out one page at a time, so the period length does not bound memory.
 """
 from __future__ import annotations
 
 import io
+import tempfile
 from datetime import datetime
-from typing import Any, Callable, List, Optional, Sequence
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
 from utils.invoice import BRAND
 
@@ -21,6 +25,17 @@ SLATE = colors.HexColor('#0f172a')
 GREY_HEADER = colors.Color(0.925, 0.933, 0.945)
 GRID = colors.Color(0.78, 0.82, 0.86)
 
+# Part of the services.pdf_cache key for the single-transaction documents: bump whenever
+# the receipt / invoice / liability layouts change.
+DOCUMENT_TEMPLATE_VERSION = 1
+
+# Report tables use fixed row heights (cells are single-line, truncated text) so the rows
+# per page, and with them the page subtotals, are known before layout.
+REPORT_HEADER_HEIGHT = 24
+REPORT_ROW_HEIGHT = 20
+# Finished reports stay in memory up to this size, then spill to a temp file.
+REPORT_SPOOL_BYTES = 4 * 1024 * 1024
+
 
 def _fmt_money(n: Any, currency: str = 'KES') -> str:
     try:
@@ -88,43 +103,47 @@ def _header_band(story, styles, title: str, subtitle: str):
     story.append(Spacer(1, 0.2 * inch))
 
 
+def _data_table_style() -> list:
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), SLATE),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('TOPPADDING', (0, 0), (-1, 0), 10),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.45, GRID),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 7),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 7),
+        ('TOPPADDING', (0, 1), (-1, -1), 7),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 7),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.Color(0.98, 0.99, 0.99)]),
+    ]
+
+
 def _data_table(story, col_widths: Sequence[float], headers: List[str], rows: List[List[str]]):
     data = [headers] + rows
     t = Table(data, colWidths=list(col_widths), repeatRows=1)
-    t.setStyle(
-        TableStyle(
-            [
-                ('BACKGROUND', (0, 0), (-1, 0), SLATE),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('TOPPADDING', (0, 0), (-1, 0), 10),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.45, GRID),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 7),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 7),
-                ('TOPPADDING', (0, 1), (-1, -1), 7),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 7),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.Color(0.98, 0.99, 0.99)]),
-            ]
-        )
-    )
+    t.setStyle(TableStyle(_data_table_style()))
     story.append(t)
 
 
-def _build_pdf(story_fn: Callable[[Any, Any], None]) -> io.BytesIO:
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
+def _new_doc(target) -> SimpleDocTemplate:
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         rightMargin=0.6 * inch,
         leftMargin=0.6 * inch,
         topMargin=0.65 * inch,
         bottomMargin=0.65 * inch,
     )
+
+
+def _build_pdf(story_fn: Callable[[Any, Any], None]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    doc = _new_doc(buffer)
     styles = getSampleStyleSheet()
     story = []
     story_fn(doc, styles, story)
@@ -133,6 +152,37 @@ def _build_pdf(story_fn: Callable[[Any, Any], None]) -> io.BytesIO:
     return buffer
 
 
+class StreamedStory(list):
+    """
+    Flowable list for doc.build() that pulls the next chunk from `chunks` whenever it
+    runs dry, so only one page of a long report exists as flowables at a time.
+    """
+
+    def __init__(self, chunks: Iterable[list]):
+        super().__init__()
+        self._chunks = iter(chunks)
+
+    def __len__(self):
+        n = super().__len__()
+        while not n:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self.extend(chunk)
+            n = super().__len__()
+        return n
+
+
+def _build_report_pdf(chunks_fn: Callable[[Any, Any], Iterable[list]]):
+    """Like _build_pdf, but the story arrives in chunks; returns a rewound spooled temp file."""
+    out = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+    doc = _new_doc(out)
+    styles = getSampleStyleSheet()
+    doc.build(StreamedStory(chunks_fn(doc, styles)), onFirstPage=_footer, onLaterPages=_footer)
+    out.seek(0)
+    return out
+
+
 # --- Single transaction documents ---
 
 
@@ -276,138 +326,243 @@ def _report_intro(story, styles, report_name: str, period: str):
     _header_band(story, styles, report_name, period)
 
 
-def pdf_received_report(rows: List[dict], date_from: Optional[str], date_to: Optional[str]) -> io.BytesIO:
-    def body(doc, styles, story):
-        period = 'All dates'
-        if date_from or date_to:
-            period = f'Period: {date_from or "…"} to {date_to or "…"}'
-        _report_intro(story, styles, 'RECEIVED PAYMENTS REPORT', period)
-        total = 0.0
-        table_rows = []
-        for r in rows:
-            try:
-                a = float(r.get('amount') or 0)
-            except (TypeError, ValueError):
-                a = 0.0
-            total += a
-            table_rows.append(
-                [
-                    _fmt_money(a, r.get('currency') or 'KES'),
-                    _method_label(r.get('method')),
-                    str(r.get('counterparty') or '—')[:42],
-                    _dt_str(r.get('transaction_date') or r.get('created_at')),
-                    str(r.get('details') or '—')[:56],
-                ]
-            )
+def _period_label(date_from: Optional[str], date_to: Optional[str]) -> str:
+    if date_from or date_to:
+        return f'Period: {date_from or "…"} to {date_to or "…"}'
+    return 'All dates'
+
+
+def _page_table(col_widths, headers, rows, money_cols, sums, running, label_col, label_span) -> Table:
+    """One page of a report: data rows plus 'Page subtotal' and 'Running total' rows."""
+    totals = []
+    for label, values in (('Page subtotal', sums), ('Running total', running)):
+        row = [''] * len(headers)
+        row[label_col] = label
+        for col, v in zip(money_cols, values):
+            row[col] = _fmt_money(v, 'KES')
+        totals.append(row)
+    data = [headers] + rows + totals
+    t = Table(
+        data,
+        colWidths=list(col_widths),
+        rowHeights=[REPORT_HEADER_HEIGHT] + [REPORT_ROW_HEIGHT] * (len(data) - 1),
+        repeatRows=1,
+    )
+    style = _data_table_style() + [
+        ('TOPPADDING', (0, 1), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 0),
+        ('BACKGROUND', (0, -2), (-1, -1), GREY_HEADER),
+        ('FONTNAME', (0, -2), (-1, -1), 'Helvetica-Bold'),
+    ]
+    if label_span > 1:
+        for r in (-2, -1):
+            style.append(('SPAN', (label_col, r), (label_col + label_span - 1, r)))
+    t.setStyle(TableStyle(style))
+    return t
+
+
+def _report_pages(
+    doc,
+    styles,
+    intro: list,
+    col_widths: Sequence[float],
+    headers: List[str],
+    rows: Iterable[tuple],
+    money_cols: Sequence[int],
+    totals_fn: Callable[[List[float]], list],
+) -> Iterator[list]:
+    """
+    Yield the report one page of flowables at a time. `rows` yields (cells, amounts), with
+    amounts lined up with money_cols; totals_fn(grand_totals) returns the closing flowables.
+    """
+    label_col = next(i for i in range(len(headers)) if i not in money_cols)
+    label_span = 1
+    while label_col + label_span < len(headers) and label_col + label_span not in money_cols:
+        label_span += 1
+    # Frame padding (6pt top and bottom) plus a little slack against rounding.
+    room = doc.height - 14
+    intro_height = sum(f.wrap(doc.width, room)[1] + f.getSpaceBefore() + f.getSpaceAfter() for f in intro)
+
+    def capacity(available):
+        return max(1, int((available - REPORT_HEADER_HEIGHT - 2 * REPORT_ROW_HEIGHT) // REPORT_ROW_HEIGHT))
+
+    per_page = capacity(room - intro_height)
+    running = [0.0] * len(money_cols)
+    head = list(intro)
+    page, sums = [], [0.0] * len(money_cols)
+    full = None
+    for cells, amounts in rows:
+        if full is not None:
+            yield full + [PageBreak()]
+            full = None
+        page.append(cells)
+        for i, a in enumerate(amounts):
+            sums[i] += a
+            running[i] += a
+        if len(page) == per_page:
+            full = head + [_page_table(col_widths, headers, page, money_cols, sums, running, label_col, label_span)]
+            head, page, sums = [], [], [0.0] * len(money_cols)
+            per_page = capacity(room)
+    if full is not None:
+        yield full + totals_fn(running)
+    elif page or head:
+        yield head + [_page_table(col_widths, headers, page, money_cols, sums, running, label_col, label_span)] + totals_fn(running)
+    else:
+        yield totals_fn(running)
+
+
+def _as_float(v: Any) -> float:
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _total_line(styles, html: str, size: int = 11) -> list:
+    return [
+        Spacer(1, 0.15 * inch),
+        Paragraph(html, ParagraphStyle('Tot', parent=styles['Normal'], fontSize=size, textColor=SLATE)),
+    ]
+
+
+def pdf_received_report(rows: Iterable[dict], date_from: Optional[str], date_to: Optional[str]):
+    def row_cells(r):
+        a = _as_float(r.get('amount'))
+        return [
+            _fmt_money(a, r.get('currency') or 'KES'),
+            _method_label(r.get('method')),
+            str(r.get('counterparty') or '—')[:42],
+            _dt_str(r.get('transaction_date') or r.get('created_at')),
+            str(r.get('details') or '—')[:56],
+        ], (a,)
+
+    def pages(doc, styles):
+        intro = []
+        _report_intro(intro, styles, 'RECEIVED PAYMENTS REPORT', _period_label(date_from, date_to))
         uw = A4[0] - doc.leftMargin - doc.rightMargin
-        _data_table(
-            story,
+        return _report_pages(
+            doc, styles, intro,
             [uw * 0.16, uw * 0.14, uw * 0.22, uw * 0.18, uw * 0.30],
             ['Amount', 'Method', 'Customer', 'Date', 'Details'],
-            table_rows,
+            (row_cells(r) for r in rows),
+            (0,),
+            lambda t: _total_line(styles, f'<b>Total received:</b> {_fmt_money(t[0], "KES")}'),
         )
-        story.append(Spacer(1, 0.15 * inch))
-        story.append(
-            Paragraph(f'<b>Total received:</b> {_fmt_money(total, "KES")}', ParagraphStyle('Tot', parent=styles['Normal'], fontSize=11, textColor=SLATE))
-        )
-
-    return _build_pdf(body)
 
-
-def pdf_receivable_report(rows: List[dict]) -> io.BytesIO:
-    def body(doc, styles, story):
-        _report_intro(story, styles, 'ACCOUNTS RECEIVABLE REPORT', 'Outstanding customer balances')
-        total_amt = 0.0
-        total_due = 0.0
-        table_rows = []
-        for r in rows:
-            amt = float(r.get('amount') or 0)
-            pa = r.get('paid_amount')
-            pa_f = float(pa) if pa is not None else 0.0
-            due = float(r.get('balance_due') if r.get('balance_due') is not None else max(0, amt - pa_f))
-            total_amt += amt
-            total_due += due
-            table_rows.append(
-                [
-                    _fmt_money(amt, 'KES'),
-                    _fmt_money(pa_f, 'KES') if pa is not None else '—',
-                    _fmt_money(due, 'KES'),
-                    _method_label(r.get('method')),
-                    str(r.get('customer_name') or '—')[:36],
-                    _dt_str(r.get('transaction_date')),
-                    str(r.get('payment_status') or '—'),
-                ]
-            )
+    return _build_report_pdf(pages)
+
+
+def pdf_receivable_report(rows: Iterable[dict]):
+    def row_cells(r):
+        amt = _as_float(r.get('amount'))
+        pa = r.get('paid_amount')
+        pa_f = float(pa) if pa is not None else 0.0
+        due = float(r.get('balance_due') if r.get('balance_due') is not None else max(0, amt - pa_f))
+        return [
+            _fmt_money(amt, 'KES'),
+            _fmt_money(pa_f, 'KES') if pa is not None else '—',
+            _fmt_money(due, 'KES'),
+            _method_label(r.get('method')),
+            str(r.get('customer_name') or '—')[:36],
+            _dt_str(r.get('transaction_date')),
+            str(r.get('payment_status') or '—'),
+        ], (amt, pa_f, due)
+
+    def pages(doc, styles):
+        intro = []
+        _report_intro(intro, styles, 'ACCOUNTS RECEIVABLE REPORT', 'Outstanding customer balances')
         uw = A4[0] - doc.leftMargin - doc.rightMargin
-        _data_table(
-            story,
+        return _report_pages(
+            doc, styles, intro,
             [uw * 0.12, uw * 0.12, uw * 0.12, uw * 0.11, uw * 0.18, uw * 0.13, uw * 0.12],
             ['Amount', 'Paid', 'Due', 'Method', 'Customer', 'Date', 'Status'],
-            table_rows,
-        )
-        story.append(Spacer(1, 0.12 * inch))
-        story.append(
-            Paragraph(
-                f'<b>Total invoiced:</b> {_fmt_money(total_amt, "KES")} &nbsp;·&nbsp; <b>Total balance due:</b> {_fmt_money(total_due, "KES")}',
-                ParagraphStyle('Tot', parent=styles['Normal'], fontSize=10, textColor=SLATE),
-            )
+            (row_cells(r) for r in rows),
+            (0, 1, 2),
+            lambda t: _total_line(
+                styles,
+                f'<b>Total invoiced:</b> {_fmt_money(t[0], "KES")} &nbsp;·&nbsp; '
+                f'<b>Total balance due:</b> {_fmt_money(t[2], "KES")}',
+                size=10,
+            ),
         )
 
-    return _build_pdf(body)
+    return _build_report_pdf(pages)
 
 
-def pdf_liabilities_report(rows: List[dict]) -> io.BytesIO:
-    def body(doc, styles, story):
-        _report_intro(story, styles, 'LIABILITIES REPORT', 'Amounts owed to creditors / suppliers')
-        total = 0.0
-        table_rows = []
-        for r in rows:
-            a = float(r.get('amount') or 0)
-            total += a
-            table_rows.append(
-                [
-                    _fmt_money(a, 'KES'),
-                    str(r.get('creditor_name') or '—')[:44],
-                    _dt_str(r.get('transaction_date')),
-                    str(r.get('status') or '—'),
-                    str(r.get('details') or '—')[:40],
-                ]
-            )
+def pdf_liabilities_report(rows: Iterable[dict]):
+    def row_cells(r):
+        a = _as_float(r.get('amount'))
+        return [
+            _fmt_money(a, 'KES'),
+            str(r.get('creditor_name') or '—')[:44],
+            _dt_str(r.get('transaction_date')),
+            str(r.get('status') or '—'),
+            str(r.get('details') or '—')[:40],
+        ], (a,)
+
+    def pages(doc, styles):
+        intro = []
+        _report_intro(intro, styles, 'LIABILITIES REPORT', 'Amounts owed to creditors / suppliers')
         uw = A4[0] - doc.leftMargin - doc.rightMargin
-        _data_table(
-            story,
+        return _report_pages(
+            doc, styles, intro,
             [uw * 0.16, uw * 0.26, uw * 0.18, uw * 0.12, uw * 0.28],
             ['Amount', 'Creditor', 'Date', 'Status', 'Details'],
-            table_rows,
+            (row_cells(r) for r in rows),
+            (0,),
+            lambda t: _total_line(styles, f'<b>Total liabilities:</b> {_fmt_money(t[0], "KES")}'),
         )
-        story.append(Spacer(1, 0.12 * inch))
-        story.append(Paragraph(f'<b>Total liabilities:</b> {_fmt_money(total, "KES")}', ParagraphStyle('Tot', parent=styles['Normal'], fontSize=11, textColor=SLATE)))
 
-    return _build_pdf(body)
+    return _build_report_pdf(pages)
 
 
-def pdf_expenses_report(rows: List[dict], date_from: Optional[str], date_to: Optional[str]) -> io.BytesIO:
-    def body(doc, styles, story):
-        period = 'All dates'
-        if date_from or date_to:
-            period = f'Period: {date_from or "…"} to {date_to or "…"}'
-        _report_intro(story, styles, 'EXPENSES REPORT', period)
-        total = 0.0
-        table_rows = []
-        for r in rows:
-            a = float(r.get('amount') or 0)
-            total += a
-            table_rows.append(
-                [
-                    str(r.get('category') or '—')[:28],
-                    _fmt_money(a, 'KES'),
-                    str(r.get('expense_date') or '—')[:12],
-                    str(r.get('description') or '—')[:52],
-                ]
-            )
+def pdf_expenses_report(rows: Iterable[dict], date_from: Optional[str], date_to: Optional[str]):
+    def row_cells(r):
+        a = _as_float(r.get('amount'))
+        return [
+            str(r.get('category') or '—')[:28],
+            _fmt_money(a, 'KES'),
+            str(r.get('expense_date') or '—')[:12],
+            str(r.get('description') or '—')[:52],
+        ], (a,)
+
+    def pages(doc, styles):
+        intro = []
+        _report_intro(intro, styles, 'EXPENSES REPORT', _period_label(date_from, date_to))
         uw = A4[0] - doc.leftMargin - doc.rightMargin
-        _data_table(story, [uw * 0.22, uw * 0.16, uw * 0.14, uw * 0.48], ['Category', 'Amount', 'Date', 'Description'], table_rows)
-        story.append(Spacer(1, 0.12 * inch))
-        story.append(Paragraph(f'<b>Total expenses:</b> {_fmt_money(total, "KES")}', ParagraphStyle('Tot', parent=styles['Normal'], fontSize=11, textColor=SLATE)))
+        return _report_pages(
+            doc, styles, intro,
+            [uw * 0.22, uw * 0.16, uw * 0.14, uw * 0.48],
+            ['Category', 'Amount', 'Date', 'Description'],
+            (row_cells(r) for r in rows),
+            (1,),
+            lambda t: _total_line(styles, f'<b>Total expenses:</b> {_fmt_money(t[0], "KES")}'),
+        )
 
-    return _build_pdf(body)
+    return _build_report_pdf(pages)
+
+
+def pdf_ar_aging_report(rows: Iterable[dict], as_of: str):
+    def row_cells(r):
+        amounts = tuple(_as_float(r.get(c)) for c in ('due_0_30', 'due_31_60', 'due_61_90', 'due_90_plus', 'total'))
+        return [str(r.get('customer_name') or '—')[:34]] + [_fmt_money(a, 'KES') for a in amounts], amounts
+
+    def pages(doc, styles):
+        intro = []
+        _report_intro(intro, styles, 'ACCOUNTS RECEIVABLE AGING', f'Outstanding balances by age as of {as_of}')
+        uw = A4[0] - doc.leftMargin - doc.rightMargin
+        return _report_pages(
+            doc, styles, intro,
+            [uw * 0.25] + [uw * 0.15] * 5,
+            ['Customer', '0–30 days', '31–60 days', '61–90 days', '90+ days', 'Total'],
+            (row_cells(r) for r in rows),
+            (1, 2, 3, 4, 5),
+            lambda t: _total_line(
+                styles,
+                f'<b>Total outstanding:</b> {_fmt_money(t[4], "KES")} &nbsp;·&nbsp; '
+                f'<b>Over 90 days:</b> {_fmt_money(t[3], "KES")}',
+                size=10,
+            ),
+        )
+
+    return _build_report_pdf(pages)
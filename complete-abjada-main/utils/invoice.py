@@ -5,16 +5,20 @@ from __future__ import annotations
 
 import io
 import json
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, Optional
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
 LINES_PREFIX = 'ABJAD_LINES_JSON:'
 
+# Part of the services.pdf_cache key: bump whenever the invoice layout changes.
+INVOICE_TEMPLATE_VERSION = 1
+
 # Match invoice_print.html — edit here for PDF branding
 BRAND = {
     'name': 'Abjad Super Tailor',
@@ -43,30 +47,16 @@ def _parse_order_lines(fabric_details: str | None):
         return None
 
 
-def generate_invoice_pdf(order, payments=None, seller_email: Optional[str] = None):
-    """
-    Build a professional A4 PDF matching the Abjad Super Tailor invoice layout.
-    Does not print placeholder customer/clothing blocks.
-    """
-    payments = payments or []
-    seller_email = (seller_email or '').strip() or '—'
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=0.65 * inch,
-        leftMargin=0.65 * inch,
-        topMargin=0.55 * inch,
-        bottomMargin=0.55 * inch,
+@lru_cache(maxsize=1)
+def _invoice_styles() -> dict:
+    """Paragraph styles shared by every invoice (built once per process, never mutated)."""
+    normal = ParagraphStyle(
+        'InvoiceNormal',
+        parent=getSampleStyleSheet()['Normal'],
+        fontName='Helvetica',
+        fontSize=10,
+        leading=13,
     )
-    styles = getSampleStyleSheet()
-
-    normal = styles['Normal']
-    normal.fontName = 'Helvetica'
-    normal.fontSize = 10
-    normal.leading = 13
-
     bold = ParagraphStyle(
         'Bold10',
         parent=normal,
@@ -90,6 +80,58 @@ def generate_invoice_pdf(order, payments=None, seller_email: Optional[str] = Non
         leading=14,
         alignment=2,  # right
     )
+    return {'normal': normal, 'bold': bold, 'left_header': left_header, 'right_meta': right_meta}
+
+
+def _new_invoice_doc(target) -> SimpleDocTemplate:
+    return SimpleDocTemplate(
+        target,
+        pagesize=A4,
+        rightMargin=0.65 * inch,
+        leftMargin=0.65 * inch,
+        topMargin=0.55 * inch,
+        bottomMargin=0.55 * inch,
+    )
+
+
+def generate_invoice_pdf(order, payments=None, seller_email: Optional[str] = None):
+    """
+    Build a professional A4 PDF matching the Abjad Super Tailor invoice layout.
+    Does not print placeholder customer/clothing blocks.
+    """
+    buffer = io.BytesIO()
+    doc = _new_invoice_doc(buffer)
+    doc.build(_invoice_story(doc, order, payments, seller_email))
+    buffer.seek(0)
+    return buffer
+
+
+def generate_invoices_pdf(invoices: Iterable[tuple], target) -> None:
+    """
+    Write many invoices into one PDF at `target`, each starting on a new page.
+    `invoices` yields (order, payments, seller_email) and is consumed lazily, so only
+    the invoice being laid out exists as flowables.
+    """
+    from utils.finance_pdf import StreamedStory  # finance_pdf imports BRAND from here
+
+    doc = _new_invoice_doc(target)
+
+    def chunks():
+        for i, (order, payments, seller_email) in enumerate(invoices):
+            story = _invoice_story(doc, order, payments, seller_email)
+            yield [PageBreak()] + story if i else story
+
+    doc.build(StreamedStory(chunks()))
+
+
+def _invoice_story(doc, order, payments=None, seller_email: Optional[str] = None) -> list:
+    payments = payments or []
+    seller_email = (seller_email or '').strip() or '—'
+    styles = _invoice_styles()
+    normal = styles['normal']
+    bold = styles['bold']
+    left_header = styles['left_header']
+    right_meta = styles['right_meta']
 
     story = []
     usable_w = A4[0] - doc.leftMargin - doc.rightMargin
@@ -219,7 +261,4 @@ def generate_invoice_pdf(order, payments=None, seller_email: Optional[str] = Non
         )
     )
     story.append(total_tbl)
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return story
@@ -0,0 +1,155 @@
+"""
+List paging shared by the API routes.
+
+Two modes, picked per request:
+  - ?page= / ?per_page= (default): OFFSET + COUNT, with the usual total / pages / page keys;
+  - ?cursor= (empty for the first page): keyset on (sort key, id), so deep pages cost the
+    same as the first and no COUNT runs. The response carries next_cursor (null on the
+    last page); ?with_total=1 adds total_estimate, a COUNT that stops at APPROX_TOTAL_CAP.
+
+Cursors are opaque to clients: base64 of the last row's sort value and id.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+
+from flask import request
+from sqlalchemy import and_, func, or_
+
+from extensions import db
+
+# ?with_total=1 in cursor mode counts at most this many rows.
+APPROX_TOTAL_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    """?cursor= could not be decoded, or belongs to a different sort order (app.py answers 400)."""
+
+
+@dataclass
+class Page:
+    items: list
+    # Paging keys to merge into the JSON response next to the items.
+    meta: dict = field(default_factory=dict)
+
+
+def _per_page(default_per: int, max_per: int) -> int:
+    per = request.args.get('per_page', default_per, type=int) or default_per
+    return max(1, min(per, max_per))
+
+
+def paginate_offset(q, default_per: int = 25, max_per: int = 100, min_pages: int = 0) -> Page:
+    """Classic ?page= / ?per_page= paging; q must already be ordered."""
+    page = request.args.get('page', 1, type=int)
+    per = request.args.get('per_page', default_per, type=int)
+    pag = q.paginate(page=page, per_page=min(per, max_per), error_out=False)
+    return Page(items=pag.items, meta={
+        'total': pag.total,
+        'pages': pag.pages or min_pages,
+        'page': pag.page,
+        'per_page': pag.per_page,
+    })
+
+
+def _encode_value(v):
+    if isinstance(v, datetime):
+        return ['dt', v.isoformat()]
+    if isinstance(v, date):
+        return ['d', v.isoformat()]
+    return ['v', v]
+
+
+def _decode_value(kind, v):
+    if kind == 'dt':
+        return datetime.fromisoformat(v)
+    if kind == 'd':
+        return date.fromisoformat(v)
+    if kind == 'v' and (v is None or isinstance(v, (str, int, float))):
+        return v
+    raise ValueError(kind)
+
+
+def encode_cursor(sort_value, row_id, desc: bool) -> str:
+    raw = json.dumps([_encode_value(sort_value), row_id, 'd' if desc else 'a'], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, desc: bool) -> tuple:
+    """(sort value, id) from encode_cursor(); InvalidCursor if malformed or for the other direction."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        (kind, v), row_id, direction = json.loads(raw)
+        value = _decode_value(kind, v)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor') from None
+    if not isinstance(row_id, int) or direction != ('d' if desc else 'a'):
+        raise InvalidCursor('Invalid cursor')
+    return value, row_id
+
+
+def _after(sort, id_col, value, row_id, desc: bool):
+    """
+    Rows strictly after (value, row_id) in ORDER BY sort, id (both desc or both asc).
+    NULL sort keys sort lowest, as on SQLite and MySQL: last when descending, first when ascending.
+    """
+    if desc:
+        if value is None:
+            return and_(sort.is_(None), id_col < row_id)
+        return or_(sort < value, and_(sort == value, id_col < row_id), sort.is_(None))
+    if value is None:
+        return or_(and_(sort.is_(None), id_col > row_id), sort.isnot(None))
+    return or_(sort > value, and_(sort == value, id_col > row_id))
+
+
+def keyset_order(sort, id_col, desc: bool = True) -> tuple:
+    """ORDER BY clauses paginate() lists rows in (exports reuse it to match the JSON order)."""
+    return (sort.desc(), id_col.desc()) if desc else (sort.asc(), id_col.asc())
+
+
+def paginate(
+    q,
+    sort,
+    id_col,
+    *,
+    desc: bool = True,
+    default_per: int = 25,
+    max_per: int = 100,
+    min_pages: int = 0,
+    key: Optional[Callable[[Any], tuple]] = None,
+) -> Page:
+    """
+    Page an unordered query by (sort, id_col). With ?cursor= present this is keyset paging,
+    otherwise ?page= / ?per_page= as before (same ORDER BY, so both modes list rows alike).
+    key(item) -> (sort value, id) for the cursor; defaults to the attributes named like the columns.
+    """
+    order = keyset_order(sort, id_col, desc)
+    if 'cursor' not in request.args:
+        return paginate_offset(q.order_by(*order), default_per, max_per, min_pages)
+
+    key = key or (lambda item: (getattr(item, sort.key), getattr(item, id_col.key)))
+    per = _per_page(default_per, max_per)
+    cursor = request.args.get('cursor') or ''
+    meta = {}
+    if request.args.get('with_total') in ('1', 'true'):
+        counted = db.session.query(func.count()).select_from(
+            q.order_by(None).limit(APPROX_TOTAL_CAP + 1).subquery()
+        ).scalar()
+        meta['total_estimate'] = min(counted, APPROX_TOTAL_CAP)
+        meta['total_is_lower_bound'] = counted > APPROX_TOTAL_CAP
+    if cursor:
+        value, row_id = decode_cursor(cursor, desc)
+        q = q.filter(_after(sort, id_col, value, row_id, desc))
+    rows = q.order_by(*order).limit(per + 1).all()
+    has_more = len(rows) > per
+    items = rows[:per]
+    meta.update({
+        'per_page': per,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(*key(items[-1]), desc) if has_more else None,
+    })
+    return Page(items=items, meta=meta)
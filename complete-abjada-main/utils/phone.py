@@ -0,0 +1,89 @@
+"""
+Phone numbers as E.164-style digits (country code + subscriber number, no '+') for lookups.
+
+Customers type phones every way ("+254 712 345 678", "0712-345678", "712345678"); all of
+those normalize to "254712345678" with the default country code (config
+PHONE_DEFAULT_COUNTRY_CODE). customers.phone_reversed holds the same digits reversed, so
+"ends with 345678" is an index range scan on the reversed prefix "876543".
+"""
+from __future__ import annotations
+
+import re
+
+from flask import current_app, has_app_context
+
+DEFAULT_COUNTRY_CODE = '254'
+
+# Subscriber digits after the trunk 0 (e.g. 0712345678 -> 712345678).
+NATIONAL_NUMBER_LENGTH = 9
+
+# Fewer trailing digits than this match too many customers to be a lookup.
+MIN_SUFFIX_DIGITS = 4
+
+# E.164 numbers have at most 15 digits; anything longer (e.g. two numbers typed into one
+# field) is not a single phone and is left unnormalized (customers.phone_normalized is String(20)).
+E164_MAX_DIGITS = 15
+
+
+def _country_code() -> str:
+    if has_app_context():
+        return str(current_app.config.get('PHONE_DEFAULT_COUNTRY_CODE') or DEFAULT_COUNTRY_CODE)
+    return DEFAULT_COUNTRY_CODE
+
+
+def phone_digits(raw) -> str:
+    return re.sub(r'\D', '', str(raw or ''))
+
+
+def normalize_phone(raw, country_code: str | None = None) -> str | None:
+    """
+    E.164 digits for raw, or None when it holds no digits (e.g. the walk-in placeholder)
+    or more than E164_MAX_DIGITS once normalized.
+    """
+    text = str(raw or '').strip()
+    digits = phone_digits(text)
+    if not digits:
+        return None
+    cc = country_code or _country_code()
+    if text.startswith('+'):
+        normalized = digits
+    elif digits.startswith('00'):
+        normalized = digits[2:]
+    elif digits.startswith('0'):
+        normalized = cc + digits.lstrip('0')
+    elif len(digits) == NATIONAL_NUMBER_LENGTH:
+        normalized = cc + digits
+    else:
+        normalized = digits
+    if not normalized or len(normalized) > E164_MAX_DIGITS:
+        return None
+    return normalized
+
+
+def reversed_phone(normalized: str | None) -> str | None:
+    return normalized[::-1] if normalized else None
+
+
+def suffix_key(raw) -> str | None:
+    """Reversed trailing digits to range-scan phone_reversed with, or None if too short."""
+    digits = phone_digits(raw).lstrip('0')
+    if len(digits) < MIN_SUFFIX_DIGITS:
+        return None
+    return digits[::-1]
+
+
+def prefix_keys(raw) -> set[str]:
+    """Normalized numbers that raw may be the beginning of ("0712 34" -> {"25471234"})."""
+    normalized = normalize_phone(raw)
+    if not normalized or len(phone_digits(raw).lstrip('0')) < MIN_SUFFIX_DIGITS:
+        return set()
+    keys = {normalized}
+    text = str(raw).strip()
+    if not text.startswith(('+', '0')):
+        keys.add(_country_code() + phone_digits(text))
+    return keys
+
+
+def prefix_range(col, prefix: str):
+    """col starts with prefix, as a range (uses a B-tree index on any dialect / collation of digits)."""
+    return (col >= prefix) & (col < prefix[:-1] + chr(ord(prefix[-1]) + 1))
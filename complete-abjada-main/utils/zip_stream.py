@@ -0,0 +1,61 @@
+"""
+ZIP archives written straight into a streamed response body.
+
+zipfile falls back to data descriptors when its output cannot seek, so each member
+can be flushed to the client as soon as it is written; nothing is buffered on disk.
+"""
+from __future__ import annotations
+
+import io
+import shutil
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, Union
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable target that collects bytes until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b''.join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def iter_zip(members: Iterable[tuple[str, Union[BinaryIO, Iterable[bytes]]]]) -> Iterator[bytes]:
+    """
+    Yield the bytes of a ZIP holding (name, source) members. A source is a file object
+    (closed after copying) or an iterable of byte chunks, compressed as it is consumed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, src in members:
+            if hasattr(src, 'read'):
+                try:
+                    with zf.open(name, 'w') as dst:
+                        shutil.copyfileobj(src, dst)
+                finally:
+                    src.close()
+            else:
+                with zf.open(name, 'w') as dst:
+                    for part in src:
+                        dst.write(part)
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk